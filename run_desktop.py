@@ -1,36 +1,143 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
 
 import eel
-from src.vcer.core.analyzer import analyze_with_gemini, analyze_with_custom_llm
 
 # Initialize Eel with the 'web' folder
 eel.init('web')
 
-@eel.expose  # Expose the function to JavaScript
-def analyze_semantic_payload(details):
-    """A wrapper function to be called from JavaScript that routes to the correct analyzer."""
+# Analyses run on real threads: Eel serves the window from gevent, so a blocking
+# LLM call on its loop would freeze the UI and queue every other request behind it
+RUN_WORKERS = 2
+CHUNK_WORKERS = 8
+EVENT_POLL_S = 0.05
+
+_runs = ThreadPoolExecutor(max_workers=RUN_WORKERS, thread_name_prefix='vcer-run')
+_chunks = ThreadPoolExecutor(max_workers=CHUNK_WORKERS, thread_name_prefix='vcer-chunk')
+# worker threads never touch Eel; they queue events and _pump_events forwards them
+_events = queue.Queue()
+_active = {}  # run id (assigned by the page) -> cancel event
+_lock = threading.Lock()
+
+# Created on the first analysis (the window opens before analyzer/config imports);
+# shared across clicks so unchanged chunks are never re-sent to the LLM, and
+# so connections to the LLM are reused
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def _shared_state():
+    with _shared_lock:
+        if not _shared:
+            import httpx
+
+            from src.vcer.config.loader import load_config
+            from src.vcer.core.cache import open_cache
+            from src.vcer.core.semantic import ClassificationCache
+
+            cfg = load_config(Path.cwd())
+            _shared['cfg'] = cfg
+            _shared['cache'] = ClassificationCache(open_cache(cfg, Path.cwd()))
+            limits = httpx.Limits(max_connections=CHUNK_WORKERS, max_keepalive_connections=CHUNK_WORKERS)
+            _shared['client'] = httpx.Client(limits=limits)
+        return _shared
+
+
+def _analyze(run_id, details, cancel):
+    """Runs on the worker pool; reports through _events only."""
+    from src.vcer.adapters.router import timeout_for_url
+    from src.vcer.core.analyzer import analyze_with_custom_llm, analyze_with_gemini
+    from src.vcer.core.semantic import AnalysisCancelled, analyze_payload_semantically
+
+    def progress(index, total, items):
+        if not cancel.is_set():
+            _events.put((run_id, 'progress', {'index': index, 'total': total, 'items': items}))
+
     try:
+        state = _shared_state()
+        cache = state['cache']
         payload = details.get('payload')
         backend = details.get('backend')
+        options = dict(cache=cache, on_chunk=progress, cancel=cancel, executor=_chunks)
 
         if backend == 'gemini':
-            return analyze_with_gemini(payload)
+            classify = partial(analyze_with_gemini, timeout=timeout_for_url(state['cfg'], None))
+            result = analyze_payload_semantically(payload, classify, **options)
         elif backend == 'custom':
             url = details.get('url')
             model = details.get('model')
             if not url or not model:
                 raise ValueError("URL and Model Name are required for custom LLM.")
-            return analyze_with_custom_llm(payload, url, model)
+            classify = partial(
+                analyze_with_custom_llm, url=url, model_name=model,
+                client=state['client'], timeout=timeout_for_url(state['cfg'], url),
+            )
+            result = analyze_payload_semantically(payload, classify, model=model, **options)
         else:
             raise ValueError(f"Unknown backend: {backend}")
 
+        _events.put((run_id, 'done', {'result': result, 'cache': cache.stats()}))
+    except AnalysisCancelled:
+        _events.put((run_id, 'cancelled', None))
     except Exception as e:
-        # Return an error object to the frontend
-        return {'error': str(e)}
+        # Report an error object to the frontend
+        _events.put((run_id, 'error', str(e)))
+    finally:
+        with _lock:
+            _active.pop(run_id, None)
+
+
+@eel.expose  # Expose the function to JavaScript
+def start_analysis(details):
+    """Start an analysis in the background and return at once.
+
+    Runs still in flight are cancelled: only the newest submission matters.
+    Results arrive through the JavaScript ``analysis_event`` callback, tagged
+    with ``details['run_id']``.
+    """
+    run_id = details.get('run_id')
+    cancel = threading.Event()
+    with _lock:
+        for stale in _active.values():
+            stale.set()
+        _active[run_id] = cancel
+    _runs.submit(_analyze, run_id, details, cancel)
+
+
+@eel.expose
+def cancel_analysis(run_id):
+    with _lock:
+        cancel = _active.get(run_id)
+    if cancel is not None:
+        cancel.set()
+    return cancel is not None
+
+
+def _pump_events():
+    # a greenlet on Eel's loop, the only place that calls into the page
+    while True:
+        try:
+            run_id, kind, data = _events.get_nowait()
+        except queue.Empty:
+            eel.sleep(EVENT_POLL_S)
+            continue
+        eel.analysis_event(run_id, kind, data)
+
 
 print("Starting desktop application... Close the window to stop.")
 
+eel.spawn(_pump_events)
+
 # Start the application. Eel will handle creating the window.
 # You might need to specify a browser if Chrome is not found.
 eel.start('index.html', size=(1200, 800))
 
+for cancel in list(_active.values()):
+    cancel.set()
+_runs.shutdown(wait=False, cancel_futures=True)
+_chunks.shutdown(wait=False, cancel_futures=True)
+
 print("Application closed.")
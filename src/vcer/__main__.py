@@ -1,11 +1,19 @@
-from .cli import app
+import sys
 
 
 def main() -> None:
+    # handled before importing the CLI so the profile sees every import
+    if "--import-profile" in sys.argv[1:]:
+        from .bench.startup import profile_imports
+
+        argv = [a for a in sys.argv[1:] if a != "--import-profile"]
+        sys.exit(profile_imports(argv))
+
+    from .cli import app
+
     # Typer app is callable as entrypoint
     app()
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import math
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+AFFINITY_KEYS = ("conversation", "system")
+DEFAULT_VNODES = 64
+DEFAULT_LOAD_FACTOR = 1.25
+
+
+def _hash(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class AffinitySettings:
+    """``router.affinity``: how the ``prefix`` strategy keys and spreads requests.
+
+    ``key: conversation`` hashes the system prompt plus the first user turn,
+    which every follow-up turn repeats, so a conversation stays on one
+    replica; ``key: system`` hashes the system prompt alone, sending every
+    conversation that shares it to the same replica. ``load_factor`` bounds
+    any replica to that multiple of the mean requests in flight before keys
+    spill to the next replica on the ring.
+    """
+
+    __slots__ = ("key", "vnodes", "load_factor")
+
+    def __init__(self, key: str = "conversation", vnodes: int = DEFAULT_VNODES, load_factor: float = DEFAULT_LOAD_FACTOR) -> None:
+        if key not in AFFINITY_KEYS:
+            raise ValueError(f"router.affinity.key must be one of {', '.join(AFFINITY_KEYS)}")
+        if int(vnodes) < 1:
+            raise ValueError("router.affinity.vnodes must be at least 1")
+        if float(load_factor) < 1.0:
+            raise ValueError("router.affinity.load_factor must be >= 1.0")
+        self.key = key
+        self.vnodes = int(vnodes)
+        self.load_factor = float(load_factor)
+
+    @classmethod
+    def from_config(cls, cfg: Mapping[str, Any], **overrides: Any) -> "AffinitySettings":
+        acfg = dict((cfg.get("router") or {}).get("affinity") or {})
+        acfg.update({k: v for k, v in overrides.items() if v is not None})
+        unknown = set(acfg) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f"Unknown router.affinity setting(s): {', '.join(sorted(unknown))}")
+        return cls(**acfg)
+
+
+def affinity_key(system: str, messages: Optional[Sequence[Mapping[str, Any]]], user: str, key: str = "conversation") -> str:
+    """Digest of the prompt prefix a conversation keeps across turns."""
+    history = list(messages or [])
+    # leading system messages are part of the system prompt
+    prefix = [system]
+    while history and history[0].get("role") == "system":
+        prefix.append(str(history.pop(0).get("content", "")))
+    if key == "conversation":
+        first = next((m for m in history if m.get("role") == "user"), None)
+        prefix.append(str(first.get("content", "")) if first is not None else user)
+    return hashlib.blake2b(json.dumps(prefix, ensure_ascii=False).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class HashRing:
+    """Consistent-hash ring over backend ids, ``vnodes`` points per unit of weight.
+
+    Removing a member (e.g. while unhealthy) moves only the keys it owned.
+    """
+
+    def __init__(self, weights: Mapping[str, float], vnodes: int = DEFAULT_VNODES) -> None:
+        points = []
+        for member, weight in weights.items():
+            for i in range(max(1, round(vnodes * weight)) if weight > 0 else 0):
+                points.append((_hash(f"{member}#{i}"), member))
+        points.sort()
+        self._hashes = [h for h, _ in points]
+        self._members = [m for _, m in points]
+        self.size = len(set(self._members))
+
+    def walk(self, key: str) -> Iterator[str]:
+        """Distinct members clockwise from ``key``'s point; the first is its owner."""
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, _hash(key))
+        seen: set = set()
+        n = len(self._members)
+        for i in range(n):
+            member = self._members[(start + i) % n]
+            if member not in seen:
+                seen.add(member)
+                yield member
+                if len(seen) == self.size:
+                    return
+
+    def pick(self, key: str, candidates: Sequence[str], load: Dict[str, int], load_factor: float = DEFAULT_LOAD_FACTOR) -> Optional[str]:
+        """First candidate along the ring whose requests in flight are below
+        ``ceil(load_factor * (total + 1) / len(candidates))`` (consistent
+        hashing with bounded loads)."""
+        allowed = set(candidates)
+        if not allowed:
+            return None
+        total = sum(load.get(m, 0) for m in allowed)
+        cap = math.ceil(load_factor * (total + 1) / len(allowed))
+        fallback: List[str] = []
+        for member in self.walk(key):
+            if member not in allowed:
+                continue
+            if load.get(member, 0) < cap:
+                return member
+            fallback.append(member)
+        # candidates with zero weight are off the ring
+        return fallback[0] if fallback else next(iter(candidates))
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+from ..core import trace
+from .router import batch_url, build_batch_request
+
+DEFAULT_MAX_BATCH = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+
+Sender = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[Any]]
+
+
+class BatchSettings:
+    """``router.batch``: how long concurrent requests wait to share a call.
+
+    A batch is sent once it holds ``max_batch`` prompts or its first prompt
+    has waited ``max_wait_ms``, whichever comes first; a lone request pays
+    at most ``max_wait_ms`` extra.
+    """
+
+    __slots__ = ("max_batch", "max_wait_ms")
+
+    def __init__(self, max_batch: int = DEFAULT_MAX_BATCH, max_wait_ms: float = DEFAULT_MAX_WAIT_MS) -> None:
+        if int(max_batch) < 1:
+            raise ValueError("router.batch.max_batch must be at least 1")
+        if float(max_wait_ms) < 0:
+            raise ValueError("router.batch.max_wait_ms must be >= 0")
+        self.max_batch = int(max_batch)
+        self.max_wait_ms = float(max_wait_ms)
+
+    @classmethod
+    def from_config(cls, cfg: Mapping[str, Any], **overrides: Any) -> "BatchSettings":
+        bcfg = dict((cfg.get("router") or {}).get("batch") or {})
+        bcfg.update({k: v for k, v in overrides.items() if v is not None})
+        unknown = set(bcfg) - set(cls.__slots__)
+        if unknown:
+            raise ValueError(f"Unknown router.batch setting(s): {', '.join(sorted(unknown))}")
+        return cls(**bcfg)
+
+
+def split_batch_response(kind: str, data: Any, n: int) -> List[Dict[str, Any]]:
+    """Per-prompt responses, each shaped like the reply to a single request."""
+    if kind == "sglang":
+        if not isinstance(data, list) or len(data) != n:
+            raise ValueError(f"Batched /generate returned {type(data).__name__}, expected a list of {n}")
+        return data
+    if not isinstance(data, dict):
+        raise ValueError(f"Batched completion returned {type(data).__name__}, expected an object")
+    choices = data.get("choices") or []
+    by_index = {c.get("index", i): c for i, c in enumerate(choices)}
+    if len(choices) != n or set(by_index) != set(range(n)):
+        raise ValueError(f"Batched completion returned choices {sorted(by_index, key=str)} for {n} prompts")
+    # usage covers the whole batch and cannot be split per prompt; keep it aside
+    base = {k: v for k, v in data.items() if k not in ("choices", "usage")}
+    batch = {"size": n, "usage": data.get("usage")}
+    return [{**base, "choices": [{**by_index[i], "index": 0}], "batch": batch} for i in range(n)]
+
+
+class _Batch:
+    __slots__ = ("be", "max_tokens", "sampling", "items", "timer", "opened")
+
+    def __init__(self, be: Dict[str, Any], max_tokens: int, sampling: Optional[Mapping[str, Any]]) -> None:
+        self.be = be
+        self.max_tokens = max_tokens
+        self.sampling = sampling
+        self.items: List[Tuple[str, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.opened = time.perf_counter()
+
+
+class MicroBatcher:
+    """Coalesces concurrent non-streamed requests for one backend, model,
+    ``max_tokens`` and sampling parameters into batched calls, then fans the
+    results back out.
+
+    ``send(be, payload)`` performs the HTTP call (``AsyncRouter._send``), so
+    a batch takes one concurrency slot. If the call fails, every member
+    request raises the same error and can fail over on its own.
+    """
+
+    def __init__(self, send: Sender, settings: Optional[BatchSettings] = None) -> None:
+        self._send = send
+        self.settings = settings or BatchSettings()
+        self._open: Dict[Tuple[Any, ...], _Batch] = {}
+        self._tasks: set = set()
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(
+        self,
+        be: Dict[str, Any],
+        prompt: str,
+        max_tokens: int,
+        meta: Optional[Dict[str, Any]] = None,
+        sampling: Optional[Mapping[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        key = (be.get("id"), be.get("model"), max_tokens, json.dumps(sampling or {}, sort_keys=True))
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = _Batch(be, max_tokens, sampling)
+            batch.timer = loop.call_later(self.settings.max_wait_ms / 1000.0, self._flush, key)
+        fut = loop.create_future()
+        batch.items.append((prompt, fut))
+        if len(batch.items) >= self.settings.max_batch:
+            self._flush(key)
+        result, size = await fut
+        if meta is not None:
+            meta["batch"] = size
+        return result
+
+    def _flush(self, key: Tuple[Any, ...]) -> None:
+        batch = self._open.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: _Batch) -> None:
+        items = [(p, f) for p, f in batch.items if not f.done()]  # callers may have given up
+        if not items:
+            return
+        n = len(items)
+        tracer = trace.current()
+        if tracer is not None:
+            tracer.add_span("router.batch_wait", batch.opened, time.perf_counter() - batch.opened, {"size": n})
+            tracer.count("router.batches")
+            tracer.count("router.batched_requests", n)
+        self.batches += 1
+        self.requests += n
+        be = dict(batch.be, url=batch_url(batch.be))
+        payload = build_batch_request(
+            prompts=[p for p, _ in items], backend=be, max_tokens=batch.max_tokens, sampling=batch.sampling,
+        )
+        try:
+            results = split_batch_response(be.get("kind", "vllm"), await self._send(be, payload), n)
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        except BaseException:
+            for _, fut in items:
+                fut.cancel()
+            raise
+        for (_, fut), result in zip(items, results):
+            if not fut.done():
+                fut.set_result((result, n))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch": round(self.requests / self.batches, 2) if self.batches else None,
+        }
@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from ..core import trace
+from .batching import BatchSettings, MicroBatcher
+from .pool import BackendPool, NoHealthyBackend
+from .responses import ResponseCache, is_repeatable, request_key
+from .router import SAMPLING_PARAMS, build_prompt, build_request, check_messages, check_sampling, load_backend
+from .streaming import StreamStats, make_decoder
+
+
+DEFAULT_CONCURRENCY = 16
+AUTO_BACKEND = "auto"
+FAILOVER_STATUS = (502, 503, 504)
+# route-batch ``params`` passed to ``route()`` as is; ``SAMPLING_PARAMS`` go into the payload
+ROUTE_PARAMS = ("backend", "max_tokens", "model", "cache", "affinity", "stream")
+
+
+class AsyncRouter:
+    """Long-lived routing core: one pooled ``httpx.AsyncClient`` per backend.
+
+    Connections are kept alive between requests, and ``concurrency`` bounds
+    the number of requests in flight across all backends. Responses are
+    cached (and identical in-flight requests coalesced) for backends with
+    ``cache: true`` or calls that pass ``cache=True``. Non-streamed requests
+    to backends with ``batch: true`` are micro-batched per ``router.batch``.
+    ``health_checks=False`` keeps ``backend="auto"`` from starting background
+    probes, for one-shot callers that exit before the first probe would run.
+    """
+
+    def __init__(
+        self,
+        cfg: Dict[str, Any],
+        concurrency: Optional[int] = None,
+        responses: Optional[ResponseCache] = None,
+        health_checks: bool = True,
+    ) -> None:
+        self.cfg = cfg
+        self.health_checks = health_checks
+        rcfg = cfg.get("router") or {}
+        self.concurrency = int(concurrency or rcfg.get("concurrency", DEFAULT_CONCURRENCY))
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._clients: Dict[str, Any] = {}
+        self._pool: Optional[BackendPool] = None
+        self._probe_client: Any = None
+        self._responses = responses
+        self._batcher: Optional[MicroBatcher] = None
+
+    @property
+    def pool(self) -> BackendPool:
+        if self._pool is None:
+            self._pool = BackendPool(self.cfg)
+        return self._pool
+
+    @property
+    def responses(self) -> ResponseCache:
+        if self._responses is None:
+            self._responses = ResponseCache.from_config(self.cfg)
+        return self._responses
+
+    @property
+    def batcher(self) -> MicroBatcher:
+        if self._batcher is None:
+            self._batcher = MicroBatcher(self._send, BatchSettings.from_config(self.cfg))
+        return self._batcher
+
+    async def __aenter__(self) -> "AsyncRouter":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
+
+    def client(self, be: Dict[str, Any]) -> Any:
+        import httpx  # lazy import
+
+        key = be.get("id") or be["url"]
+        client = self._clients.get(key)
+        if client is None:
+            http2 = bool(be.get("http2"))
+            if http2 and importlib.util.find_spec("h2") is None:
+                raise RuntimeError("http2 requested but 'h2' is not installed; pip install 'httpx[http2]'")
+            max_conn = int(be.get("max_connections") or self.concurrency)
+            client = httpx.AsyncClient(
+                http2=http2,
+                timeout=be.get("timeout", 60.0),
+                headers=be.get("headers") or {},
+                limits=httpx.Limits(max_connections=max_conn, max_keepalive_connections=max_conn),
+            )
+            self._clients[key] = client
+        return client
+
+    async def send(
+        self,
+        be: Dict[str, Any],
+        payload: Dict[str, Any],
+        *,
+        cache: Optional[bool] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """POST ``payload`` to ``be``; ``cache`` overrides the backend's ``cache`` setting.
+
+        Payloads that sample (temperature > 0 without a seed) are never cached.
+        """
+        if (be.get("cache", False) if cache is None else cache) and is_repeatable(payload):
+            return await self.responses.fetch(request_key(be, payload), lambda: self._send(be, payload), meta)
+        return await self._send(be, payload)
+
+    async def _send(self, be: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        if payload.get("stream"):
+            # streamed bodies are not one JSON document; collect the deltas instead
+            stats = StreamStats()
+            chunks = [delta async for delta in self.stream(be, payload, stats)]
+            return {"content": "".join(chunks), "stream": stats.summary()}
+        tracer = trace.current()
+        queued = time.perf_counter()
+        async with self._sem:
+            t0 = time.perf_counter()
+            if tracer is None:
+                resp = await self.client(be).post(be["url"], json=payload)
+                resp.raise_for_status()
+                data = resp.json()
+            else:
+                tracer.add_span("router.queue", queued, t0 - queued)
+                with tracer.span("http.total", backend=be.get("id", "")) as sp:
+                    phases = trace.HTTPPhases(tracer, backend=be.get("id", ""))
+                    resp = await self.client(be).post(be["url"], json=payload, extensions={"trace": phases})
+                    sp.set(status=resp.status_code)
+                    resp.raise_for_status()
+                    data = resp.json()
+                tracer.count("http.requests")
+                tracer.count("http.request_bytes", len(resp.request.content))
+                tracer.count("http.response_bytes", len(resp.content))
+        if self._pool is not None:
+            self._pool.observe(be.get("id", ""), time.perf_counter() - t0)
+        return data
+
+    async def stream(
+        self,
+        be: Dict[str, Any],
+        payload: Dict[str, Any],
+        stats: Optional[StreamStats] = None,
+    ) -> AsyncIterator[str]:
+        """Yield generated text deltas as the backend produces them."""
+        decoder = make_decoder(be.get("kind", "vllm"))
+        stats = stats or StreamStats()
+        tracer = trace.current()
+        extensions = {"trace": trace.HTTPPhases(tracer, backend=be.get("id", ""))} if tracer is not None else None
+        async with self._sem:
+            t0 = time.perf_counter()
+            with trace.span("http.total", backend=be.get("id", ""), stream=True) as sp:
+                async with self.client(be).stream("POST", be["url"], json=payload, extensions=extensions) as resp:
+                    sp.set(status=resp.status_code)
+                    resp.raise_for_status()
+                    async for line in resp.aiter_lines():
+                        delta = decoder.feed(line)
+                        if delta:
+                            stats.on_chunk()
+                            yield delta
+                        if decoder.done:
+                            break
+        stats.finish()
+        if tracer is not None:
+            if stats.first is not None:
+                tracer.add_span("http.first_token", t0, stats.first - t0, {"backend": be.get("id", "")})
+            tracer.count("http.requests")
+            tracer.count("http.request_bytes", len(resp.request.content))
+            tracer.count("http.stream_chunks", stats.chunks)
+        if self._pool is not None:
+            self._pool.observe(be.get("id", ""), stats.end - stats.start)
+
+    def start_health_checks(self) -> None:
+        """Probe the pool in the background; ``backend="auto"`` starts this on first use."""
+        import httpx  # lazy import
+
+        if self._probe_client is None:
+            pool = self.pool  # raises before a client is opened if no pool is configured
+            self._probe_client = httpx.AsyncClient()
+            pool.start_health_checks(self._probe_client)
+
+    async def route(
+        self,
+        system: str,
+        user: str,
+        backend: str = "local-vllm",
+        *,
+        stream: bool = False,
+        max_tokens: int = 1024,
+        model: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None,
+        cache: Optional[bool] = None,
+        messages: Optional[List[Dict[str, str]]] = None,
+        affinity: Optional[str] = None,
+        sampling: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Build and send one request.
+
+        ``backend="auto"`` selects from the pool per ``router.strategy`` and
+        fails over to the next member on connection errors or 502/503/504.
+        ``messages`` is the conversation history before ``user``. With the
+        ``prefix`` strategy, ``affinity`` (e.g. a session id) keys the pick;
+        by default the key is derived from the prompt prefix per
+        ``router.affinity.key``. ``sampling`` holds temperature, top_p and the
+        like (see ``check_sampling``). ``meta`` (if given) receives the backend
+        that answered, the number of attempts and, for cached calls, the
+        cache outcome.
+        """
+        meta = meta if meta is not None else {}
+        if messages is not None:
+            messages = check_messages(messages)
+        if sampling is not None:
+            sampling = check_sampling(sampling)
+        if backend != AUTO_BACKEND:
+            be = load_backend(self.cfg, backend)
+            meta.update(backend=be["id"], attempts=1)
+            return await self._dispatch(be, system, user, stream, max_tokens, model, messages, sampling, cache, meta)
+
+        if self.health_checks:
+            self.start_health_checks()
+        pool = self.pool
+        key = pool.key_for(system, user, messages, affinity)
+        tried: List[str] = []
+        while True:
+            be = self._next(pool, tried, key, meta)
+            try:
+                return await self._dispatch(be, system, user, stream, max_tokens, model, messages, sampling, cache, meta)
+            except Exception as e:
+                if not _fails_over(e):
+                    raise
+                pool.mark_down(be["id"])
+            finally:
+                pool.release(be["id"])
+
+    async def route_stream(
+        self,
+        system: str,
+        user: str,
+        backend: str = "local-vllm",
+        *,
+        max_tokens: int = 1024,
+        model: Optional[str] = None,
+        messages: Optional[List[Dict[str, str]]] = None,
+        affinity: Optional[str] = None,
+        sampling: Optional[Dict[str, Any]] = None,
+        stats: Optional[StreamStats] = None,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """Build one streamed request and yield text deltas as they arrive.
+
+        Backend selection and failover follow ``route()``, except that a member
+        is only abandoned before its first delta: once text has been yielded,
+        errors propagate. ``meta`` receives the backend and attempts as each
+        member is tried.
+        """
+        meta = meta if meta is not None else {}
+        if messages is not None:
+            messages = check_messages(messages)
+        if sampling is not None:
+            sampling = check_sampling(sampling)
+        if backend != AUTO_BACKEND:
+            be = load_backend(self.cfg, backend)
+            meta.update(backend=be["id"], attempts=1)
+            payload = self._build(be, system, user, True, max_tokens, model, messages, sampling)
+            async for delta in self.stream(be, payload, stats):
+                yield delta
+            return
+
+        if self.health_checks:
+            self.start_health_checks()
+        pool = self.pool
+        key = pool.key_for(system, user, messages, affinity)
+        tried: List[str] = []
+        while True:
+            be = self._next(pool, tried, key, meta)
+            payload = self._build(be, system, user, True, max_tokens, model, messages, sampling)
+            started = False
+            try:
+                async for delta in self.stream(be, payload, stats):
+                    started = True
+                    yield delta
+                return
+            except Exception as e:
+                if not _fails_over(e):
+                    raise
+                pool.mark_down(be["id"])
+                if started:
+                    raise
+            finally:
+                pool.release(be["id"])
+
+    @staticmethod
+    def _next(pool: BackendPool, tried: List[str], key: Optional[str], meta: Dict[str, Any]) -> Dict[str, Any]:
+        """Pick and acquire the next pool member not yet in ``tried``."""
+        try:
+            be = pool.pick(exclude=tried, key=key)
+        except NoHealthyBackend:
+            raise NoHealthyBackend(f"All backends failed: {', '.join(tried)}") from None
+        tried.append(be["id"])
+        meta.update(backend=be["id"], attempts=len(tried))
+        pool.acquire(be["id"])
+        return be
+
+    async def _dispatch(
+        self,
+        be: Dict[str, Any],
+        system: str,
+        user: str,
+        stream: bool,
+        max_tokens: int,
+        model: Optional[str],
+        messages: Optional[List[Dict[str, str]]],
+        sampling: Optional[Dict[str, Any]],
+        cache: Optional[bool],
+        meta: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        # cached calls go one by one: their key is the single-request payload
+        if be.get("batch") and not stream and not (be.get("cache", False) if cache is None else cache):
+            if model:
+                be["model"] = model
+            return await self.batcher.submit(be, build_prompt(system, user, messages), max_tokens, meta, sampling)
+        payload = self._build(be, system, user, stream, max_tokens, model, messages, sampling)
+        return await self.send(be, payload, cache=cache, meta=meta)
+
+    @staticmethod
+    def _build(
+        be: Dict[str, Any],
+        system: str,
+        user: str,
+        stream: bool,
+        max_tokens: int,
+        model: Optional[str],
+        messages: Optional[List[Dict[str, str]]] = None,
+        sampling: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        if model:
+            be["model"] = model
+        return build_request(
+            system=system, user=user, backend=be, stream=stream, max_tokens=max_tokens, messages=messages, sampling=sampling,
+        )
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.stop()
+        if self._probe_client is not None:
+            await self._probe_client.aclose()
+            self._probe_client = None
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+def _fails_over(e: Exception) -> bool:
+    """True for errors that mean "try another member": connection failures and 502/503/504."""
+    import httpx  # lazy import
+
+    if isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)):
+        return True
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code in FAILOVER_STATUS
+
+
+async def route_batch(
+    router: AsyncRouter,
+    records: Iterable[Dict[str, Any]],
+    default_backend: str = "local-vllm",
+    cache: Optional[bool] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Route ``{system, user, messages?, params}`` records, yielding results as they finish.
+
+    ``params`` takes ``ROUTE_PARAMS`` and ``SAMPLING_PARAMS``; a record with
+    any other key fails on its own. At most ``2 * concurrency`` records are
+    read ahead, so arbitrarily large inputs stream through in bounded
+    memory. Results carry the input ``index`` (and ``id`` if given) because
+    they complete out of order. ``cache`` is the default for records
+    without ``params.cache``.
+    """
+
+    async def one(index: int, rec: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(rec.get("params") or {})
+        backend = params.pop("backend", default_backend)
+        out: Dict[str, Any] = {"index": index, "id": rec.get("id"), "backend": backend}
+        t0 = time.perf_counter()
+        try:
+            unknown = set(params) - set(ROUTE_PARAMS) - set(SAMPLING_PARAMS)
+            if unknown:
+                raise ValueError(
+                    f"Unknown params: {', '.join(sorted(unknown))} "
+                    f"(expected {', '.join(ROUTE_PARAMS + tuple(SAMPLING_PARAMS))}; messages go beside system and user)"
+                )
+            sampling = {k: params.pop(k) for k in SAMPLING_PARAMS if k in params}
+            params.setdefault("cache", cache)
+            out["response"] = await router.route(
+                rec.get("system", ""), rec.get("user", ""), backend,
+                meta=out, messages=rec.get("messages"), sampling=sampling or None, **params,
+            )
+        except Exception as e:
+            out["error"] = f"{type(e).__name__}: {e}"
+        out["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return out
+
+    window = 2 * router.concurrency
+    pending: set[asyncio.Task] = set()
+    for index, rec in enumerate(records):
+        pending.add(asyncio.create_task(one(index, rec)))
+        if len(pending) >= window:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            yield task.result()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+from .affinity import AffinitySettings, HashRing, affinity_key
+from .router import _normalize_backend, health_url
+
+
+STRATEGIES = ("round_robin", "weighted", "canary", "latency", "prefix")
+DEFAULT_EWMA_ALPHA = 0.3
+
+
+class NoHealthyBackend(RuntimeError):
+    pass
+
+
+class BackendPool:
+    """Backend selection per ``router.strategy`` with health tracking.
+
+    - ``round_robin``: rotate over healthy members.
+    - ``weighted``: random pick proportional to ``router.weights`` (default 1.0).
+    - ``canary``: send ``router.canary.fraction`` of traffic to
+      ``router.canary.backend`` and round-robin the rest over the others.
+    - ``latency``: lowest EWMA of observed latency; unmeasured members first.
+    - ``prefix``: the request's affinity key on a consistent-hash ring
+      (points per ``router.weights``), with bounded load, so turns of one
+      conversation reuse the replica holding their KV prefix cache; see
+      ``AffinitySettings``. Requests without a key are round-robined.
+
+    Members are all configured backends, or the ids in ``router.pool``.
+    Unhealthy members are skipped; if none are healthy, all are tried.
+    """
+
+    def __init__(self, cfg: Dict[str, Any], rng: Optional[random.Random] = None) -> None:
+        rcfg = cfg.get("router") or {}
+        self.strategy = rcfg.get("strategy", "round_robin")
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown router.strategy: {self.strategy} (expected one of {', '.join(STRATEGIES)})")
+        members = rcfg.get("pool")
+        self.backends: List[Dict[str, Any]] = [
+            _normalize_backend(be)
+            for be in cfg.get("backends", [])
+            if members is None or be.get("id") in members
+        ]
+        if not self.backends:
+            raise ValueError("No backends configured for the router pool")
+        self.weights = {be["id"]: float((rcfg.get("weights") or {}).get(be["id"], 1.0)) for be in self.backends}
+        canary = rcfg.get("canary") or {}
+        self.canary_id: Optional[str] = canary.get("backend")
+        self.canary_fraction = float(canary.get("fraction", 0.05))
+        self.alpha = float(rcfg.get("ewma_alpha", DEFAULT_EWMA_ALPHA))
+        self.affinity = AffinitySettings.from_config(cfg)
+        self.ring = HashRing(self.weights, self.affinity.vnodes) if self.strategy == "prefix" else None
+        self.in_flight: Dict[str, int] = {be["id"]: 0 for be in self.backends}
+        self.health_interval = float(rcfg.get("health_check_interval_ms", 5000)) / 1000.0
+        self.healthy: Dict[str, bool] = {be["id"]: True for be in self.backends}
+        self.ewma: Dict[str, Optional[float]] = {be["id"]: None for be in self.backends}
+        self._rr = itertools.count()
+        self._rng = rng or random.Random()
+        self._health_task: Optional[asyncio.Task] = None
+
+    def _candidates(self, exclude: Iterable[str]) -> List[Dict[str, Any]]:
+        skip = set(exclude)
+        live = [be for be in self.backends if be["id"] not in skip]
+        healthy = [be for be in live if self.healthy[be["id"]]]
+        return healthy or live
+
+    def key_for(
+        self, system: str, user: str, messages: Optional[List[Dict[str, str]]] = None, affinity: Optional[str] = None
+    ) -> Optional[str]:
+        """``pick`` key for a request under the ``prefix`` strategy (None for the others)."""
+        if self.ring is None:
+            return None
+        return affinity or affinity_key(system, messages, user, self.affinity.key)
+
+    def pick(self, exclude: Iterable[str] = (), key: Optional[str] = None) -> Dict[str, Any]:
+        """Choose a backend; ``exclude`` holds ids that already failed this request,
+        ``key`` is its affinity key for the ``prefix`` strategy."""
+        cands = self._candidates(exclude)
+        if not cands:
+            raise NoHealthyBackend("All backends failed for this request")
+        if self.ring is not None and key is not None:
+            chosen = self.ring.pick(key, [be["id"] for be in cands], self.in_flight, self.affinity.load_factor)
+            be = next(b for b in cands if b["id"] == chosen)
+        elif self.strategy == "weighted":
+            weights = [self.weights[be["id"]] for be in cands]
+            be = self._rng.choices(cands, weights=weights)[0] if sum(weights) > 0 else cands[0]
+        elif self.strategy == "latency":
+            be = min(cands, key=lambda b: (self.ewma[b["id"]] or 0.0, self._rng.random()))
+        elif self.strategy == "canary" and self.canary_id:
+            canary = [be for be in cands if be["id"] == self.canary_id]
+            stable = [be for be in cands if be["id"] != self.canary_id]
+            if canary and (not stable or self._rng.random() < self.canary_fraction):
+                be = canary[0]
+            else:
+                be = stable[next(self._rr) % len(stable)]
+        else:
+            be = cands[next(self._rr) % len(cands)]
+        return dict(be, headers=dict(be.get("headers") or {}))
+
+    def observe(self, backend_id: str, latency_s: float) -> None:
+        if backend_id not in self.ewma:
+            return
+        prev = self.ewma[backend_id]
+        self.ewma[backend_id] = latency_s if prev is None else self.alpha * latency_s + (1 - self.alpha) * prev
+        self.healthy[backend_id] = True
+
+    def acquire(self, backend_id: str) -> None:
+        """Count a request in flight on ``backend_id`` (for bounded-load picks)."""
+        if backend_id in self.in_flight:
+            self.in_flight[backend_id] += 1
+
+    def release(self, backend_id: str) -> None:
+        if self.in_flight.get(backend_id):
+            self.in_flight[backend_id] -= 1
+
+    def mark_down(self, backend_id: str) -> None:
+        if backend_id in self.healthy:
+            self.healthy[backend_id] = False
+
+    async def probe(self, client: Any) -> None:
+        """Check every member once; any HTTP answer below 500 counts as up."""
+
+        async def one(be: Dict[str, Any]) -> None:
+            try:
+                resp = await client.get(health_url(be), headers=be.get("headers") or {}, timeout=min(be["timeout"], 5.0))
+                self.healthy[be["id"]] = resp.status_code < 500
+            except Exception:
+                self.healthy[be["id"]] = False
+
+        await asyncio.gather(*(one(be) for be in self.backends))
+
+    def start_health_checks(self, client: Any) -> None:
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop(client))
+
+    async def _health_loop(self, client: Any) -> None:
+        while True:
+            await self.probe(client)
+            await asyncio.sleep(self.health_interval)
+
+    async def stop(self) -> None:
+        task, self._health_task = self._health_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "id": be["id"],
+                "healthy": self.healthy[be["id"]],
+                "ewma_ms": None if self.ewma[be["id"]] is None else round(self.ewma[be["id"]] * 1000, 2),
+                "weight": self.weights[be["id"]],
+                "in_flight": self.in_flight[be["id"]],
+            }
+            for be in self.backends
+        ]
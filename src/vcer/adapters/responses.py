@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..core import trace
+from ..core.cache import ResultCache, cache_key
+
+DEFAULT_TTL_S = 300.0
+DEFAULT_MEMORY_MB = 64
+
+
+def request_key(be: Dict[str, Any], payload: Dict[str, Any]) -> str:
+    """Canonical key for a built request: same backend, URL and payload → same key."""
+    blob = json.dumps(
+        {"backend": be.get("id"), "url": be.get("url"), "payload": payload},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+    )
+    return cache_key("response", blob, None)
+
+
+def is_repeatable(payload: Dict[str, Any]) -> bool:
+    """False when the payload samples (temperature > 0) without a seed.
+
+    Sampling parameters sit at the top level, or under ``options`` for Ollama.
+    """
+    seeded = payload.get("seed") is not None
+    for params in (payload, payload.get("options") or {}):
+        if params.get("temperature") and not (seeded or params.get("seed") is not None):
+            return False
+    return True
+
+
+class ResponseCache:
+    """Backend responses: in-memory LRU (bounded by bytes) in front of ``ResultCache``.
+
+    Entries expire after ``ttl`` seconds in both tiers. ``fetch`` also
+    coalesces identical requests: while one is in flight, later callers await
+    its result instead of sending their own. Failures are shared with the
+    waiting callers but never stored.
+    """
+
+    def __init__(
+        self,
+        disk: Optional[ResultCache] = None,
+        ttl: float = DEFAULT_TTL_S,
+        max_bytes: int = DEFAULT_MEMORY_MB * 1024 * 1024,
+    ) -> None:
+        self.disk = disk
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # values are kept serialized, so callers each get their own copy;
+        # entries are (expires, value, UTF-8 size in bytes)
+        self._mem: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, "asyncio.Future[str]"] = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any], disk: Optional[ResultCache] = None) -> "ResponseCache":
+        rc = (cfg.get("router") or {}).get("response_cache") or {}
+        return cls(
+            disk,
+            ttl=float(rc.get("ttl_s", DEFAULT_TTL_S)),
+            max_bytes=int(float(rc.get("max_mb", DEFAULT_MEMORY_MB)) * 1024 * 1024),
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        entry = self._mem.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._mem.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[1])
+            self._drop(key)
+        raw = self.disk.get(key) if self.disk is not None else None
+        if raw is not None:
+            stored = json.loads(raw)
+            if stored["expires"] > now:
+                self.disk_hits += 1
+                value = json.dumps(stored["response"], ensure_ascii=False)
+                self._remember(key, stored["expires"], value)
+                return stored["response"]
+        return None
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        self._store(key, json.dumps(response, ensure_ascii=False))
+
+    def _store(self, key: str, value: str) -> None:
+        expires = time.time() + self.ttl
+        self._remember(key, expires, value)
+        if self.disk is not None:
+            self.disk.put(key, '{"expires": %r, "response": %s}' % (expires, value))
+
+    def _remember(self, key: str, expires: float, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._mem[key] = (expires, value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._mem)))
+
+    def _drop(self, key: str) -> None:
+        entry = self._mem.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    async def fetch(
+        self,
+        key: str,
+        call: Callable[[], Awaitable[Dict[str, Any]]],
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Cached response for ``key``, else the result of ``call()``.
+
+        ``meta`` (if given) receives ``cache``: ``hit``, ``coalesced`` or ``miss``.
+        """
+        meta = meta if meta is not None else {}
+        cached = self.get(key)
+        if cached is not None:
+            meta["cache"] = "hit"
+            trace.count("response_cache.hits")
+            return cached
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            meta["cache"] = "coalesced"
+            trace.count("response_cache.coalesced")
+            return json.loads(await asyncio.shield(pending))
+
+        self.misses += 1
+        meta["cache"] = "miss"
+        trace.count("response_cache.misses")
+        fut: "asyncio.Future[str]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            response = await call()
+        except BaseException as e:
+            fut.set_exception(e if isinstance(e, Exception) else RuntimeError("coalesced request was cancelled"))
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            value = json.dumps(response, ensure_ascii=False)
+            self._store(key, value)
+            fut.set_result(value)
+            return response
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.coalesced + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else None,
+            "memory_entries": len(self._mem),
+            "memory_bytes": self._bytes,
+            "in_flight": len(self._inflight),
+        }
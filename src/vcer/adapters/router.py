@@ -1,6 +1,23 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from ..core import trace
+
+DEFAULT_TIMEOUT_MS = 60000
+MESSAGE_ROLES = ("system", "user", "assistant", "tool")
+# kinds whose servers take a list of prompts in one call (sglang /generate, OpenAI /v1/completions)
+BATCH_KINDS = ("sglang", "vllm", "openai")
+# speaker labels for backends that take one prompt string (sglang /generate)
+# sampling parameters every backend kind accepts, with the types they take
+SAMPLING_PARAMS: Dict[str, tuple] = {
+    "temperature": (int, float),
+    "top_p": (int, float),
+    "top_k": (int,),
+    "seed": (int,),
+    "stop": (str, list),
+}
+_TRANSCRIPT_LABELS = {"system": "System", "user": "User", "assistant": "Assistant", "tool": "Tool"}
 
 
 def load_backend(cfg: Dict[str, Any], backend: str) -> Dict[str, Any]:
@@ -13,12 +30,38 @@ def load_backend(cfg: Dict[str, Any], backend: str) -> Dict[str, Any]:
         if be.get("kind") == backend:
             return _normalize_backend(be)
     # default vllm style if nothing found
-    return {
-        "kind": "vllm",
-        "url": "http://localhost:8000/v1/chat/completions",
-        "model": "local-model",
-        "timeout": 60.0,
-    }
+    return _normalize_backend({"id": backend, "kind": "vllm"})
+
+
+HEALTH_PATHS = {
+    "vllm": "/health",
+    "sglang": "/health",
+    "ollama": "/api/tags",
+    "openai": "/v1/models",
+}
+
+
+def health_url(be: Dict[str, Any]) -> str:
+    base = be.get("base_url", "http://localhost:8000")
+    return base.rstrip("/") + HEALTH_PATHS.get(be.get("kind", "vllm"), "/health")
+
+
+def batch_url(be: Dict[str, Any]) -> str:
+    """Endpoint for batched prompts: sglang ``/generate`` itself, else ``/v1/completions``."""
+    if be.get("kind") == "sglang":
+        return be["url"]
+    return be.get("base_url", "http://localhost:8000").rstrip("/") + "/v1/completions"
+
+
+def timeout_for_url(cfg: Dict[str, Any], url: Optional[str]) -> float:
+    """Seconds to wait on ``url``: the ``timeout_ms`` of the configured backend
+    serving it, else ``router.timeout_ms``, else 60 s."""
+    if url:
+        for be in cfg.get("backends", []):
+            base = (be.get("base_url") or "").rstrip("/")
+            if base and url.startswith(base):
+                return float(be.get("timeout_ms", DEFAULT_TIMEOUT_MS)) / 1000.0
+    return float((cfg.get("router") or {}).get("timeout_ms", DEFAULT_TIMEOUT_MS)) / 1000.0
 
 
 def _normalize_backend(be: Dict[str, Any]) -> Dict[str, Any]:
@@ -34,14 +77,47 @@ def _normalize_backend(be: Dict[str, Any]) -> Dict[str, Any]:
         # Ollama chat endpoint
         url = base.rstrip("/") + "/api/chat"
     return {
+        "id": be.get("id", kind),
         "kind": kind,
+        "base_url": base,
         "url": url,
         "model": be.get("model", "local-model"),
-        "timeout": float(be.get("timeout_ms", 60000)) / 1000.0,
+        "timeout": float(be.get("timeout_ms", DEFAULT_TIMEOUT_MS)) / 1000.0,
         "headers": be.get("headers", {}),
+        "http2": bool(be.get("http2", False)),
+        "max_connections": be.get("max_connections"),
+        "cache": bool(be.get("cache", False)),
+        "batch": bool(be.get("batch", False)) and kind in BATCH_KINDS,
     }
 
 
+def check_messages(messages: Any) -> List[Dict[str, str]]:
+    """Validate a conversation history: ``[{"role", "content"}, ...]`` in order."""
+    if not isinstance(messages, list):
+        raise ValueError("messages must be a list of {role, content} objects")
+    out = []
+    for i, m in enumerate(messages):
+        if not isinstance(m, dict) or m.get("role") not in MESSAGE_ROLES or not isinstance(m.get("content"), str):
+            raise ValueError(f"messages[{i}] must be {{role, content}} with role one of {', '.join(MESSAGE_ROLES)}")
+        out.append({"role": m["role"], "content": m["content"]})
+    return out
+
+
+def check_sampling(sampling: Any) -> Dict[str, Any]:
+    """Validate sampling parameters: a mapping of ``SAMPLING_PARAMS`` names to values."""
+    if not isinstance(sampling, Mapping):
+        raise ValueError("sampling parameters must be an object")
+    unknown = set(sampling) - set(SAMPLING_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sampling parameter(s): {', '.join(sorted(unknown))} (expected {', '.join(SAMPLING_PARAMS)})")
+    for name, value in sampling.items():
+        if isinstance(value, bool) or not isinstance(value, SAMPLING_PARAMS[name]):
+            raise ValueError(f"{name} must be {' or '.join(t.__name__ for t in SAMPLING_PARAMS[name])}")
+        if name == "stop" and isinstance(value, list) and not all(isinstance(v, str) for v in value):
+            raise ValueError("stop must be a str or a list of str")
+    return dict(sampling)
+
+
 def build_request(
     *,
     system: str,
@@ -49,32 +125,98 @@ def build_request(
     backend: Dict[str, Any],
     stream: bool = False,
     max_tokens: int = 1024,
+    messages: Optional[Sequence[Dict[str, str]]] = None,
+    sampling: Optional[Mapping[str, Any]] = None,
 ) -> Dict[str, Any]:
+    """Request body for ``backend``'s kind.
+
+    ``messages`` is the conversation so far (earlier user and assistant
+    turns); it goes between the system prompt and ``user``, the new turn,
+    which may be empty when the history already ends with it. The earlier
+    turns are sent unchanged on every call, so the shared prefix stays
+    byte-identical for the server's prefix cache. Pass ``messages=[]`` on a
+    conversation's first turn so that sglang's prompt already has the
+    transcript form later turns extend. ``sampling`` (see ``check_sampling``)
+    is added where each kind expects it; Ollama takes it under ``options``.
+    """
     kind = backend.get("kind")
-    if kind in ("vllm", "openai"):
-        return _build_openai_chat_completions(system, user, backend, stream, max_tokens)
-    if kind == "sglang":
-        return _build_sglang_generate(system, user, backend, stream, max_tokens)
-    if kind == "ollama":
-        return _build_ollama_chat(system, user, backend, stream, max_tokens)
-    # fallback OpenAI style
-    return _build_openai_chat_completions(system, user, backend, stream, max_tokens)
+    history = None if messages is None else list(messages)
+    with trace.span("request.build", kind=kind):
+        if kind in ("vllm", "openai"):
+            payload = _build_openai_chat_completions(system, user, backend, stream, max_tokens, history)
+        elif kind == "sglang":
+            payload = _build_sglang_generate(system, user, backend, stream, max_tokens, history)
+        elif kind == "ollama":
+            payload = _build_ollama_chat(system, user, backend, stream, max_tokens, history)
+            payload["options"].update(sampling or {})
+            return payload
+        else:
+            # fallback OpenAI style
+            payload = _build_openai_chat_completions(system, user, backend, stream, max_tokens, history)
+        payload.update(sampling or {})
+        return payload
 
 
-def _build_openai_chat_completions(system: str, user: str, backend: Dict[str, Any], stream: bool, max_tokens: int) -> Dict[str, Any]:
-    return {
-        "model": backend.get("model"),
-        "messages": [
+def _chat_messages(system: str, user: str, history: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+    if history is None:
+        return [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
-        ],
+        ]
+    out = [{"role": "system", "content": system}] if system else []
+    out += history
+    if user:
+        out.append({"role": "user", "content": user})
+    return out
+
+
+def _build_openai_chat_completions(
+    system: str, user: str, backend: Dict[str, Any], stream: bool, max_tokens: int, history: Optional[List[Dict[str, str]]]
+) -> Dict[str, Any]:
+    return {
+        "model": backend.get("model"),
+        "messages": _chat_messages(system, user, history),
         "stream": stream,
         "max_tokens": max_tokens,
     }
 
 
-def _build_sglang_generate(system: str, user: str, backend: Dict[str, Any], stream: bool, max_tokens: int) -> Dict[str, Any]:
-    prompt = system + "\n\n" + user
+def _transcript(system: str, user: str, history: List[Dict[str, str]]) -> str:
+    # each call's prompt extends the previous turn's, so the cached prefix matches
+    blocks = [system] if system else []
+    blocks += [f"{_TRANSCRIPT_LABELS[m['role']]}: {m['content']}" for m in history]
+    if user:
+        blocks.append(f"User: {user}")
+    return "\n\n".join(blocks) + "\n\nAssistant:"
+
+
+def build_prompt(system: str, user: str, messages: Optional[Sequence[Dict[str, str]]] = None) -> str:
+    """The single prompt string sent where there is no chat API (sglang, batched completions)."""
+    return system + "\n\n" + user if messages is None else _transcript(system, user, list(messages))
+
+
+def build_batch_request(
+    *, prompts: List[str], backend: Dict[str, Any], max_tokens: int = 1024, sampling: Optional[Mapping[str, Any]] = None
+) -> Dict[str, Any]:
+    """One request body carrying ``prompts`` for ``batch_url(backend)``.
+
+    Chat backends are batched through plain completions, so the model's
+    chat template is not applied; backends opt in with ``batch: true``.
+    """
+    kind = backend.get("kind")
+    with trace.span("request.build", kind=kind, batch=len(prompts)):
+        if kind == "sglang":
+            payload = {"model": backend.get("model"), "prompt": prompts, "stream": False, "max_new_tokens": max_tokens}
+        else:
+            payload = {"model": backend.get("model"), "prompt": prompts, "stream": False, "max_tokens": max_tokens}
+        payload.update(sampling or {})
+        return payload
+
+
+def _build_sglang_generate(
+    system: str, user: str, backend: Dict[str, Any], stream: bool, max_tokens: int, history: Optional[List[Dict[str, str]]]
+) -> Dict[str, Any]:
+    prompt = build_prompt(system, user, history)
     return {
         "model": backend.get("model"),
         "prompt": prompt,
@@ -83,14 +225,13 @@ def _build_sglang_generate(system: str, user: str, backend: Dict[str, Any], stre
     }
 
 
-def _build_ollama_chat(system: str, user: str, backend: Dict[str, Any], stream: bool, max_tokens: int) -> Dict[str, Any]:
+def _build_ollama_chat(
+    system: str, user: str, backend: Dict[str, Any], stream: bool, max_tokens: int, history: Optional[List[Dict[str, str]]]
+) -> Dict[str, Any]:
     # Ollama chat API
     return {
         "model": backend.get("model"),
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
+        "messages": _chat_messages(system, user, history),
         "stream": stream,
         "options": {
             "num_predict": max_tokens,
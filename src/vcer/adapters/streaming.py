@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+
+class StreamError(RuntimeError):
+    pass
+
+
+class _OpenAIDecoder:
+    """OpenAI/vLLM server-sent events: ``data: {...}`` chunks, ``data: [DONE]`` at the end."""
+
+    def __init__(self) -> None:
+        self.done = False
+
+    def feed(self, line: str) -> Optional[str]:
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            self.done = True
+            return None
+        obj = _loads(data)
+        choices = obj.get("choices") or [{}]
+        delta = choices[0].get("delta") or {}
+        # chat completions stream ``delta.content``; plain completions stream ``text``
+        return delta.get("content") or choices[0].get("text") or None
+
+
+class _OllamaDecoder:
+    """Ollama newline-delimited JSON: one object per line, ``done: true`` on the last."""
+
+    def __init__(self) -> None:
+        self.done = False
+
+    def feed(self, line: str) -> Optional[str]:
+        if not line.strip():
+            return None
+        obj = _loads(line)
+        if obj.get("done"):
+            self.done = True
+        return (obj.get("message") or {}).get("content") or obj.get("response") or None
+
+
+class _SglangDecoder:
+    """sglang ``/generate`` SSE: each event carries the cumulative ``text`` so far."""
+
+    def __init__(self) -> None:
+        self.done = False
+        self._seen = ""
+
+    def feed(self, line: str) -> Optional[str]:
+        if not line.startswith("data:"):
+            return None
+        data = line[5:].strip()
+        if data == "[DONE]":
+            self.done = True
+            return None
+        obj = _loads(data)
+        if isinstance(obj, list):  # batched prompt; stream the first
+            obj = obj[0] if obj else {}
+        text = obj.get("text") or ""
+        delta = text[len(self._seen):] if text.startswith(self._seen) else text
+        self._seen = text
+        return delta or None
+
+
+def _loads(data: str) -> Dict[str, Any]:
+    try:
+        obj = json.loads(data)
+    except json.JSONDecodeError as e:
+        raise StreamError(f"Malformed stream chunk: {data[:200]!r}") from e
+    if isinstance(obj, dict) and obj.get("error"):
+        raise StreamError(str(obj["error"]))
+    return obj
+
+
+def make_decoder(kind: str) -> Any:
+    if kind == "ollama":
+        return _OllamaDecoder()
+    if kind == "sglang":
+        return _SglangDecoder()
+    return _OpenAIDecoder()
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def to_ms(seconds: Optional[float], digits: int = 2) -> Optional[float]:
+    """Seconds as rounded milliseconds, passing ``None`` through."""
+    return None if seconds is None else round(seconds * 1000, digits)
+
+
+class StreamStats:
+    """Time to first token and inter-token latency for one streamed response.
+
+    Servers emit roughly one token per chunk, so chunk gaps are used as
+    inter-token latency.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.end: Optional[float] = None
+        self.chunks = 0
+        self.gaps: List[float] = []
+
+    def on_chunk(self) -> None:
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+        else:
+            self.gaps.append(now - self.last)
+        self.last = now
+        self.chunks += 1
+
+    def finish(self) -> None:
+        self.end = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        end = self.end or time.perf_counter()
+        decode = (self.last - self.first) if self.first is not None and self.chunks > 1 else None
+        return {
+            "ttft_ms": to_ms(None if self.first is None else self.first - self.start),
+            "total_ms": to_ms(end - self.start),
+            "chunks": self.chunks,
+            "itl_mean_ms": to_ms(sum(self.gaps) / len(self.gaps) if self.gaps else None),
+            "itl_p50_ms": to_ms(percentile(self.gaps, 0.5)),
+            "itl_p95_ms": to_ms(percentile(self.gaps, 0.95)),
+            "chunks_per_s": round((self.chunks - 1) / decode, 2) if decode else None,
+        }
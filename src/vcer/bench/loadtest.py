@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .synth import synth_prompt
+
+FORMAT_VERSION = 1
+MODES = ("closed", "open")
+KINDS = ("vllm", "sglang", "ollama", "openai")
+
+
+class LoadSettings:
+    """How to drive the backends.
+
+    ``closed``: ``concurrency`` workers each send their next request as soon
+    as the previous one returns. ``open``: requests arrive as a Poisson
+    process at ``rate`` per second regardless of how fast the backend
+    answers; ``concurrency`` then only caps requests in flight, and the
+    time an arrival waits for a slot counts toward its latency, so an
+    overloaded backend shows up as growing latency rather than a lower
+    send rate. The run stops after ``requests`` requests or, if set,
+    ``duration_s`` seconds.
+    """
+
+    __slots__ = ("mode", "concurrency", "rate", "requests", "duration_s", "warmup", "stream", "max_tokens", "seed")
+
+    def __init__(
+        self,
+        mode: str = "closed",
+        concurrency: int = 16,
+        rate: Optional[float] = None,
+        requests: int = 200,
+        duration_s: Optional[float] = None,
+        warmup: int = 0,
+        stream: bool = True,
+        max_tokens: int = 64,
+        seed: int = 0,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown load mode {mode!r}; choose from {', '.join(MODES)}")
+        if mode == "open" and not (rate and rate > 0):
+            raise ValueError("Open-loop load needs an arrival rate > 0 (requests per second)")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if requests < 1 and not duration_s:
+            raise ValueError("requests must be at least 1 (or set a duration)")
+        if duration_s is not None and duration_s <= 0:
+            raise ValueError("duration must be > 0 seconds")
+        self.mode = mode
+        self.concurrency = int(concurrency)
+        self.rate = float(rate) if rate else None
+        self.requests = int(requests)
+        self.duration_s = duration_s
+        self.warmup = max(0, int(warmup))
+        self.stream = stream
+        self.max_tokens = int(max_tokens)
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def mock_config(cfg: Dict[str, Any], backends: Sequence[str], base_url: str) -> Dict[str, Any]:
+    """``cfg`` with the targeted backends pointed at a mock server at ``base_url``.
+
+    Each keeps its id, kind and model, so requests are built exactly as for
+    the real server. Names not in the config are taken as a backend kind.
+    """
+    entries = [dict(be) for be in cfg.get("backends", [])]
+    wanted = set(backends)
+    if "auto" in wanted:
+        members = (cfg.get("router") or {}).get("pool")
+        wanted.update(members or (be.get("id") for be in entries))
+    for be in entries:
+        if be.get("id") in wanted or be.get("kind") in wanted:
+            be["base_url"] = base_url
+    known = {be.get("id") for be in entries} | {be.get("kind") for be in entries}
+    for name in sorted(wanted - known - {"auto"}):
+        entries.append({"id": name, "kind": name if name in KINDS else "vllm", "base_url": base_url})
+    return {**cfg, "backends": entries}
+
+
+def _output_tokens(resp: Dict[str, Any]) -> Optional[int]:
+    """Generated tokens as reported by each backend kind."""
+    if "stream" in resp:  # servers emit about one token per chunk
+        return resp["stream"]["chunks"]
+    usage = resp.get("usage") or {}
+    if "completion_tokens" in usage:  # OpenAI / vLLM
+        return int(usage["completion_tokens"])
+    batch = resp.get("batch") or {}
+    if (batch.get("usage") or {}).get("completion_tokens") is not None:  # batched completions: the mean share
+        return round(batch["usage"]["completion_tokens"] / batch["size"])
+    meta = resp.get("meta_info") or {}
+    if "completion_tokens" in meta:  # sglang
+        return int(meta["completion_tokens"])
+    if "eval_count" in resp:  # Ollama
+        return int(resp["eval_count"])
+    return None
+
+
+def _error_name(e: BaseException) -> str:
+    import httpx  # lazy import
+
+    if isinstance(e, httpx.HTTPStatusError):
+        return f"HTTP {e.response.status_code}"
+    return type(e).__name__
+
+
+class _Sample:
+    __slots__ = ("latency", "ttft", "tokens", "error", "backend")
+
+    def __init__(self, latency: float, ttft: Optional[float], tokens: Optional[int], error: Optional[str], backend: str) -> None:
+        self.latency = latency
+        self.ttft = ttft
+        self.tokens = tokens
+        self.error = error
+        self.backend = backend
+
+
+def _summarize(target: str, samples: List[_Sample], elapsed: float, max_in_flight: int, offered: Optional[float]) -> Dict[str, Any]:
+    from ..adapters.streaming import percentile, to_ms
+
+    ok = [s for s in samples if s.error is None]
+    errors: Dict[str, int] = {}
+    served: Dict[str, int] = {}
+    for s in samples:
+        if s.error is not None:
+            errors[s.error] = errors.get(s.error, 0) + 1
+        served[s.backend] = served.get(s.backend, 0) + 1
+
+    def dist(values: List[float]) -> Dict[str, Any]:
+        return {
+            "p50": to_ms(percentile(values, 0.5)),
+            "p95": to_ms(percentile(values, 0.95)),
+            "p99": to_ms(percentile(values, 0.99)),
+            "mean": to_ms(sum(values) / len(values) if values else None),
+            "max": to_ms(max(values) if values else None),
+        }
+
+    tokens = [s.tokens for s in ok if s.tokens is not None]
+    # per-request decode rate: tokens after the first over the time after the first
+    decode = [
+        (s.tokens - 1) / (s.latency - s.ttft)
+        for s in ok
+        if s.ttft is not None and s.tokens and s.tokens > 1 and s.latency > s.ttft
+    ]
+    return {
+        "backend": target,
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": len(samples) - len(ok),
+        "error_rate": round((len(samples) - len(ok)) / len(samples), 4) if samples else None,
+        "errors_by_type": errors,
+        "served_by": served,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "offered_rps": offered,
+        "max_in_flight": max_in_flight,
+        "latency_ms": dist([s.latency for s in ok]),
+        "ttft_ms": dist([s.ttft for s in ok if s.ttft is not None]),
+        "output_tokens": sum(tokens),
+        "tokens_per_s": round(sum(tokens) / elapsed, 1) if elapsed else None,
+        "decode_tokens_per_s_p50": None if not decode else round(percentile(decode, 0.5), 1),
+    }
+
+
+async def load_target(
+    router: Any,
+    target: str,
+    settings: LoadSettings,
+    system: str,
+    user: str,
+) -> Dict[str, Any]:
+    """Drive ``target`` (a backend id or kind, or ``auto``) through ``router`` per ``settings``."""
+    samples: List[_Sample] = []
+    in_flight = peak = 0
+
+    async def one(scheduled: float, record: bool = True) -> None:
+        nonlocal in_flight, peak
+        call_start = time.perf_counter()
+        meta: Dict[str, Any] = {"backend": target}
+        in_flight += 1
+        peak = max(peak, in_flight)
+        ttft = tokens = error = None
+        try:
+            resp = await router.route(
+                system, user, target, stream=settings.stream, max_tokens=settings.max_tokens, meta=meta, cache=False,
+            )
+        except Exception as e:
+            error = _error_name(e)
+        else:
+            tokens = _output_tokens(resp)
+            first = (resp.get("stream") or {}).get("ttft_ms")
+            if first is not None:
+                ttft = (call_start - scheduled) + first / 1000.0
+        finally:
+            in_flight -= 1
+        if record:
+            samples.append(_Sample(time.perf_counter() - scheduled, ttft, tokens, error, meta["backend"]))
+
+    if settings.warmup:
+        # open connections (and load the model) outside the measurement
+        await asyncio.gather(*(one(time.perf_counter(), record=False) for _ in range(settings.warmup)))
+        peak = 0
+
+    start = time.perf_counter()
+    deadline = start + settings.duration_s if settings.duration_s else None
+    budget = None if deadline else settings.requests
+
+    def more(sent: int, at: float) -> bool:
+        return at < deadline if deadline is not None else sent < budget
+
+    sent = 0
+    window = 0.0
+    if settings.mode == "closed":
+
+        async def worker() -> None:
+            nonlocal sent
+            while more(sent, time.perf_counter()):
+                sent += 1
+                await one(time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(settings.concurrency)))
+    else:
+        rng = random.Random(settings.seed)
+        tasks: set[asyncio.Task] = set()
+        at = start
+        while more(sent, at):
+            delay = at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(one(at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+            at += rng.expovariate(settings.rate)
+        window = at - start
+        if tasks:
+            await asyncio.gather(*tasks)
+    offered = round(sent / window, 2) if settings.mode == "open" and window > 0 else None
+    return _summarize(target, samples, time.perf_counter() - start, peak, offered)
+
+
+def run_loadtest(
+    cfg: Dict[str, Any],
+    backends: Sequence[str],
+    settings: LoadSettings,
+    *,
+    system: Optional[str] = None,
+    user: str = "Hello",
+    prompt_bytes: int = 4096,
+    mock: Optional[Dict[str, Any]] = None,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """Load each of ``backends`` in turn; returns the JSON-ready report.
+
+    Without ``system`` a synthetic prompt of ``prompt_bytes`` is sent.
+    ``mock`` (``MockBackend`` options) starts a local mock server and
+    points the targeted backends at it, so a run needs no real server.
+    """
+    if not backends:
+        raise ValueError("No backends to load")
+    say = progress or (lambda msg: None)
+    system = system if system is not None else synth_prompt(prompt_bytes, settings.seed)
+
+    async def _run() -> List[Dict[str, Any]]:
+        from ..adapters.client import AsyncRouter
+
+        server = None
+        run_cfg = cfg
+        if mock is not None:
+            from .mock import run_mock
+
+            server, _, url = await run_mock(**mock)
+            run_cfg = mock_config(cfg, backends, url)
+            say(f"mock backend on {url}")
+        results = []
+        try:
+            for target in backends:
+                say(f"{target}: {settings.mode} loop")
+                async with AsyncRouter(run_cfg, concurrency=settings.concurrency) as router:
+                    results.append(await load_target(router, target, settings, system, user))
+        finally:
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+        return results
+
+    results = asyncio.run(_run())
+    return {
+        "format": FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": settings.as_dict(),
+        "prompt_bytes": len(system.encode("utf-8")),
+        "mock": mock,
+        "results": results,
+    }
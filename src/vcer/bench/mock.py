@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+from ..server.httpd import HTTPError, Request, Response, StreamResponse, json_response, serve
+
+# every backend kind at its usual path: OpenAI/vLLM, sglang, Ollama
+CHAT_PATHS = ("/v1/chat/completions",)
+COMPLETION_PATHS = ("/v1/completions",)
+SGLANG_PATHS = ("/generate",)
+OLLAMA_PATHS = ("/api/chat", "/api/generate")
+
+
+class MockBackend:
+    """Local stand-in for vLLM/OpenAI, sglang and Ollama servers.
+
+    Replies ``tokens`` canned words after ``latency_ms`` (time to first
+    token), then ``token_ms`` per further token; streamed requests receive
+    the tokens as they are "generated", in each server's own wire format.
+    Prompt lists (sglang ``/generate``, OpenAI ``/v1/completions``) get one
+    result per prompt.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, token_ms: float = 0.0, tokens: int = 16, model: str = "mock") -> None:
+        self.latency = latency_ms / 1000.0
+        self.token_delay = token_ms / 1000.0
+        self.tokens = tokens
+        self.model = model
+        self.requests = 0
+
+    def _words(self, n: Optional[int]) -> List[str]:
+        n = self.tokens if n is None else max(1, min(int(n), self.tokens))
+        return [f"tok{i} " for i in range(n)]
+
+    async def _wait(self, words: List[str]) -> None:
+        delay = self.latency + self.token_delay * (len(words) - 1)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def __call__(self, req: Request) -> Union[Response, StreamResponse]:
+        if req.method == "GET":
+            if req.path in ("/health", "/health_generate"):
+                return Response("ok")
+            if req.path == "/v1/models":
+                return json_response({"object": "list", "data": [{"id": self.model, "object": "model"}]})
+            if req.path == "/api/tags":
+                return json_response({"models": [{"name": self.model, "model": self.model}]})
+            raise HTTPError(404, f"No route for GET {req.path}")
+        if req.method != "POST":
+            raise HTTPError(405, f"Method {req.method} not allowed")
+        body = req.json()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        self.requests += 1
+        if req.path in CHAT_PATHS or req.path in COMPLETION_PATHS:
+            return await self._openai(body, chat=req.path in CHAT_PATHS)
+        if req.path in SGLANG_PATHS:
+            return await self._sglang(body)
+        if req.path in OLLAMA_PATHS:
+            return await self._ollama(body, chat=req.path == "/api/chat")
+        raise HTTPError(404, f"No route for POST {req.path}")
+
+    async def _stream(self, words: List[str], encode: Callable[[int, str], bytes], tail: bytes) -> AsyncIterator[bytes]:
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        for i, word in enumerate(words):
+            if i and self.token_delay > 0:
+                await asyncio.sleep(self.token_delay)
+            yield encode(i, word)
+        yield tail
+
+    async def _openai(self, body: Dict[str, Any], chat: bool) -> Union[Response, StreamResponse]:
+        words = self._words(body.get("max_tokens"))
+        created = int(time.time())
+        base = {"id": f"mock-{self.requests}", "created": created, "model": body.get("model") or self.model}
+        if body.get("stream"):
+            def encode(i: int, word: str) -> bytes:
+                choice = {"index": 0, "delta": {"content": word}} if chat else {"index": 0, "text": word}
+                return b"data: " + json.dumps({**base, "choices": [choice]}).encode() + b"\n\n"
+
+            return StreamResponse(self._stream(words, encode, b"data: [DONE]\n\n"), content_type="text/event-stream")
+        await self._wait(words)
+        text = "".join(words)
+        prompts = body.get("prompt") if isinstance(body.get("prompt"), list) else [None]
+        if chat:
+            choices = [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}]
+        else:
+            choices = [{"index": i, "text": text, "finish_reason": "length"} for i in range(len(prompts))]
+        usage = {"prompt_tokens": 0, "completion_tokens": len(words) * len(choices), "total_tokens": len(words) * len(choices)}
+        return json_response({**base, "object": "chat.completion" if chat else "text_completion", "choices": choices, "usage": usage})
+
+    async def _sglang(self, body: Dict[str, Any]) -> Union[Response, StreamResponse]:
+        words = self._words((body.get("sampling_params") or {}).get("max_new_tokens", body.get("max_new_tokens")))
+        prompt = body.get("text", body.get("prompt"))
+        if body.get("stream"):
+            def encode(i: int, word: str) -> bytes:
+                # sglang streams the cumulative text
+                return b"data: " + json.dumps({"text": "".join(words[:i + 1])}).encode() + b"\n\n"
+
+            return StreamResponse(self._stream(words, encode, b"data: [DONE]\n\n"), content_type="text/event-stream")
+        await self._wait(words)
+        result = {"text": "".join(words), "meta_info": {"completion_tokens": len(words), "finish_reason": {"type": "length"}}}
+        if isinstance(prompt, list):
+            return json_response([result for _ in prompt])
+        return json_response(result)
+
+    async def _ollama(self, body: Dict[str, Any], chat: bool) -> Union[Response, StreamResponse]:
+        words = self._words((body.get("options") or {}).get("num_predict"))
+        model = body.get("model") or self.model
+
+        def message(text: str, done: bool) -> Dict[str, Any]:
+            msg: Dict[str, Any] = {"model": model, "done": done}
+            if chat:
+                msg["message"] = {"role": "assistant", "content": text}
+            else:
+                msg["response"] = text
+            if done:
+                msg["eval_count"] = len(words)
+            return msg
+
+        if body.get("stream", True):  # Ollama streams unless told not to
+            def encode(i: int, word: str) -> bytes:
+                return json.dumps(message(word, False)).encode() + b"\n"
+
+            tail = json.dumps(message("", True)).encode() + b"\n"
+            return StreamResponse(self._stream(words, encode, tail), content_type="application/x-ndjson")
+        await self._wait(words)
+        return json_response(message("".join(words), True))
+
+
+async def run_mock(host: str = "127.0.0.1", port: int = 0, **options: Any) -> tuple[asyncio.AbstractServer, MockBackend, str]:
+    """Start a ``MockBackend`` server; ``port=0`` picks a free port. Returns the server, the backend and its base URL."""
+    backend = MockBackend(**options)
+    server = await serve(backend, host, port)
+    bound = server.sockets[0].getsockname()
+    return server, backend, f"http://{bound[0]}:{bound[1]}"
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# wall-clock budget per invocation, interpreter start included
+STARTUP_TARGETS_MS: Dict[str, float] = {
+    "--help": 100.0,
+    "dry-run": 100.0,
+}
+
+
+def _vcer(*args: str) -> List[str]:
+    return [sys.executable, "-m", "vcer", *args]
+
+
+def measure_startup(runs: int = 10, targets: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Time ``vcer --help`` and ``vcer dry-run`` in fresh processes."""
+    targets = targets or STARTUP_TARGETS_MS
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        system = Path(tmp) / "system.md"
+        user = Path(tmp) / "user.md"
+        system.write_text("## Task\nSay hello.\n", encoding="utf-8")
+        user.write_text("Hello?\n", encoding="utf-8")
+        commands = {
+            "--help": _vcer("--help"),
+            "dry-run": _vcer("dry-run", "--system", str(system), "--user", str(user)),
+        }
+        for name, argv in commands.items():
+            subprocess.run(argv, capture_output=True, check=True)  # warm .pyc and the OS cache
+            samples = []
+            for _ in range(runs):
+                t0 = time.perf_counter()
+                subprocess.run(argv, capture_output=True, check=True)
+                samples.append((time.perf_counter() - t0) * 1000)
+            target = targets.get(name)
+            best = min(samples)
+            results.append({
+                "command": name,
+                "min_ms": round(best, 1),
+                "median_ms": round(statistics.median(samples), 1),
+                "target_ms": target,
+                "ok": target is None or best <= target,
+            })
+    return results
+
+
+def profile_imports(argv: List[str], top: int = 25) -> int:
+    """Run ``vcer <argv>`` under ``-X importtime`` and summarize the slowest imports."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "vcer", *argv], capture_output=True, text=True)
+    sys.stdout.write(proc.stdout)
+    rows = []
+    other_stderr = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            other_stderr.append(line)
+            continue
+        if "self [us]" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cum_us), int(self_us), name.strip(), depth))
+    if other_stderr:
+        sys.stderr.write("\n".join(other_stderr) + "\n")
+    total = sum(cum for cum, _, _, depth in rows if depth == 0)
+    sys.stderr.write(f"\nimport profile: {len(rows)} modules, {total / 1000:.1f} ms in top-level imports\n")
+    sys.stderr.write(f"{'cumulative ms':>14} {'self ms':>9}  module\n")
+    for cum, self_us, name, _ in sorted(rows, reverse=True)[:top]:
+        sys.stderr.write(f"{cum / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}\n")
+    return proc.returncode
+
+
+def main() -> None:
+    results = measure_startup()
+    print(json.dumps(results, indent=2))
+    if not all(r["ok"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
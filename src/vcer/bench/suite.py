@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .synth import format_size, synth_prompt
+
+FORMAT_VERSION = 1
+CASES = (
+    "extract_parts",
+    "optimize_parts",
+    "render_markdown",
+    "parts_to_mermaid",
+    "semantic_parts_to_mermaid",
+    "build_request",
+    "route",
+)
+BACKEND_KINDS = ("vllm", "sglang", "ollama", "openai")
+DEFAULT_SIZES = (64 * 1024, 1024 * 1024, 16 * 1024 * 1024)
+DEFAULT_THRESHOLD = 0.2
+# the settings the suite optimizes with, independent of the local .vcer.yml
+BENCH_CFG: Dict[str, Any] = {"limits": {"max_context_tokens": 120000, "max_examples": 8}}
+# system prompt size for the route cases
+ROUTE_PROMPT_BYTES = 16 * 1024
+
+# keep sampling a case for at least this long (but never fewer than MIN_RUNS times)
+MIN_TIME_S = 0.5
+MIN_RUNS = 3
+MAX_RUNS = 1000
+
+
+def _time(fn: Callable[[], Any], min_runs: int = MIN_RUNS) -> List[float]:
+    samples: List[float] = []
+    start = time.perf_counter()
+    while len(samples) < min_runs or (time.perf_counter() - start < MIN_TIME_S and len(samples) < MAX_RUNS):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _timed(case: str, param: str, fn: Callable[[], Any], nbytes: Optional[int] = None) -> Dict[str, Any]:
+    samples = _time(fn)
+    best = min(samples)
+    result: Dict[str, Any] = {
+        "id": f"{case}[{param}]",
+        "case": case,
+        "param": param,
+        "runs": len(samples),
+        "min_ms": round(best * 1000, 3),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "metric": "min_ms",
+        "better": "lower",
+    }
+    if nbytes is not None:
+        result["bytes"] = nbytes
+        result["mb_per_s"] = round(nbytes / best / 1e6, 2) if best else None
+    return result
+
+
+def bench_pipeline(size: int, seed: int = 0, only: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """Extraction, optimization and rendering of one synthetic prompt of ``size`` bytes."""
+    from ..adapters.router import _normalize_backend, build_request
+    from ..core.analyzer import DEFAULT_DETECTORS, _extract_parts
+    from ..core.optimizer import optimize_parts, render_markdown
+    from ..visualize.mermaid import parts_to_mermaid, semantic_parts_to_mermaid
+
+    wanted = set(only or CASES)
+    label = format_size(size)
+    text = synth_prompt(size, seed)
+    nbytes = len(text.encode("utf-8"))
+    parts = _extract_parts(text, DEFAULT_DETECTORS)
+    data = {"parts": parts}
+    results = []
+    if "extract_parts" in wanted:
+        results.append(_timed("extract_parts", label, lambda: _extract_parts(text, DEFAULT_DETECTORS), nbytes))
+    if "optimize_parts" in wanted:
+        results.append(_timed("optimize_parts", label, lambda: optimize_parts(data, BENCH_CFG), nbytes))
+    if "render_markdown" in wanted:
+        results.append(_timed("render_markdown", label, lambda: render_markdown(parts), nbytes))
+    if "parts_to_mermaid" in wanted:
+        results.append(_timed("parts_to_mermaid", label, lambda: parts_to_mermaid(data, {}), nbytes))
+    if "semantic_parts_to_mermaid" in wanted:
+        categories = ("1.1 Persona", "2.1 Retrieved Context", "3.1 Output Format", "Miscellaneous")
+        items = [{"category": categories[i % len(categories)], "content": p["content"]} for i, p in enumerate(parts)]
+        results.append(_timed("semantic_parts_to_mermaid", label, lambda: semantic_parts_to_mermaid(items, {}), nbytes))
+    if "build_request" in wanted:
+        for kind in BACKEND_KINDS:
+            be = _normalize_backend({"id": kind, "kind": kind})
+            results.append(_timed(
+                "build_request", f"{kind},{label}",
+                lambda: build_request(system=text, user="Hello", backend=be, max_tokens=256),
+            ))
+    for r in results:
+        r["size"] = label
+    return results
+
+
+async def bench_route(kind: str, requests: int = 200, concurrency: int = 16, latency_ms: float = 0.0, seed: int = 0) -> Dict[str, Any]:
+    """End-to-end ``AsyncRouter.route`` throughput against an in-process ``MockBackend``.
+
+    Client and mock share the event loop, so with ``latency_ms=0`` this
+    measures the routing overhead per request (build, serialize, HTTP, parse).
+    """
+    from ..adapters.client import AsyncRouter
+    from ..adapters.streaming import percentile, to_ms
+    from .mock import run_mock
+
+    server, mock, url = await run_mock(latency_ms=latency_ms)
+    cfg = {"backends": [{"id": f"mock-{kind}", "kind": kind, "base_url": url, "model": "mock"}], "router": {"concurrency": concurrency}}
+    system = synth_prompt(ROUTE_PROMPT_BYTES, seed)
+    latencies: List[float] = []
+    errors = 0
+    try:
+        async with AsyncRouter(cfg) as router:
+
+            async def one() -> None:
+                nonlocal errors
+                t0 = time.perf_counter()
+                try:
+                    await router.route(system, "Hello", f"mock-{kind}", max_tokens=16)
+                except Exception:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - t0)
+
+            remaining = requests
+
+            async def worker() -> None:
+                # closed loop: latencies are per request in flight, not time queued behind the limit
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    await one()
+
+            # open the pooled connections outside the measurement
+            await asyncio.gather(*(one() for _ in range(concurrency)))
+            latencies.clear()
+            errors = 0
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+    finally:
+        server.close()
+        await server.wait_closed()
+    return {
+        "id": f"route[{kind}]",
+        "case": "route",
+        "param": kind,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1) if elapsed else None,
+        "p50_ms": to_ms(percentile(latencies, 0.5), 3),
+        "p95_ms": to_ms(percentile(latencies, 0.95), 3),
+        "metric": "rps",
+        "better": "higher",
+    }
+
+
+def run_suite(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    *,
+    only: Optional[Sequence[str]] = None,
+    requests: int = 200,
+    concurrency: int = 16,
+    latency_ms: float = 0.0,
+    seed: int = 0,
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """Run the selected ``CASES``; returns the JSON-ready report."""
+    wanted = list(only or CASES)
+    unknown = [c for c in wanted if c not in CASES]
+    if unknown:
+        raise ValueError(f"Unknown bench case(s) {', '.join(unknown)}; choose from {', '.join(CASES)}")
+    say = progress or (lambda msg: None)
+    results: List[Dict[str, Any]] = []
+    if any(c != "route" for c in wanted):
+        for size in sizes:
+            say(f"pipeline {format_size(size)}")
+            results += bench_pipeline(size, seed, wanted)
+    if "route" in wanted:
+        for kind in BACKEND_KINDS:
+            say(f"route {kind}")
+            results.append(asyncio.run(bench_route(kind, requests, concurrency, latency_ms, seed)))
+    return {
+        "format": FORMAT_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """Each result against the baseline's result with the same ``id``.
+
+    ``change`` is the relative change of the case's metric, signed so that
+    positive is worse; beyond ``threshold`` the row is ``regressed``.
+    """
+    base = {r["id"]: r for r in baseline.get("results", [])}
+    rows = []
+    for r in report["results"]:
+        metric = r["metric"]
+        row: Dict[str, Any] = {"id": r["id"], "metric": metric, "current": r.get(metric)}
+        old = base.get(r["id"])
+        if old is None or not old.get(metric) or r.get(metric) is None:
+            row.update(baseline=None, change=None, status="new")
+        else:
+            ratio = r[metric] / old[metric]
+            change = ratio - 1 if r["better"] == "lower" else 1 / ratio - 1 if ratio else float("inf")
+            status = "regressed" if change > threshold else "improved" if change < -threshold else "ok"
+            row.update(baseline=old[metric], change=round(change, 4), status=status)
+        rows.append(row)
+    return rows
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import random
+import re
+from pathlib import Path
+from typing import Iterator, List
+
+# words for filler text; mixed scripts so byte and character counts differ, as in real prompts
+_WORDS = (
+    "the model should answer user request context section policy output format example input tool "
+    "retrieve document summary constraint priority evaluate response 한국어 응답 요약 지침 cache token "
+    "latency backend schema field value json markdown table list step plan verify result"
+).split()
+
+_HEADER_SECTIONS = ("Task", "Constraints", "Output Format")
+_TAG_SECTIONS = ("tools", "guardrails", "metadata", "retrieval")
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """``"64KB"``, ``"1.5MB"``, ``"200m"`` or plain bytes → bytes."""
+    m = _SIZE.match(text)
+    if not m:
+        raise ValueError(f"Invalid size {text!r}; use e.g. 64KB, 1MB, 200MB")
+    return int(float(m.group(1)) * _UNITS[m.group(2).lower()])
+
+
+def format_size(n: int) -> str:
+    for unit in ("GB", "MB", "KB"):
+        scale = _UNITS[unit[0].lower()]
+        if n >= scale and n % scale == 0:
+            return f"{n // scale}{unit}"
+    return f"{n}B"
+
+
+class PromptSynth:
+    """Deterministic header/tag-structured prompts of any size.
+
+    Output repeats a block of ``## Task`` / ``## Constraints`` /
+    ``## Output Format`` / ``## Examples`` sections and ``[part:...]`` tag
+    blocks, filled from a fixed pool of paragraphs, so every detector path
+    and the example splitter get exercised. Blocks are drawn from the pool
+    rather than built word by word, which keeps generation far faster than
+    the code under test even at hundreds of MB.
+    """
+
+    def __init__(self, seed: int = 0, pool: int = 256) -> None:
+        self.rng = random.Random(seed)
+        self.paragraphs = [self._paragraph() for _ in range(pool)]
+
+    def _paragraph(self) -> str:
+        lines = []
+        for _ in range(self.rng.randint(2, 6)):
+            words = self.rng.choices(_WORDS, k=self.rng.randint(6, 18))
+            lines.append(("- " if self.rng.random() < 0.5 else "") + " ".join(words).capitalize() + ".")
+        return "\n".join(lines)
+
+    def _body(self) -> str:
+        return "\n\n".join(self.rng.choices(self.paragraphs, k=self.rng.randint(1, 3)))
+
+    def block(self, index: int) -> str:
+        rng = self.rng
+        out: List[str] = [f"# Prompt section {index}\n"]
+        for title in _HEADER_SECTIONS:
+            out.append(f"## {title}\n{self._body()}\n")
+        out.append("## Examples\n")
+        for e in range(rng.randint(1, 4)):
+            out.append(f"### Example {e + 1}\nInput: {rng.choice(self.paragraphs)}\nOutput: {rng.choice(self.paragraphs)}\n")
+        for name in rng.sample(_TAG_SECTIONS, rng.randint(1, len(_TAG_SECTIONS))):
+            out.append(f"[part:{name}]\n{self._body()}\n[/part]\n")
+        return "\n".join(out) + "\n"
+
+    def chunks(self, size: int) -> Iterator[str]:
+        """Blocks totalling at least ``size`` UTF-8 bytes (the last block is not cut)."""
+        written = 0
+        index = 0
+        while written < size:
+            block = self.block(index)
+            written += len(block.encode("utf-8"))
+            index += 1
+            yield block
+
+
+def synth_prompt(size: int, seed: int = 0) -> str:
+    return "".join(PromptSynth(seed).chunks(size))
+
+
+def write_synth(path: Path, size: int, seed: int = 0) -> int:
+    """Stream a synthetic prompt of about ``size`` bytes to ``path``; returns bytes written."""
+    n = 0
+    with path.open("w", encoding="utf-8", newline="\n") as fh:
+        for chunk in PromptSynth(seed).chunks(size):
+            fh.write(chunk)
+            n += len(chunk.encode("utf-8"))
+    return n
@@ -1,37 +1,198 @@
 from __future__ import annotations
 
 import json
+import sys
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, Mapping, Optional
 
 import typer
-from rich.console import Console
 
-from .config.loader import load_config
-from .core.analyzer import analyze_files, analyze_payload_semantically
-from .core.optimizer import optimize_parts, render_markdown
-from .visualize.mermaid import parts_to_mermaid, semantic_parts_to_mermaid
-from .visualize.terminal import visualize_semantic_parts_in_terminal
-from .adapters.router import build_request, load_backend
+if TYPE_CHECKING:
+    from rich.console import Console
 
+    from .adapters.client import AsyncRouter
+    from .adapters.responses import ResponseCache
+    from .adapters.streaming import StreamStats
+    from .core.binparts import PartsFile
 
-app = typer.Typer(help="Visual Context Engineering Router (analyze, visualize, optimize, route)")
-console = Console()
+# Command implementations (and rich, ruamel.yaml, httpx, asyncio behind them)
+# are imported inside each command, so a call pays only for what it runs.
+
+
+# plain click help: rich-formatted help alone costs ~100 ms of imports per call
+app = typer.Typer(help="Visual Context Engineering Router (analyze, visualize, optimize, route)", rich_markup_mode=None)
+
+
+class _LazyConsole:
+    """Creates the rich console on first use; ``--help`` and plain commands never import rich."""
+
+    _console: Optional["Console"] = None
+
+    def __getattr__(self, name: str) -> Any:
+        if _LazyConsole._console is None:
+            from rich.console import Console
+
+            _LazyConsole._console = Console()
+        return getattr(_LazyConsole._console, name)
+
+
+console = _LazyConsole()
+
+
+@app.callback()
+def _root(
+    ctx: typer.Context,
+    profile: Optional[Path] = typer.Option(None, "--profile", help="Write a Chrome trace (chrome://tracing, Perfetto) of this run"),
+    timings: bool = typer.Option(False, "--timings", help="Print time per stage and counters after the command"),
+) -> None:
+    if profile is None and not timings:
+        return
+    import time
+
+    from .core import trace
+
+    tracer = trace.Tracer()
+    trace.activate(tracer)
+
+    def report() -> None:
+        tracer.add_span(f"cli.{ctx.invoked_subcommand}", tracer.origin, time.perf_counter() - tracer.origin)
+        from rich.console import Console
+
+        from .visualize.terminal import print_trace_summary
+
+        # stderr, so piped command output (analyze --stream --out -) stays clean
+        err = Console(stderr=True)
+        if profile is not None:
+            tracer.write_chrome_trace(profile)
+        print_trace_summary(tracer, err)
+        if profile is not None:
+            err.print(f"Wrote trace → {profile}")
+
+    ctx.call_on_close(report)
 
 
 @app.command()
 def analyze(
     in_: Path = typer.Option(..., "--in", help="System prompt file (Markdown)"),
     user: Optional[Path] = typer.Option(None, "--user", help="User prompt file (Markdown)"),
-    out: Path = typer.Option(Path("parts.json"), help="Output parts JSON path"),
+    out: Optional[Path] = typer.Option(None, help="Output path (default parts.json / parts.bin; '-' for stdout with --stream)"),
+    format: str = typer.Option("json", "--format", help="json, or bin for the compact indexed format"),
+    stream: bool = typer.Option(False, "--stream", help="Emit one JSON part per line as soon as it is found"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Bypass the result cache"),
 ) -> None:
     """Analyze prompt files and extract parts to JSON."""
+    from .config.loader import load_config
+    from .core.analyzer import analyze_text
+    from .core.cache import cache_key
+
+    format = format.lower()
+    if format not in ("json", "bin"):
+        raise typer.BadParameter("--format must be json or bin")
+    if stream and format == "bin":
+        raise typer.BadParameter("--stream writes JSONL; it cannot be combined with --format bin")
+    if stream and user is not None:
+        raise typer.BadParameter("--stream emits the parts of --in only; it cannot be combined with --user")
+    out = out or Path("parts.bin" if format == "bin" else "parts.json")
     cfg = load_config(Path.cwd())
-    results = analyze_files(in_, user, cfg)
-    out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    if stream:
+        _analyze_stream(in_, out, cfg)
+        return
+    text = in_.read_text(encoding="utf-8")
+    section = (cfg.get("analyze") or {}).get("detectors")
+    parts_json = _cached(
+        cfg, no_cache, cache_key("analyze", text, section),
+        lambda: json.dumps(analyze_text(text, cfg), ensure_ascii=False),
+    )
+    results = {
+        "system_file": str(in_),
+        "user_file": str(user) if user else None,
+        "parts": json.loads(parts_json),
+    }
+    if format == "bin":
+        from .core.binparts import write_parts_bin
+
+        write_parts_bin(out, [results])
+    else:
+        out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
     console.print(f"Wrote parts → {out}")
 
 
+def _analyze_stream(in_: Path, out: Path, cfg: Dict[str, Any]) -> None:
+    from .core.analyzer import compile_detectors, iter_file_parts
+
+    detectors = compile_detectors(cfg)
+    to_stdout = str(out) == "-"
+    fh = sys.stdout if to_stdout else out.open("w", encoding="utf-8")
+    count = 0
+    try:
+        for part in iter_file_parts(in_, detectors):
+            fh.write(json.dumps({"file": str(in_), **part}, ensure_ascii=False) + "\n")
+            # flush per part so downstream readers can consume while we scan
+            fh.flush()
+            count += 1
+    finally:
+        if not to_stdout:
+            fh.close()
+    if not to_stdout:
+        console.print(f"Streamed {count} parts → {out}")
+
+
+def _cached(cfg: Dict[str, Any], no_cache: bool, key: str, compute: Callable[[], str]) -> str:
+    from .core.cache import open_cache
+
+    if no_cache or (cfg.get("cache") or {}).get("enabled", True) is False:
+        return compute()
+    cache = open_cache(cfg, Path.cwd())
+    try:
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.put(key, value)
+        return value
+    finally:
+        cache.close()
+
+
+@app.command("analyze-corpus")
+def analyze_corpus_cmd(
+    inputs: list[str] = typer.Argument(..., help="Prompt files, directories or glob patterns"),
+    pattern: str = typer.Option("*.md", "--glob", help="File pattern used when searching directories"),
+    out: Optional[Path] = typer.Option(None, help="Merged output, one analyze result per file (default corpus.jsonl / corpus.bin)"),
+    format: str = typer.Option("jsonl", "--format", help="jsonl, or bin for the compact indexed format"),
+    workers: Optional[int] = typer.Option(None, "--workers", help="Worker processes (default: CPU count)"),
+    chunksize: Optional[int] = typer.Option(None, "--chunksize", help="Files handed to a worker at a time"),
+) -> None:
+    """Analyze a corpus of prompt files in parallel into one JSONL index."""
+    from .config.loader import load_config
+    from .core.binparts import PartsWriter
+    from .core.corpus import analyze_corpus, collect_files
+
+    format = format.lower()
+    if format not in ("jsonl", "bin"):
+        raise typer.BadParameter("--format must be jsonl or bin")
+    out = out or Path("corpus.bin" if format == "bin" else "corpus.jsonl")
+    cfg = load_config(Path.cwd())
+    files = collect_files(inputs, pattern)
+    if not files:
+        raise typer.BadParameter("No input files matched")
+    n_parts = n_errors = 0
+    binary = format == "bin"
+    with out.open("wb" if binary else "w", **({} if binary else {"encoding": "utf-8"})) as fh:
+        writer = PartsWriter(fh) if binary else None
+        for result in analyze_corpus(files, cfg, workers=workers, chunksize=chunksize):
+            if writer is not None:
+                writer.add(result)
+            else:
+                fh.write(json.dumps(result, ensure_ascii=False) + "\n")
+            n_parts += len(result["parts"])
+            if "error" in result:
+                n_errors += 1
+                console.print(f"[red]{result['system_file']}:[/red] {result['error']}")
+        if writer is not None:
+            writer.close()
+    console.print(f"Analyzed {len(files)} files ({n_parts} parts, {n_errors} errors) → {out}")
+
+
 @app.command("analyze-semantic")
 def analyze_semantic(
     payload_file: Path = typer.Option(
@@ -50,10 +211,35 @@ def analyze_semantic(
         "-o",
         help="Path to save the resulting Mermaid (.mmd) file.",
     ),
+    url: Optional[str] = typer.Option(None, "--url", help="OpenAI-compatible chat completions URL (default: Gemini)"),
+    model: Optional[str] = typer.Option(None, "--model", help="Model name for --url"),
+    chunk_tokens: Optional[int] = typer.Option(None, "--chunk-tokens", help="Approximate token budget per chunk [default: 2000]"),
+    workers: Optional[int] = typer.Option(None, "--workers", help="Chunks classified concurrently [default: 4]"),
+    retries: Optional[int] = typer.Option(None, "--retries", help="Retries per failed chunk [default: 2]"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Reclassify every chunk instead of reusing cached labels"),
 ):
     """
     Analyzes an LLM payload semantically and visualizes it.
     """
+    from functools import partial
+
+    from .adapters.router import timeout_for_url
+    from .config.loader import load_config
+    from .core.analyzer import analyze_with_custom_llm, analyze_with_gemini, compile_detectors
+    from .core.cache import open_cache
+    from .core.semantic import (
+        DEFAULT_CHUNK_TOKENS,
+        DEFAULT_RETRIES,
+        DEFAULT_WORKERS,
+        MISC_CATEGORY,
+        ClassificationCache,
+        analyze_payload_semantically,
+    )
+    from .visualize.mermaid import write_semantic_mermaid
+    from .visualize.terminal import visualize_semantic_parts_in_terminal
+
+    if url and not model:
+        raise typer.BadParameter("--model is required with --url")
     console.print(f"[cyan]Analyzing file '{payload_file}' semantically...[/cyan]")
     
     try:
@@ -63,15 +249,41 @@ def analyze_semantic(
         raise typer.Exit(code=1)
 
     try:
-        # Analyze with LLM
-        classified_data = analyze_payload_semantically(payload_content)
+        # Analyze with LLM, chunk by chunk
+        cfg = load_config(Path.cwd())
+        cache = None if no_cache else ClassificationCache(open_cache(cfg, Path.cwd()))
+        kwargs = dict(
+            max_chunk_tokens=chunk_tokens or DEFAULT_CHUNK_TOKENS,
+            workers=workers or DEFAULT_WORKERS,
+            retries=DEFAULT_RETRIES if retries is None else retries,
+            detectors=compile_detectors(cfg), cache=cache,
+        )
+        timeout = timeout_for_url(cfg, url)
+        if url:
+            import httpx  # lazy import
+
+            with httpx.Client(timeout=timeout) as client:
+                classify = partial(analyze_with_custom_llm, url=url, model_name=model, client=client, timeout=timeout)
+                classified_data = analyze_payload_semantically(payload_content, classify, model=model, **kwargs)
+        else:
+            classify = partial(analyze_with_gemini, timeout=timeout)
+            classified_data = analyze_payload_semantically(payload_content, classify, **kwargs)
+        if cache is not None:
+            st = cache.stats()
+            console.print(
+                f"[dim]classification cache: {st['memory_hits'] + st['disk_hits']} hits, {st['misses']} misses[/dim]"
+            )
+            cache.disk.close()
+        failed = sum(1 for item in classified_data if "error" in item)
+        if failed:
+            console.print(f"[yellow]{failed} chunk(s) could not be classified; kept as {MISC_CATEGORY}[/yellow]")
 
         # Visualize in terminal
         visualize_semantic_parts_in_terminal(classified_data, console)
 
         # Generate and save Mermaid diagram
-        mermaid_diagram = semantic_parts_to_mermaid(classified_data)
-        output_file.write_text(mermaid_diagram, encoding="utf-8")
+        with output_file.open("w", encoding="utf-8") as fh:
+            write_semantic_mermaid(classified_data, fh, cfg)
         console.print(f"\n[bold green]Mermaid diagram saved to '{output_file}'[/bold green]")
 
     except Exception as e:
@@ -81,83 +293,554 @@ def analyze_semantic(
 
 @app.command()
 def visualize(
-    parts: Path = typer.Option(..., "--parts", help="Parts JSON from analyze"),
+    parts: Path = typer.Option(..., "--parts", help="Parts file from analyze (JSON or --format bin)"),
     format: str = typer.Option("mermaid", "--format", help="Visualization format"),
     out: Path = typer.Option(Path("prompt.mmd"), help="Output file (.mmd/.svg)"),
+    file: Optional[str] = typer.Option(None, "--file", help="Which analyzed file to use from a multi-file binary parts file"),
+    group_by: Optional[str] = typer.Option(None, "--group-by", help="Subgraph per part name, source or file (default: visualize.mermaid.group_by)"),
+    max_nodes: Optional[int] = typer.Option(None, "--max-nodes", help="Nodes per subgraph before the rest fold into a summary node"),
+    max_groups: Optional[int] = typer.Option(None, "--max-groups", help="Subgraphs before further groups fold into a summary subgraph"),
+    direction: Optional[str] = typer.Option(None, "--direction", help="Flowchart direction: TD, LR, ... (default: visualize.mermaid.direction)"),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Bypass the result cache"),
 ) -> None:
-    """Visualize parts structure and ordering."""
-    data = json.loads(parts.read_text(encoding="utf-8"))
+    """Visualize parts structure and ordering.
+
+    A multi-file binary parts file without --file renders the whole corpus,
+    streamed straight to --out.
+    """
+    from .config.loader import load_config
+    from .core.binparts import PartsFile, is_parts_bin
+    from .core.cache import cache_key
+    from .visualize.mermaid import MermaidStyle, parts_to_mermaid, write_parts_mermaid
+
     if format.lower() != "mermaid":
         raise typer.BadParameter("Only 'mermaid' is supported in this scaffold")
-    mmd = parts_to_mermaid(data)
+    cfg = load_config(Path.cwd())
+    style = {"group_by": group_by, "max_nodes": max_nodes, "max_groups": max_groups, "direction": direction}
+    try:
+        MermaidStyle.from_config(cfg, **style)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    if file is None and is_parts_bin(parts):
+        with PartsFile(parts) as pf:
+            if pf.n_files > 1:
+                with out.open("w", encoding="utf-8") as fh:
+                    n = write_parts_mermaid(_corpus_parts(pf), fh, cfg, **style)
+                console.print(f"Wrote mermaid diagram of {n} parts from {pf.n_files} files → {out}")
+                return
+    text, load = _parts_source(parts, file)
+    mmd = _cached(
+        cfg, no_cache,
+        cache_key("visualize", text, {"format": format.lower(), "visualize": cfg.get("visualize"), "style": style}),
+        lambda: parts_to_mermaid(load(), cfg, **style),
+    )
     out.write_text(mmd, encoding="utf-8")
     console.print(f"Wrote mermaid diagram → {out}")
 
 
+def _corpus_parts(pf: "PartsFile") -> Iterator[Mapping[str, Any]]:
+    # tag each part with its file without copying it, for group_by=file
+    from collections import ChainMap
+
+    for result in pf.results():
+        tag = {"file": result["system_file"]}
+        for part in result["parts"]:
+            yield ChainMap(tag, part)  # type: ignore[arg-type]
+
+
+def _parts_source(path: Path, file: Optional[str]) -> tuple[str, Callable[[], Dict[str, Any]]]:
+    """Cache-key text and a loader for a parts file, JSON or binary.
+
+    A binary file is keyed by the digest of the selected file's records, so
+    a cache hit never reads its contents.
+    """
+    from .core.binparts import PartsFile, is_parts_bin
+
+    if not is_parts_bin(path):
+        if file is not None:
+            raise typer.BadParameter("--file only applies to binary parts files")
+        text = path.read_text(encoding="utf-8")
+        return text, lambda: json.loads(text)
+    pf = PartsFile(path)
+    try:
+        index = pf.file_index(file)
+    except KeyError as e:
+        raise typer.BadParameter(e.args[0] + (" with --file" if file is None else "")) from None
+    return f"bin:{pf.digest(index)}", lambda: pf.file(index)
+
+
 @app.command()
 def optimize(
-    parts: Path = typer.Option(..., "--parts", help="Parts JSON from analyze"),
+    parts: Path = typer.Option(..., "--parts", help="Parts file from analyze (JSON or --format bin)"),
     out: Path = typer.Option(Path("system.opt.md"), help="Optimized system prompt Markdown output"),
+    file: Optional[str] = typer.Option(None, "--file", help="Which analyzed file to use from a multi-file binary parts file"),
+    budget: Optional[int] = typer.Option(None, "--budget", help="Token budget (default: limits.max_context_tokens)"),
+    report_out: Optional[Path] = typer.Option(None, "--report", help="Write the per-part token report as JSON"),
+    prefix_corpus: Optional[Path] = typer.Option(
+        None, "--prefix-corpus",
+        help="analyze-corpus JSONL or request history; order parts to maximize the shared KV-cache prefix",
+    ),
+    dedup: Optional[bool] = typer.Option(
+        None, "--dedup/--no-dedup", help="Drop repeated parts and few-shot examples, keeping the first (default: optimize.dedup.enabled)",
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Bypass the result cache"),
 ) -> None:
-    """Reorder and lightly rewrite parts based on heuristics."""
+    """Reorder parts, cap few-shot examples and trim to the token budget."""
+    from .config.loader import load_config
+    from .core.cache import cache_key
+    from .core.optimizer import optimize_parts, render_markdown
+    from .visualize.terminal import print_dedup_report, print_prefix_report, print_token_report
+
     cfg = load_config(Path.cwd())
-    data = json.loads(parts.read_text(encoding="utf-8"))
-    opt = optimize_parts(data, cfg)
-    md = render_markdown(opt)
-    out.write_text(md, encoding="utf-8")
+    text, load = _parts_source(parts, file)
+    stability = None
+    if prefix_corpus:
+        from .core.prefix import load_prompts, part_stability
+
+        stability = part_stability(load_prompts(prefix_corpus, cfg))
+
+    def compute() -> str:
+        report: Dict[str, Any] = {}
+        md = render_markdown(optimize_parts(load(), cfg, budget=budget, report=report, stability=stability, dedup=dedup))
+        return json.dumps({"markdown": md, "report": report}, ensure_ascii=False)
+
+    opt = cfg.get("optimize") or {}
+    section = {
+        "order": opt.get("order"), "prefix": opt.get("prefix"),
+        "limits": cfg.get("limits"), "budget": budget, "stability": stability,
+        "dedup": (dedup, opt.get("dedup")),
+    }
+    result = json.loads(_cached(cfg, no_cache, cache_key("optimize", text, section), compute))
+    out.write_text(result["markdown"], encoding="utf-8")
+    report = result["report"]
+    if report_out:
+        report_out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    if "dedup" in report:
+        print_dedup_report(report["dedup"], console)
+    print_token_report(report, console)
+    if "prefix" in report:
+        print_prefix_report(report["prefix"], console)
     console.print(f"Wrote optimized system prompt → {out}")
 
 
+@app.command()
+def dedup(
+    parts: Path = typer.Argument(..., help="Parts JSON, analyze-corpus JSONL/binary file, or request history JSONL"),
+    threshold: Optional[float] = typer.Option(None, "--threshold", help="Jaccard similarity for near-duplicates (default: optimize.dedup.threshold)"),
+    examples: Optional[bool] = typer.Option(None, "--examples/--no-examples", help="Also compare individual few-shot examples"),
+    out: Optional[Path] = typer.Option(None, "--out", help="Write the duplicate clusters as JSON"),
+) -> None:
+    """Report exact and near-duplicate parts within and across prompts."""
+    from .config.loader import load_config
+    from .core.dedup import find_duplicates
+    from .core.prefix import load_labeled_prompts
+    from .visualize.terminal import print_dedup_report
+
+    cfg = load_config(Path.cwd())
+    labeled = load_labeled_prompts(parts, cfg)
+    try:
+        report = find_duplicates(
+            [p for _, p in labeled], cfg, labels=[label for label, _ in labeled], threshold=threshold, examples=examples,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    if out:
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print_dedup_report(report, console)
+    if out:
+        console.print(f"Wrote duplicate clusters → {out}")
+
+
 @app.command()
 def route(
     system: Path = typer.Option(..., "--system", help="System prompt file (Markdown)"),
     user: Path = typer.Option(..., "--user", help="User prompt file (Markdown)"),
-    backend: str = typer.Option("local-vllm", "--backend", help="Backend id or kind"),
+    backend: str = typer.Option("local-vllm", "--backend", help="Backend id or kind, or 'auto' to use router.strategy"),
     send: bool = typer.Option(False, "--send", help="Actually send request (otherwise dry-run)"),
     stream: bool = typer.Option(False, "--stream", help="Enable streaming if supported"),
     max_tokens: int = typer.Option(1024, "--max-tokens", help="Max tokens for generation"),
     endpoint: Optional[str] = typer.Option(None, "--endpoint", help="Override backend endpoint URL"),
     model: Optional[str] = typer.Option(None, "--model", help="Override model name"),
     header: Optional[list[str]] = typer.Option(None, "--header", help="Extra HTTP headers 'Key: Value'", rich_help_panel="HTTP"),
+    cache: Optional[bool] = typer.Option(None, "--cache/--no-cache", help="Reuse responses to identical requests (default: backend 'cache' setting)"),
+    history: Optional[Path] = typer.Option(None, "--history", help="JSON list of earlier {role, content} turns; --user is the next turn"),
+    affinity: Optional[str] = typer.Option(None, "--affinity", help="Session key for the prefix strategy (default: derived from the prompt prefix)"),
 ) -> None:
     """Build request for selected backend and optionally send it."""
+    import asyncio
+
+    from .adapters.client import AUTO_BACKEND, AsyncRouter
+    from .adapters.pool import BackendPool
+    from .adapters.router import build_request, check_messages, load_backend
+    from .config.loader import load_config
+
     cfg = load_config(Path.cwd())
-    be = load_backend(cfg, backend)
-    # apply overrides
-    if endpoint:
-        be["url"] = endpoint
-    if model:
-        be["model"] = model
-    if header:
-        be.setdefault("headers", {})
-        for h in header:
-            if ":" not in h:
-                raise typer.BadParameter(f"Invalid header format: {h}. Use 'Key: Value'")
-            k, v = h.split(":", 1)
-            be["headers"][k.strip()] = v.strip()
-    req = build_request(
-        system=system.read_text(encoding="utf-8"),
-        user=user.read_text(encoding="utf-8"),
-        backend=be,
-        stream=stream,
-        max_tokens=max_tokens,
-    )
+    auto = backend == AUTO_BACKEND
+    if auto and (endpoint or header):
+        raise typer.BadParameter("--endpoint/--header cannot be combined with --backend auto")
+    system_text = system.read_text(encoding="utf-8")
+    user_text = user.read_text(encoding="utf-8")
+    messages = None
+    if history:
+        try:
+            messages = check_messages(json.loads(history.read_text(encoding="utf-8")))
+        except ValueError as e:  # includes malformed JSON
+            raise typer.BadParameter(f"--history: {e}")
+    if auto and send:
+        # the router picks (and fails over) itself when sending
+        be = None
+    elif auto:
+        pool = BackendPool(cfg)
+        be = pool.pick(key=pool.key_for(system_text, user_text, messages, affinity))
+    else:
+        be = load_backend(cfg, backend)
+    if be is not None:
+        # apply overrides
+        if endpoint:
+            be["url"] = endpoint
+        if model:
+            be["model"] = model
+        if header:
+            be.setdefault("headers", {})
+            for h in header:
+                if ":" not in h:
+                    raise typer.BadParameter(f"Invalid header format: {h}. Use 'Key: Value'")
+                k, v = h.split(":", 1)
+                be["headers"][k.strip()] = v.strip()
+        req = build_request(
+            system=system_text,
+            user=user_text,
+            backend=be,
+            stream=stream,
+            max_tokens=max_tokens,
+            messages=messages,
+        )
     if not send:
         console.print("[bold cyan]Dry-run request payload:[/bold cyan]")
         console.print_json(data=req)
         return
-    # Optionally send using httpx; network may be restricted
-    try:
-        import httpx  # lazy import
+    if stream:
+
+        def open_stream(router: "AsyncRouter", stats: "StreamStats", meta: Dict[str, Any]) -> AsyncIterator[str]:
+            if auto:
+                return router.route_stream(
+                    system_text, user_text, AUTO_BACKEND, max_tokens=max_tokens, model=model,
+                    messages=messages, affinity=affinity, stats=stats, meta=meta,
+                )
+            meta["backend"] = be["id"]
+            return router.stream(be, req, stats)
+
+        _route_stream(cfg, open_stream)
+        return
+    # Optionally send through the async routing core; network may be restricted
+    responses = _response_cache(cfg, cache)
 
-        url = be["url"]
-        headers = be.get("headers", {})
-        with httpx.Client(timeout=be.get("timeout", 60.0)) as client:
-            resp = client.post(url, headers=headers, json=req)
-            resp.raise_for_status()
-            console.print_json(data=resp.json())
+    async def _send() -> Dict[str, Any]:
+        meta: Dict[str, Any] = {}
+        # one call: no background health checks, failover marks members down instead
+        async with AsyncRouter(cfg, responses=responses, health_checks=False) as router:
+            if not auto:
+                resp = await router.send(be, req, cache=cache, meta=meta)
+            else:
+                resp = await router.route(
+                    system_text, user_text, AUTO_BACKEND, max_tokens=max_tokens, model=model,
+                    meta=meta, cache=cache, messages=messages, affinity=affinity,
+                )
+                console.print(f"[dim]served by {meta['backend']} ({meta['attempts']} attempt(s))[/dim]")
+        if "cache" in meta:
+            console.print(f"[dim]response cache: {meta['cache']}[/dim]")
+        return resp
+
+    try:
+        console.print_json(data=asyncio.run(_send()))
     except Exception as e:
         console.print(f"[red]Failed to send request:[/red] {e}")
+    finally:
+        if responses is not None and responses.disk is not None:
+            responses.disk.close()
+
+
+def _response_cache(cfg: Dict[str, Any], cache: Optional[bool]) -> Optional["ResponseCache"]:
+    """Disk-backed response cache when this run may use it, so repeated runs hit too."""
+    if cache is False or (cfg.get("cache") or {}).get("enabled", True) is False:
+        return None
+    if not cache and not any(be.get("cache") for be in cfg.get("backends", [])):
+        return None
+    from .adapters.responses import ResponseCache
+    from .core.cache import open_cache
+
+    return ResponseCache.from_config(cfg, disk=open_cache(cfg, Path.cwd()))
+
+
+def _route_stream(
+    cfg: Dict[str, Any], open_stream: Callable[["AsyncRouter", "StreamStats", Dict[str, Any]], AsyncIterator[str]]
+) -> None:
+    """Print the deltas of ``open_stream(router, stats, meta)`` as they arrive, then the stream stats."""
+    import asyncio
+
+    from .adapters.client import AsyncRouter
+    from .adapters.streaming import StreamStats
+
+    meta: Dict[str, Any] = {}
+
+    async def _run() -> StreamStats:
+        stats = StreamStats()
+        async with AsyncRouter(cfg, health_checks=False) as router:
+            async for delta in open_stream(router, stats, meta):
+                sys.stdout.write(delta)
+                sys.stdout.flush()
+        return stats
+
+    try:
+        stats = asyncio.run(_run())
+    except Exception as e:
+        console.print(f"\n[red]Failed to stream response:[/red] {e}")
+        return
+    s = stats.summary()
+    attempts = f" ({meta['attempts']} attempt(s))" if "attempts" in meta else ""
+    console.print(
+        f"\n[dim]{meta['backend']}{attempts}: ttft {s['ttft_ms']} ms, {s['chunks']} chunks, "
+        f"itl mean {s['itl_mean_ms']} ms (p95 {s['itl_p95_ms']} ms), total {s['total_ms']} ms[/dim]"
+    )
+
+
+@app.command("route-batch")
+def route_batch_cmd(
+    in_: Path = typer.Option(..., "--in", help="JSONL of {system, user, params} records ('-' for stdin)"),
+    out: Path = typer.Option(Path("-"), "--out", help="JSONL responses, written as they complete ('-' for stdout)"),
+    backend: str = typer.Option("local-vllm", "--backend", help="Default backend id or kind (params.backend overrides)"),
+    concurrency: Optional[int] = typer.Option(None, "--concurrency", help="Max requests in flight (default: router.concurrency or 16)"),
+    cache: Optional[bool] = typer.Option(
+        None, "--cache/--no-cache",
+        help="Reuse responses to identical requests and coalesce duplicates in flight (params.cache overrides)",
+    ),
+) -> None:
+    """Route many prompts over pooled keep-alive connections."""
+    import asyncio
+
+    from .adapters.client import AsyncRouter, route_batch
+    from .config.loader import load_config
+
+    cfg = load_config(Path.cwd())
+    src = sys.stdin if str(in_) == "-" else in_.open("r", encoding="utf-8")
+    dst = sys.stdout if str(out) == "-" else out.open("w", encoding="utf-8")
+    records = (json.loads(line) for line in src if line.strip())
+    responses = _response_cache(cfg, cache)
+
+    async def _run() -> tuple[int, int]:
+        n = errors = 0
+        async with AsyncRouter(cfg, concurrency=concurrency, responses=responses) as router:
+            async for result in route_batch(router, records, default_backend=backend, cache=cache):
+                dst.write(json.dumps(result, ensure_ascii=False) + "\n")
+                dst.flush()
+                n += 1
+                errors += "error" in result
+        return n, errors
+
+    try:
+        n, errors = asyncio.run(_run())
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+        if responses is not None and responses.disk is not None:
+            responses.disk.close()
+    if dst is not sys.stdout:
+        console.print(f"Routed {n} requests ({errors} errors) → {out}")
+        if responses is not None:
+            console.print(f"[dim]response cache: {responses.stats()}[/dim]")
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to bind"),
+    port: int = typer.Option(3999, "--port", help="Port to listen on"),
+) -> None:
+    """Run the HTTP API (/analyze, /optimize, /route) with warm config, clients and caches."""
+    import asyncio
+
+    from .server.app import run_server
+
+    try:
+        asyncio.run(run_server(Path.cwd(), host, port, on_ready=lambda url: console.print(f"Serving VCER API on {url}")))
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command()
+def bench(
+    sizes: str = typer.Option("64KB,1MB,16MB", "--sizes", help="Comma-separated synthetic prompt sizes (KB/MB/GB)"),
+    only: Optional[str] = typer.Option(None, "--only", help="Comma-separated cases (default: all; see vcer.bench.suite.CASES)"),
+    requests: int = typer.Option(200, "--requests", help="Requests per backend kind for the route cases"),
+    concurrency: int = typer.Option(16, "--concurrency", help="Requests in flight for the route cases"),
+    latency_ms: float = typer.Option(0.0, "--latency-ms", help="Mock backend response latency"),
+    seed: int = typer.Option(0, "--seed", help="Synthetic prompt seed"),
+    out: Optional[Path] = typer.Option(None, "--out", help="Write results as JSON (use as a later --baseline)"),
+    baseline: Optional[Path] = typer.Option(None, "--baseline", help="Compare with a previous --out; exit 1 on regressions"),
+    threshold: float = typer.Option(0.2, "--threshold", help="Relative slowdown counted as a regression"),
+) -> None:
+    """Benchmark extraction, optimization, rendering, request building and routing."""
+    from .bench.suite import compare, run_suite
+    from .bench.synth import parse_size
+    from .visualize.terminal import print_bench_report
+
+    try:
+        size_list = [parse_size(s) for s in sizes.split(",") if s.strip()]
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    base = None
+    if baseline:
+        if not baseline.exists():
+            raise typer.BadParameter(f"Baseline {baseline} not found; create one with --out")
+        base = json.loads(baseline.read_text(encoding="utf-8"))
+    try:
+        report = run_suite(
+            size_list, only=[c.strip() for c in only.split(",")] if only else None,
+            requests=requests, concurrency=concurrency, latency_ms=latency_ms, seed=seed,
+            progress=lambda msg: console.print(f"[dim]bench: {msg}[/dim]"),
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    rows = compare(report, base, threshold) if base is not None else None
+    if rows is not None:
+        report["comparison"] = {"baseline": str(baseline), "threshold": threshold, "rows": rows}
+    if out:
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        console.print(f"Wrote benchmark results → {out}")
+    print_bench_report(report, console, rows)
+    if rows is not None and any(r["status"] == "regressed" for r in rows):
+        raise typer.Exit(1)
+
+
+@app.command()
+def loadtest(
+    backend: str = typer.Option("local-vllm", "--backend", help="Comma-separated backend ids or kinds (or 'auto'), loaded one after another"),
+    concurrency: int = typer.Option(16, "--concurrency", help="Closed loop: requests kept in flight; open loop: cap on requests in flight"),
+    rate: Optional[float] = typer.Option(None, "--rate", help="Open loop: Poisson arrivals per second (default: closed loop)"),
+    requests: int = typer.Option(200, "--requests", help="Requests per backend"),
+    duration: Optional[float] = typer.Option(None, "--duration", help="Seconds per backend (overrides --requests)"),
+    warmup: int = typer.Option(0, "--warmup", help="Unmeasured requests first, to open connections"),
+    stream: bool = typer.Option(True, "--stream/--no-stream", help="Stream responses (needed for time to first token)"),
+    max_tokens: int = typer.Option(64, "--max-tokens", help="Max tokens for generation"),
+    system: Optional[Path] = typer.Option(None, "--system", help="System prompt file (default: a synthetic prompt)"),
+    user: Optional[Path] = typer.Option(None, "--user", help="User prompt file"),
+    prompt_size: str = typer.Option("4KB", "--prompt-size", help="Synthetic system prompt size when --system is not given"),
+    seed: int = typer.Option(0, "--seed", help="Seed for the synthetic prompt and the arrival times"),
+    mock: bool = typer.Option(False, "--mock", help="Point the backends at a bundled local mock server", rich_help_panel="Mock"),
+    latency_ms: float = typer.Option(50.0, "--latency-ms", help="Mock time to first token", rich_help_panel="Mock"),
+    token_ms: float = typer.Option(10.0, "--token-ms", help="Mock time per further token", rich_help_panel="Mock"),
+    out: Optional[Path] = typer.Option(None, "--out", help="Write the report as JSON ('-' for stdout)"),
+) -> None:
+    """Load backends at a fixed concurrency or arrival rate; report latency, TTFT, tokens/s and errors."""
+    from .bench.loadtest import LoadSettings, run_loadtest
+    from .bench.synth import parse_size
+    from .config.loader import load_config
+    from .visualize.terminal import print_loadtest_report
+
+    try:
+        settings = LoadSettings(
+            mode="open" if rate is not None else "closed", concurrency=concurrency, rate=rate, requests=requests,
+            duration_s=duration, warmup=warmup, stream=stream, max_tokens=max_tokens, seed=seed,
+        )
+        prompt_bytes = parse_size(prompt_size)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    cfg = load_config(Path.cwd())
+    targets = [b.strip() for b in backend.split(",") if b.strip()]
+    to_stdout = out is not None and str(out) == "-"
+    try:
+        report = run_loadtest(
+            cfg, targets, settings,
+            system=system.read_text(encoding="utf-8") if system else None,
+            user=user.read_text(encoding="utf-8") if user else "Hello",
+            prompt_bytes=prompt_bytes,
+            mock={"latency_ms": latency_ms, "token_ms": token_ms, "tokens": max_tokens} if mock else None,
+            progress=None if to_stdout else lambda msg: console.print(f"[dim]loadtest: {msg}[/dim]"),
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    if to_stdout:
+        sys.stdout.write(json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+        return
+    if out:
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        console.print(f"Wrote load test report → {out}")
+    print_loadtest_report(report, console)
+
+
+@app.command("mock")
+def mock_cmd(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to bind"),
+    port: int = typer.Option(8000, "--port", help="Port to listen on"),
+    latency_ms: float = typer.Option(50.0, "--latency-ms", help="Time to first token"),
+    token_ms: float = typer.Option(10.0, "--token-ms", help="Time per further token"),
+    tokens: int = typer.Option(64, "--tokens", help="Tokens per reply (at most max_tokens)"),
+) -> None:
+    """Serve a mock vLLM/OpenAI, sglang and Ollama backend for offline routing and load tests."""
+    import asyncio
+
+    from .bench.mock import run_mock
+
+    async def _run() -> None:
+        server, _, url = await run_mock(host, port, latency_ms=latency_ms, token_ms=token_ms, tokens=tokens)
+        console.print(f"Mock backend on {url} (/v1/chat/completions, /v1/completions, /generate, /api/chat, /api/generate)")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(_run())
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command()
+def synth(
+    size: str = typer.Option("1MB", "--size", help="Approximate size (KB/MB/GB)"),
+    out: Path = typer.Option(Path("synth.md"), "--out", help="Output Markdown file"),
+    seed: int = typer.Option(0, "--seed", help="Generator seed; same seed and size give the same prompt"),
+) -> None:
+    """Write a synthetic header/tag-structured prompt, e.g. for benchmarks."""
+    from .bench.synth import parse_size, write_synth
+
+    try:
+        n = write_synth(out, parse_size(size), seed)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+    console.print(f"Wrote {n} bytes → {out}")
+
+
+cache_app = typer.Typer(help="Inspect or clear the on-disk result cache", rich_markup_mode=None)
+app.add_typer(cache_app, name="cache")
+
+
+@cache_app.command("stats")
+def cache_stats() -> None:
+    """Show cache size and hit/miss counts per command."""
+    from .config.loader import load_config
+    from .core.cache import open_cache
+
+    cfg = load_config(Path.cwd())
+    cache = open_cache(cfg, Path.cwd())
+    try:
+        console.print_json(data=cache.stats())
+    finally:
+        cache.close()
+
+
+@cache_app.command("clear")
+def cache_clear() -> None:
+    """Remove all cached results."""
+    from .config.loader import load_config
+    from .core.cache import open_cache
+
+    cfg = load_config(Path.cwd())
+    cache = open_cache(cfg, Path.cwd())
+    try:
+        cache.clear()
+    finally:
+        cache.close()
+    console.print(f"Cleared cache → {cache.path}")
 
 
 @app.command("dry-run")
@@ -166,5 +849,6 @@ def dry_run(
     user: Path = typer.Option(..., "--user"),
 ) -> None:
     """Preview the pipeline without sending requests."""
-    console.print("System prompt preview:\n" + system.read_text(encoding="utf-8")[:600])
-    console.print("\nUser prompt preview:\n" + user.read_text(encoding="utf-8")[:600])
+    # plain echo: prompt text must not be parsed as rich markup (e.g. "[part:task]")
+    typer.echo("System prompt preview:\n" + system.read_text(encoding="utf-8")[:600])
+    typer.echo("\nUser prompt preview:\n" + user.read_text(encoding="utf-8")[:600])
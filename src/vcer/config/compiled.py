@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .. import __version__
+from ..core import trace
+from ..core.cache import DEFAULT_CACHE_DIR
+
+CONFIG_NAME = ".vcer.yml"
+SNAPSHOT_NAME = "config.snapshot.json"
+SNAPSHOT_FORMAT = 1
+BACKEND_KINDS = ("vllm", "sglang", "ollama", "openai")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _freeze(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+def _thaw(obj: Any) -> Any:
+    if isinstance(obj, Mapping):
+        return {k: _thaw(v) for k, v in obj.items()}
+    if isinstance(obj, tuple):
+        return [_thaw(v) for v in obj]
+    return obj
+
+
+def validate_config(cfg: Dict[str, Any]) -> None:
+    """Raise ``ConfigError`` listing every structural problem in ``cfg``."""
+    from ..adapters.pool import STRATEGIES
+
+    problems: List[str] = []
+    if not isinstance(cfg, dict):
+        raise ConfigError(f"{CONFIG_NAME} must be a mapping at the top level")
+    backends = cfg.get("backends", [])
+    if not isinstance(backends, list):
+        problems.append("backends must be a list")
+        backends = []
+    seen = set()
+    for i, be in enumerate(backends):
+        if not isinstance(be, dict):
+            problems.append(f"backends[{i}] must be a mapping")
+            continue
+        if be.get("kind", "vllm") not in BACKEND_KINDS:
+            problems.append(f"backends[{i}].kind must be one of {', '.join(BACKEND_KINDS)}")
+        if be.get("id") in seen:
+            problems.append(f"backends[{i}].id '{be.get('id')}' is duplicated")
+        seen.add(be.get("id"))
+    strategy = (cfg.get("router") or {}).get("strategy", "round_robin")
+    if strategy not in STRATEGIES:
+        problems.append(f"router.strategy must be one of {', '.join(STRATEGIES)}")
+    if (cfg.get("router") or {}).get("batch") is not None:
+        from ..adapters.batching import BatchSettings
+
+        try:
+            BatchSettings.from_config(cfg)
+        except (TypeError, ValueError) as e:
+            problems.append(str(e))
+    if (cfg.get("router") or {}).get("affinity") is not None:
+        from ..adapters.affinity import AffinitySettings
+
+        try:
+            AffinitySettings.from_config(cfg)
+        except (TypeError, ValueError) as e:
+            problems.append(str(e))
+    det = (cfg.get("analyze") or {}).get("detectors") or {}
+    for name, pats in (det.get("headers") or {}).items():
+        for pat in [pats] if isinstance(pats, str) else pats:
+            problems.extend(_check_regex(f"analyze.detectors.headers.{name}", pat))
+    for key in ("open", "close"):
+        pat = (det.get("tags") or {}).get(key)
+        if pat is not None:
+            problems.extend(_check_regex(f"analyze.detectors.tags.{key}", pat))
+    order = (cfg.get("optimize") or {}).get("order")
+    if order is not None and not (isinstance(order, list) and all(isinstance(n, str) for n in order)):
+        problems.append("optimize.order must be a list of part names")
+    dedup = (cfg.get("optimize") or {}).get("dedup")
+    if dedup is not None:
+        from ..core.dedup import DedupSettings
+
+        try:
+            DedupSettings.from_config(cfg)
+        except (TypeError, ValueError) as e:
+            problems.append(str(e))
+    if problems:
+        raise ConfigError(f"Invalid {CONFIG_NAME}:\n  - " + "\n  - ".join(problems))
+
+
+def _check_regex(where: str, pat: Any) -> List[str]:
+    try:
+        re.compile(pat)
+    except (re.error, TypeError) as e:
+        return [f"{where}: invalid regex {pat!r} ({e})"]
+    return []
+
+
+class ConfigSnapshot:
+    """Validated, immutable view of ``.vcer.yml`` with derived data precomputed.
+
+    ``data`` is read-only; ``to_dict()`` returns a mutable copy for callers
+    that expect the plain ``load_config`` dict. Detectors are compiled on
+    first use and then shared.
+    """
+
+    __slots__ = ("data", "digest", "stamp", "backends", "order_priority", "_detectors")
+
+    def __init__(self, cfg: Dict[str, Any], digest: str = "", stamp: Tuple[int, int] = (0, 0)) -> None:
+        from ..adapters.router import _normalize_backend
+        from ..core.parts import DEFAULT_ORDER
+
+        self.data: Mapping[str, Any] = _freeze(cfg)
+        self.digest = digest
+        self.stamp = stamp
+        self.backends: Mapping[str, Mapping[str, Any]] = MappingProxyType(
+            {be.get("id", be.get("kind", "vllm")): _freeze(_normalize_backend(be)) for be in cfg.get("backends", [])}
+        )
+        order = (cfg.get("optimize") or {}).get("order", DEFAULT_ORDER)
+        self.order_priority: Mapping[str, int] = MappingProxyType({name: i for i, name in enumerate(order)})
+        self._detectors = None
+
+    @property
+    def detectors(self) -> Any:
+        if self._detectors is None:
+            from ..core.analyzer import compile_detectors
+
+            self._detectors = compile_detectors(self.data)
+        return self._detectors
+
+    def backend(self, name: str) -> Dict[str, Any]:
+        """Mutable copy of a normalized backend, looked up by id, then by kind."""
+        be = self.backends.get(name)
+        if be is None:
+            be = next((b for b in self.backends.values() if b["kind"] == name), None)
+        if be is None:
+            from ..adapters.router import load_backend
+
+            return load_backend({}, name)
+        return _thaw(be)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return _thaw(self.data)
+
+
+def _parse(path: Path) -> Dict[str, Any]:
+    from ruamel.yaml import YAML, YAMLError
+
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            cfg = YAML(typ="safe").load(f) or {}
+    except YAMLError as e:
+        raise ConfigError(f"Invalid {CONFIG_NAME}: {e}") from e
+    validate_config(cfg)
+    return cfg
+
+
+def load_snapshot(root: Path) -> ConfigSnapshot:
+    """Load ``.vcer.yml`` via a JSON snapshot cache.
+
+    The snapshot lives in the configured ``cache.dir`` and is reused while
+    the file's mtime and size are unchanged, or when its content hash still
+    matches (e.g. after a checkout touched it). Otherwise, or after a
+    package upgrade, the YAML is parsed and validated again.
+    """
+    with trace.span("config.load") as sp:
+        snap = _load_snapshot(root, sp)
+    return snap
+
+
+def _load_snapshot(root: Path, sp: Any) -> ConfigSnapshot:
+    path = root / CONFIG_NAME
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        sp.set(source="none")
+        return ConfigSnapshot({})
+    stamp = (st.st_mtime_ns, st.st_size)
+    raw = path.read_bytes()
+    cached = _read_snapshot(root / _scan_cache_dir(raw) / SNAPSHOT_NAME)
+    if cached is not None and tuple(cached["stamp"]) == stamp:
+        sp.set(source="snapshot")
+        return ConfigSnapshot(cached["config"], cached["digest"], stamp)
+
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached is not None and cached["digest"] == digest:
+        sp.set(source="snapshot")
+        cfg = cached["config"]
+    else:
+        sp.set(source="yaml")
+        cfg = _parse(path)
+        # YAML may hold values JSON cannot (dates); keep the snapshot faithful to what we serve
+        cfg = json.loads(json.dumps(cfg, default=str))
+    snap = {"format": SNAPSHOT_FORMAT, "version": __version__, "stamp": list(stamp), "digest": digest, "config": cfg}
+    _write_snapshot(root / ((cfg.get("cache") or {}).get("dir") or DEFAULT_CACHE_DIR) / SNAPSHOT_NAME, snap)
+    return ConfigSnapshot(cfg, digest, stamp)
+
+
+_TOP_KEY = re.compile(rb"^([A-Za-z_][\w-]*)[ \t]*:")
+_CHILD_DIR = re.compile(rb"""^([ \t]+)dir[ \t]*:[ \t]*(["']?)([^"'#\r\n]*?)\2[ \t]*(?:#.*)?$""")
+
+
+def _scan_cache_dir(raw: bytes) -> str:
+    """``cache.dir`` read off the raw file, to find the snapshot before parsing.
+
+    Handles the block style ``.vcer.yml`` uses; anything else falls back to
+    the default, which costs a parse per run but never a wrong config.
+    """
+    section = None
+    indent = None
+    for line in raw.splitlines():
+        top = _TOP_KEY.match(line)
+        if top:
+            section = top.group(1)
+            indent = None
+            continue
+        if section != b"cache" or not line.strip() or line.lstrip().startswith(b"#"):
+            continue
+        child_indent = len(line) - len(line.lstrip())
+        if indent is None:
+            indent = child_indent
+        m = _CHILD_DIR.match(line)
+        if m and child_indent == indent and m.group(3):
+            return m.group(3).decode("utf-8", "replace")
+    return DEFAULT_CACHE_DIR
+
+
+def _read_snapshot(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    # a snapshot from another release may predate its validation rules
+    if not isinstance(data, dict) or data.get("format") != SNAPSHOT_FORMAT or data.get("version") != __version__:
+        return None
+    return data
+
+
+def _write_snapshot(path: Path, data: Dict[str, Any]) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass  # read-only checkout: just parse every time
+
+
+class SnapshotHolder:
+    """Current snapshot for long-running processes, reloaded when the file changes.
+
+    ``current()`` stats the file at most every ``check_interval`` seconds and
+    swaps in a new snapshot if it changed; callers keep whatever snapshot they
+    already hold, so a reload never mutates state under a running request.
+    An edit that fails validation is reported in ``error`` and ignored.
+    """
+
+    def __init__(self, root: Path, check_interval: float = 1.0) -> None:
+        self.root = root
+        self.check_interval = check_interval
+        self.snapshot = load_snapshot(root)
+        self.error: Optional[str] = None
+        self._rejected: Optional[Tuple[int, int]] = None
+        self._checked = time.monotonic()
+
+    def current(self) -> ConfigSnapshot:
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            self._checked = now
+            self.refresh()
+        return self.snapshot
+
+    def refresh(self) -> bool:
+        """Reload if the file changed; returns True when a new snapshot was installed."""
+        try:
+            st = (self.root / CONFIG_NAME).stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = (0, 0)
+        if stamp == self.snapshot.stamp or stamp == self._rejected:
+            return False
+        try:
+            snap = load_snapshot(self.root)
+        except ConfigError as e:
+            # keep serving the last good config until the file is fixed
+            self.error, self._rejected = str(e), stamp
+            return False
+        self.error, self._rejected = None, None
+        if snap.digest == self.snapshot.digest:
+            self.snapshot.stamp = stamp
+            return False
+        self.snapshot = snap
+        return True
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 import re
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Pattern
 
-from .parts import Part
+from . import trace
+from .parts import Part, PartRef, SourceBuffer
 
 
 HEADER_PATTERNS = {
@@ -18,14 +19,78 @@ TAG_OPEN = re.compile(r"\[part:(?P<name>[a-z_]+)\]", re.IGNORECASE)
 TAG_CLOSE = re.compile(r"\[/part\]", re.IGNORECASE)
 
 
+class Detectors:
+    """Compiled header/tag matchers used by the part scanner.
+
+    All header regexes are folded into one alternation so each line is matched
+    once; ``header_names`` maps the winning group back to its part name.
+    """
+
+    __slots__ = ("header", "header_names", "header_list", "tag_open", "tag_close")
+
+    def __init__(self, headers: List[tuple[str, str]], tag_open: Pattern[str], tag_close: Pattern[str]) -> None:
+        self.header: Optional[Pattern[str]] = None
+        self.header_names: Dict[str, str] = {}
+        self.header_list: List[tuple[str, Pattern[str]]] = []
+        alts: List[str] = []
+        for i, (name, pat) in enumerate(headers):
+            self.header_names[f"_h{i}"] = name
+            alts.append(f"(?P<_h{i}>{pat})")
+        try:
+            if alts:
+                self.header = re.compile("|".join(alts), re.IGNORECASE)
+        except re.error:
+            # user patterns may reuse group names; match them one by one instead
+            self.header_list = [(name, re.compile(pat, re.IGNORECASE)) for name, pat in headers]
+        self.tag_open = tag_open
+        self.tag_close = tag_close
+
+    def match_header(self, line: str) -> Optional[str]:
+        if self.header is not None:
+            m = self.header.match(line)
+            return self.header_names[m.lastgroup] if m else None
+        for name, pat in self.header_list:
+            if pat.match(line):
+                return name
+        return None
+
+
+def compile_detectors(cfg: Optional[Dict[str, Any]] = None) -> Detectors:
+    """Build detectors from ``analyze.detectors`` in ``.vcer.yml``.
+
+    Missing sections fall back to the built-in ``HEADER_PATTERNS`` / ``TAG_*``.
+    """
+    det = ((cfg or {}).get("analyze") or {}).get("detectors") or {}
+    headers: List[tuple[str, str]] = []
+    if det.get("headers"):
+        for name, pats in det["headers"].items():
+            for pat in [pats] if isinstance(pats, str) else pats:
+                headers.append((str(name), pat))
+    else:
+        headers = [(name, pat.pattern) for name, pat in HEADER_PATTERNS.items()]
+
+    tags = det.get("tags") or {}
+    tag_open = re.compile(tags["open"], re.IGNORECASE) if tags.get("open") else TAG_OPEN
+    tag_close = re.compile(tags["close"], re.IGNORECASE) if tags.get("close") else TAG_CLOSE
+    return Detectors(headers, tag_open, tag_close)
+
+
+DEFAULT_DETECTORS = compile_detectors()
+
+
 def _read(path: Optional[Path]) -> str:
     return path.read_text(encoding="utf-8") if path else ""
 
 
-def analyze_files(system_path: Path, user_path: Optional[Path], cfg: Dict[str, Any]) -> Dict[str, Any]:
+def analyze_files(
+    system_path: Path,
+    user_path: Optional[Path],
+    cfg: Dict[str, Any],
+    detectors: Optional[Detectors] = None,
+) -> Dict[str, Any]:
     system_text = _read(system_path)
     user_text = _read(user_path)
-    parts = _extract_parts(system_text)
+    parts = analyze_text(system_text, cfg, detectors)
     return {
         "system_file": str(system_path),
         "user_file": str(user_path) if user_path else None,
@@ -33,80 +98,141 @@ def analyze_files(system_path: Path, user_path: Optional[Path], cfg: Dict[str, A
     }
 
 
-def _extract_parts(text: str) -> List[Part]:
-    # 1) tag blocks take precedence
-    tagged = _extract_tag_blocks(text)
-    consumed_ranges = [(p["start_line"], p["end_line"]) for p in tagged]
-
-    # 2) headings-based extraction for remaining regions
-    heading_parts = _extract_heading_sections(text, consumed_ranges)
-
-    return tagged + heading_parts
-
-
-def _extract_tag_blocks(text: str) -> List[Part]:
-    lines = text.splitlines()
-    parts: List[Part] = []
-    i = 0
-    while i < len(lines):
-        m = TAG_OPEN.search(lines[i])
-        if not m:
-            i += 1
-            continue
-        name = m.group("name").lower()
-        start = i + 1
-        # find close
-        j = start
-        while j < len(lines) and not TAG_CLOSE.search(lines[j]):
-            j += 1
-        content = "\n".join(lines[start:j]).strip()
-        parts.append({
-            "name": name,
-            "content": content,
-            "source": "tag",
-            "start_line": start,
-            "end_line": j,
-        })
-        i = j + 1
+def analyze_text(text: str, cfg: Dict[str, Any], detectors: Optional[Detectors] = None) -> List[Part]:
+    with trace.span("analyze.extract") as sp:
+        parts = _extract_parts(text, detectors or compile_detectors(cfg))
+        sp.set(parts=len(parts))
+    if trace.current() is not None:
+        trace.count("analyze.bytes", len(text.encode("utf-8")))
+        trace.count("analyze.parts", len(parts))
     return parts
 
 
-def _extract_heading_sections(text: str, consumed: List[tuple[int, int]]) -> List[Part]:
-    lines = text.splitlines()
-    parts: List[Part] = []
-    # find all headers and their ranges until next same/lower-level header
-    headers: List[tuple[int, str]] = []
-    for idx, line in enumerate(lines):
-        for name, pat in HEADER_PATTERNS.items():
-            if pat.match(line):
-                headers.append((idx, name))
-                break
-    headers.append((len(lines), "__eof__"))
-    for k in range(len(headers) - 1):
-        start_idx, name = headers[k]
-        end_idx, _ = headers[k + 1]
-        body_start = start_idx + 1
-        body = "\n".join(lines[body_start:end_idx]).strip()
-        if not body:
-            continue
-        # skip if overlaps consumed ranges
-        if _overlaps((body_start, end_idx), consumed):
-            continue
-        parts.append({
-            "name": name,
-            "content": body,
-            "source": "header",
-            "start_line": body_start,
-            "end_line": end_idx,
-        })
+def iter_file_parts(path: Path, detectors: Optional[Detectors] = None) -> Iterator[Part]:
+    """Stream parts from a file without loading it into memory."""
+    with path.open("r", encoding="utf-8") as f:
+        # per-line splitlines() keeps the same line breaks as str.splitlines()
+        yield from iter_parts((s for line in f for s in line.splitlines() or [""]), detectors)
+
+
+def _extract_parts(text: str, detectors: Optional[Detectors] = None) -> List[Part]:
+    # tag blocks first, then header sections, each in document order
+    parts = list(iter_parts(text.splitlines(), detectors))
+    parts.sort(key=lambda p: (p["source"] != "tag", p["start_line"]))
     return parts
 
 
-def _overlaps(a: tuple[int, int], ranges: List[tuple[int, int]]) -> bool:
-    for b in ranges:
-        if not (a[1] <= b[0] or a[0] >= b[1]):
-            return True
-    return False
+def iter_parts(lines: Iterable[str], detectors: Optional[Detectors] = None) -> Iterator[Part]:
+    """Single-pass scanner yielding each part as soon as it is complete.
+
+    A tag block is yielded at its closing tag, a header section at the next
+    header (or EOF), so parts come out in completion order. Tag blocks take
+    precedence: a header section overlapping any tag block is dropped, and its
+    buffered body is released as soon as the overlap is known. Only the part
+    currently being built is held in memory.
+    """
+    for name, source, start, end, buf in _scan(lines, detectors, keep_lines=True):
+        yield _make_part(name, source, start, end, buf)
+
+
+def iter_spans(lines: Iterable[str], detectors: Optional[Detectors] = None) -> Iterator[tuple[str, str, int, int]]:
+    """``iter_parts`` without the text: ``(name, source, start_line, end_line)``."""
+    for name, source, start, end, _ in _scan(lines, detectors, keep_lines=False):
+        yield name, source, start, end
+
+
+def extract_part_refs(buffer: SourceBuffer, detectors: Optional[Detectors] = None) -> List[PartRef]:
+    """Parts of ``buffer`` as offset-backed ``PartRef`` s, ordered like ``analyze_text``."""
+    with trace.span("analyze.extract") as sp:
+        refs = [PartRef(buffer, *span) for span in iter_spans(buffer.lines(), detectors)]
+        refs.sort(key=lambda p: (p.source != "tag", p.start_line))
+        sp.set(parts=len(refs))
+    trace.count("analyze.bytes", len(buffer))
+    trace.count("analyze.parts", len(refs))
+    return refs
+
+
+def analyze_file_refs(path: Path, detectors: Optional[Detectors] = None) -> List[PartRef]:
+    """Parts of a memory-mapped file; text is read from the mapping only when accessed."""
+    return extract_part_refs(SourceBuffer.open(path), detectors)
+
+
+_Span = tuple[str, str, int, int, List[str]]
+
+
+def _scan(lines: Iterable[str], detectors: Optional[Detectors], keep_lines: bool) -> Iterator[_Span]:
+    # the state machine behind iter_parts/iter_spans; line buffers stay empty
+    # unless keep_lines, and a section's "has text" flag replaces its content check
+    det = detectors or DEFAULT_DETECTORS
+    match_header = det.match_header
+    tag_open = det.tag_open.search
+    tag_close = det.tag_close.search
+
+    tag_name: Optional[str] = None
+    tag_start = 0
+    tag_buf: List[str] = []
+    sec_name: Optional[str] = None
+    sec_start = 0
+    sec_buf: Optional[List[str]] = None  # None once the section overlaps a tag block
+    sec_text = False
+
+    idx = -1
+    for idx, line in enumerate(lines):
+        name = match_header(line)
+        if name is not None:
+            if sec_name is not None and _section_kept(sec_start, idx, sec_buf, sec_text, tag_name, tag_start):
+                yield sec_name, "header", sec_start, idx, sec_buf  # type: ignore[misc]
+            sec_name, sec_start, sec_buf, sec_text = name, idx + 1, [], False
+        elif sec_buf is not None and tag_name is not None and idx > sec_start:
+            # a tag block still open past the first body line always overlaps
+            sec_buf = None
+
+        if tag_name is None:
+            m = tag_open(line)
+            if m:
+                tag_name = m.group("name").lower()
+                tag_start = idx + 1
+                tag_buf = []
+        elif tag_close(line):
+            yield tag_name, "tag", tag_start, idx, tag_buf
+            tag_name = None
+        elif keep_lines:
+            tag_buf.append(line)
+
+        if sec_buf is not None and name is None:
+            if keep_lines:
+                sec_buf.append(line)
+            if not sec_text and not line.isspace() and line:
+                sec_text = True
+
+    n = idx + 1
+    if sec_name is not None and _section_kept(sec_start, n, sec_buf, sec_text, tag_name, tag_start):
+        yield sec_name, "header", sec_start, n, sec_buf  # type: ignore[misc]
+    if tag_name is not None:
+        # unterminated block runs to EOF
+        yield tag_name, "tag", tag_start, n, tag_buf
+
+
+def _section_kept(
+    start: int,
+    end: int,
+    buf: Optional[List[str]],
+    has_text: bool,
+    tag_name: Optional[str],
+    tag_start: int,
+) -> bool:
+    # dropped when it overlaps a tag block or has no text once stripped
+    return buf is not None and has_text and not (tag_name is not None and tag_start < end)
+
+
+def _make_part(name: str, source: str, start: int, end: int, lines: List[str]) -> Part:
+    return {
+        "name": name,
+        "content": "\n".join(lines).strip(),
+        "source": source,
+        "start_line": start,
+        "end_line": end,
+    }
 
 
 # --- Semantic Analysis using LLM ---
@@ -127,6 +253,8 @@ CLASSIFICATION_SCHEMA = """
     *   **3.2. 응답 가이드라인 (Response Guidelines):** 응답의 어조, 스타일, 언어, "모른다" 정책 등.
 """
 
+GEMINI_MODEL = "gemini-1.5-flash"
+
 PROMPT_TEMPLATE = f"""
 당신은 LLM 컨텍스트 페이로드를 분석하는 전문가입니다.
 주어진 페이로드의 각 부분을 아래 분류 스키마에 따라 분석하고, 어떤 카테고리에 속하는지 분류해주세요.
@@ -146,7 +274,7 @@ PROMPT_TEMPLATE = f"""
 [분석 결과 (JSON 형식)]
 """
 
-def analyze_with_gemini(payload: str) -> List[Dict[str, Any]]:
+def analyze_with_gemini(payload: str, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
     """Analyzes and classifies the payload using the Gemini API."""
     import os
     import json
@@ -157,18 +285,24 @@ def analyze_with_gemini(payload: str) -> List[Dict[str, Any]]:
         raise ValueError("GOOGLE_API_KEY environment variable not set.")
 
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    model = genai.GenerativeModel(GEMINI_MODEL)
 
     prompt = PROMPT_TEMPLATE.format(payload=payload)
-    response = model.generate_content(prompt)
+    response = model.generate_content(prompt, request_options={"timeout": timeout} if timeout else None)
 
     # Extract JSON part from the response text
     cleaned_response = response.text.strip().replace("```json", "").replace("```", "")
     
     return json.loads(cleaned_response)
 
-def analyze_with_custom_llm(payload: str, url: str, model_name: str) -> List[Dict[str, Any]]:
-    """Analyzes the payload using a custom OpenAI-compatible endpoint."""
+def analyze_with_custom_llm(
+    payload: str, url: str, model_name: str, client: Any = None, timeout: float = 60.0
+) -> List[Dict[str, Any]]:
+    """Analyzes the payload using a custom OpenAI-compatible endpoint.
+
+    Pass a shared ``httpx.Client`` to reuse connections across calls;
+    ``timeout`` (seconds) applies per request either way.
+    """
     import json
     import httpx
 
@@ -180,14 +314,19 @@ def analyze_with_custom_llm(payload: str, url: str, model_name: str) -> List[Dic
         "temperature": 0,
     }
 
-    with httpx.Client(timeout=60.0) as client:
-        response = client.post(url, headers=headers, json=data)
+    owned = client is None
+    if owned:
+        client = httpx.Client(timeout=timeout)
+    try:
+        response = client.post(url, headers=headers, json=data, timeout=timeout)
         response.raise_for_status() # Raise an exception for bad status codes
-        
+
         result = response.json()
         content_str = result['choices'][0]['message']['content']
-        
+
         # The response content is expected to be a JSON string
         cleaned_response = content_str.strip().replace("```json", "").replace("```", "")
         return json.loads(cleaned_response)
-
+    finally:
+        if owned:
+            client.close()
@@ -0,0 +1,234 @@
+"""Compact, indexed parts file readable through mmap.
+
+Layout (little-endian)::
+
+    header   MAGIC, version, counts and section offsets (``_HEADER``)
+    content  UTF-8 part contents, back to back, grouped by file
+    strings  JSON array of the file paths, part names and errors
+    files    one ``_FILE`` record per analyzed file
+    parts    one ``_PART`` record per part; a file's parts are contiguous
+    by_name  one ``_NAME`` record per part name, then the part indices
+
+The sections after ``content`` form the index. A reader maps the file and
+decodes only the records and contents it is asked for.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import struct
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Union
+
+from .parts import PartRef
+
+MAGIC = b"VCERPRT\x00"
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+# magic, version, n_strings, n_files, n_parts, n_names, then offset/length of strings, files, parts, by_name
+_HEADER = struct.Struct("<8sIIIII4x8Q")
+# path, user file, first part, part count, error (string ids; NONE when absent)
+_FILE = struct.Struct("<5I")
+# name id, source (0 = tag, 1 = header), start_line, end_line, content offset, content length
+_PART = struct.Struct("<IB3xIIQQ")
+# name id, offset of its part indices (u32 each) in the by_name section, count
+_NAME = struct.Struct("<IIQ")
+
+_SOURCES = ("tag", "header")
+
+
+def is_parts_bin(path: Path) -> bool:
+    try:
+        with path.open("rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class StoredPart(PartRef):
+    """A part whose content lives at ``offset`` in a ``PartsFile``."""
+
+    __slots__ = ("offset", "length")
+
+    def __init__(self, file: "PartsFile", name: str, source: str, start_line: int, end_line: int, offset: int, length: int) -> None:
+        super().__init__(file, name, source, start_line, end_line)  # type: ignore[arg-type]
+        self.offset = offset
+        self.length = length
+
+    @property
+    def content(self) -> str:
+        return self.buffer.decode(self.offset, self.length)  # type: ignore[attr-defined]
+
+
+class PartsWriter:
+    """Streams analyze results into the binary format.
+
+    Contents are written as results arrive; only the fixed-size records and
+    the string table are kept until ``close()`` writes the index.
+    """
+
+    def __init__(self, fh: BinaryIO) -> None:
+        self.fh = fh
+        self._strings: Dict[str, int] = {}
+        self._files = array("I")
+        self._parts = bytearray()
+        self._by_name: Dict[int, array] = {}
+        self._n_parts = 0
+        fh.write(b"\0" * _HEADER.size)
+        self._offset = _HEADER.size
+
+    def _sid(self, s: Optional[str]) -> int:
+        if s is None:
+            return NONE
+        sid = self._strings.get(s)
+        if sid is None:
+            sid = self._strings[s] = len(self._strings)
+        return sid
+
+    def add(self, result: Dict[str, Any]) -> None:
+        """Append one ``analyze_files``-shaped result (``error`` key allowed)."""
+        first = self._n_parts
+        for p in result.get("parts", []):
+            data = p.get("content", "").encode("utf-8")
+            name = self._sid(p.get("name", "other"))
+            source = _SOURCES.index(p.get("source", "header"))
+            self._parts += _PART.pack(name, source, p.get("start_line", 0), p.get("end_line", 0), self._offset, len(data))
+            self._by_name.setdefault(name, array("I")).append(self._n_parts)
+            self.fh.write(data)
+            self._offset += len(data)
+            self._n_parts += 1
+        self._files.extend((
+            self._sid(str(result.get("system_file", ""))),
+            self._sid(result.get("user_file")),
+            first,
+            self._n_parts - first,
+            self._sid(result.get("error")),
+        ))
+
+    def close(self) -> None:
+        strings = json.dumps(list(self._strings), ensure_ascii=False).encode("utf-8")
+        names = bytearray()
+        indices = bytearray()
+        for name, idx in sorted(self._by_name.items()):
+            names += _NAME.pack(name, len(indices), len(idx))
+            indices += idx.tobytes()
+        sections = [strings, self._files.tobytes(), bytes(self._parts), bytes(names) + bytes(indices)]
+        layout = []
+        for blob in sections:
+            self.fh.write(blob)
+            layout += [self._offset, len(blob)]
+            self._offset += len(blob)
+        n_files = len(self._files) // 5
+        self.fh.seek(0)
+        self.fh.write(_HEADER.pack(MAGIC, VERSION, len(self._strings), n_files, self._n_parts, len(self._by_name), *layout))
+        self.fh.flush()
+
+
+def write_parts_bin(path: Path, results: Iterable[Dict[str, Any]]) -> int:
+    """Write results to ``path``; returns the number of files written."""
+    n = 0
+    with path.open("wb") as fh:
+        writer = PartsWriter(fh)
+        for result in results:
+            writer.add(result)
+            n += 1
+        writer.close()
+    return n
+
+
+class PartsFile:
+    """Memory-mapped reader: look up files and parts without decoding the rest."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, _, self.n_files, self.n_parts, n_names,
+         s_off, s_len, self._files_off, _, self._parts_off, _, self._names_off, _) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a vcer parts file")
+        if version != VERSION:
+            raise ValueError(f"{path} has parts format version {version}, expected {VERSION}")
+        self.strings: List[str] = json.loads(self._mm[s_off:s_off + s_len].decode("utf-8"))
+        self._file_ids = {self.strings[_FILE.unpack_from(self._mm, self._files_off + i * _FILE.size)[0]]: i for i in range(self.n_files)}
+        self._names: Dict[str, tuple[int, int]] = {}
+        indices_off = self._names_off + n_names * _NAME.size
+        for i in range(n_names):
+            name, off, count = _NAME.unpack_from(self._mm, self._names_off + i * _NAME.size)
+            self._names[self.strings[name]] = (indices_off + off, count)
+
+    def __enter__(self) -> "PartsFile":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def decode(self, offset: int, length: int) -> str:
+        return self._mm[offset:offset + length].decode("utf-8")
+
+    def files(self) -> List[str]:
+        return list(self._file_ids)
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def part(self, index: int) -> StoredPart:
+        name, source, start, end, off, length = _PART.unpack_from(self._mm, self._parts_off + index * _PART.size)
+        return StoredPart(self, self.strings[name], _SOURCES[source], start, end, off, length)
+
+    def file_index(self, file: Union[str, int, None] = None) -> int:
+        if file is None:
+            if self.n_files != 1:
+                raise KeyError(f"{self.path} holds {self.n_files} files; name one of them")
+            return 0
+        if isinstance(file, int):
+            return file
+        try:
+            return self._file_ids[file]
+        except KeyError:
+            raise KeyError(f"{file} is not in {self.path}") from None
+
+    def file(self, file: Union[str, int, None] = None) -> Dict[str, Any]:
+        """One result in the ``analyze`` JSON shape, with ``StoredPart`` parts."""
+        path, user, first, count, error = _FILE.unpack_from(self._mm, self._files_off + self.file_index(file) * _FILE.size)
+        result: Dict[str, Any] = {
+            "system_file": self.strings[path],
+            "user_file": self.strings[user] if user != NONE else None,
+            "parts": [self.part(i) for i in range(first, first + count)],
+        }
+        if error != NONE:
+            result["error"] = self.strings[error]
+        return result
+
+    def results(self) -> Iterator[Dict[str, Any]]:
+        for i in range(self.n_files):
+            yield self.file(i)
+
+    def parts_named(self, name: str) -> Iterator[StoredPart]:
+        """Every part called ``name``, across files, via the by-name index."""
+        off, count = self._names.get(name, (0, 0))
+        for index in array("I", self._mm[off:off + 4 * count]):
+            yield self.part(index)
+
+    def digest(self, file: Union[str, int, None] = None) -> str:
+        """Hash of one file's paths, part names, records and contents, for cache keys."""
+        path, user, first, count, error = _FILE.unpack_from(self._mm, self._files_off + self.file_index(file) * _FILE.size)
+        h = hashlib.sha256()
+        records = self._parts_off + first * _PART.size
+        # records hold string-table ids; hash the strings they resolve to
+        names = [self.strings[_PART.unpack_from(self._mm, records + i * _PART.size)[0]] for i in range(count)]
+        strings = [self.strings[i] if i != NONE else None for i in (path, user, error)]
+        h.update(json.dumps([strings, names], ensure_ascii=False).encode("utf-8"))
+        h.update(self._mm[records:records + count * _PART.size])
+        if count:
+            start = _PART.unpack_from(self._mm, records)[4]
+            last = _PART.unpack_from(self._mm, records + (count - 1) * _PART.size)
+            h.update(self._mm[start:last[4] + last[5]])
+        return h.hexdigest()
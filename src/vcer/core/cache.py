@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .. import __version__
+from . import trace
+
+
+DEFAULT_CACHE_DIR = ".vcer_cache"
+DEFAULT_MAX_MB = 256
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(kind: str, text: str, cfg_section: Any) -> str:
+    """Key = input hash + hash of the config section that affects the result.
+
+    The package version is folded in so an upgrade never serves stale output.
+    """
+    cfg_blob = json.dumps(cfg_section, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}:{__version__}:{content_hash(text)}:{content_hash(cfg_blob)[:16]}"
+
+
+class ResultCache:
+    """Size-bounded LRU cache of pipeline outputs in a single SQLite file."""
+
+    def __init__(self, path: Path, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # callers may share one cache across worker threads; they serialize access
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                atime REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_atime ON entries(atime);
+            CREATE TABLE IF NOT EXISTS counters (
+                kind TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        kind = key.split(":", 1)[0]
+        row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        with self._db:
+            if row is None:
+                self._count(kind, "misses")
+                trace.count(f"cache.{kind}.misses")
+                return None
+            self._db.execute("UPDATE entries SET atime = ? WHERE key = ?", (time.time(), key))
+            self._count(kind, "hits")
+            trace.count(f"cache.{kind}.hits")
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        kind = key.split(":", 1)[0]
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, atime) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, value, size, time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # drop least recently used entries until we are back under the bound
+        excess = total - self.max_bytes
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY atime"):
+            doomed.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def _count(self, kind: str, field: str) -> None:
+        self._db.execute("INSERT OR IGNORE INTO counters (kind) VALUES (?)", (kind,))
+        self._db.execute(f"UPDATE counters SET {field} = {field} + 1 WHERE kind = ?", (kind,))
+
+    def stats(self) -> Dict[str, Any]:
+        by_kind: Dict[str, Dict[str, int]] = {}
+        for kind, n, size in self._db.execute("SELECT kind, COUNT(*), SUM(size) FROM entries GROUP BY kind"):
+            by_kind[kind] = {"entries": n, "bytes": size, "hits": 0, "misses": 0}
+        for kind, hits, misses in self._db.execute("SELECT kind, hits, misses FROM counters"):
+            row = by_kind.setdefault(kind, {"entries": 0, "bytes": 0, "hits": 0, "misses": 0})
+            row["hits"], row["misses"] = hits, misses
+        return {
+            "path": str(self.path),
+            "max_bytes": self.max_bytes,
+            "bytes": sum(r["bytes"] for r in by_kind.values()),
+            "entries": sum(r["entries"] for r in by_kind.values()),
+            "kinds": by_kind,
+        }
+
+    def clear(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM counters")
+        self._db.execute("VACUUM")
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def open_cache(cfg: Dict[str, Any], root: Path) -> ResultCache:
+    """Open the result cache configured under ``cache`` in ``.vcer.yml``."""
+    ccfg = cfg.get("cache") or {}
+    path = root / ccfg.get("dir", DEFAULT_CACHE_DIR) / "results.sqlite"
+    max_bytes = int(float(ccfg.get("max_mb", DEFAULT_MAX_MB)) * 1024 * 1024)
+    return ResultCache(path, max_bytes)
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .analyzer import Detectors, analyze_file_refs, compile_detectors
+
+
+def collect_files(inputs: Iterable[str], pattern: str = "*.md") -> List[Path]:
+    """Expand files, directories (searched recursively for ``pattern``) and globs."""
+    seen: Dict[str, Path] = {}
+    for inp in inputs:
+        if glob.has_magic(inp):
+            matches = [Path(m) for m in glob.glob(inp, recursive=True)]
+        elif Path(inp).is_dir():
+            matches = list(Path(inp).rglob(pattern))
+        else:
+            matches = [Path(inp)]
+        for m in matches:
+            if not m.is_dir():
+                seen.setdefault(str(m), m)
+    return [seen[k] for k in sorted(seen)]
+
+
+_DETECTORS: Optional[Detectors] = None
+
+
+def _init_worker(cfg: Dict[str, Any]) -> None:
+    # compile detectors once per worker process, not once per file
+    global _DETECTORS
+    _DETECTORS = compile_detectors(cfg)
+
+
+def _analyze_one(path: str) -> Dict[str, Any]:
+    try:
+        # scan the mapped file instead of a decoded copy plus its line list;
+        # only each part's own text is materialized for the result
+        parts = [p.to_dict() for p in analyze_file_refs(Path(path), _DETECTORS)]
+        return {"system_file": path, "user_file": None, "parts": parts}
+    except Exception as e:
+        return {"system_file": path, "user_file": None, "parts": [], "error": f"{type(e).__name__}: {e}"}
+
+
+def analyze_corpus(
+    files: List[Path],
+    cfg: Dict[str, Any],
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Analyze many files over a process pool, yielding results in input order.
+
+    Each result has the same shape as ``analyze_files``; a file that fails gets
+    an ``error`` key instead of aborting the run.
+    """
+    workers = workers or os.cpu_count() or 1
+    paths = [str(f) for f in files]
+    if workers <= 1 or len(paths) <= 1:
+        _init_worker(cfg)
+        yield from map(_analyze_one, paths)
+        return
+    if not chunksize:
+        # same heuristic as multiprocessing.Pool.map: ~4 chunks per worker
+        chunksize, extra = divmod(len(paths), workers * 4)
+        chunksize += 1 if extra else 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cfg,)) as pool:
+        yield from pool.map(_analyze_one, paths, chunksize=max(1, chunksize))
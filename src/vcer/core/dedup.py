@@ -0,0 +1,323 @@
+"""Exact and near-duplicate detection for parts and few-shot examples.
+
+Every part (and every example inside a ``few_shot`` part) is reduced to the
+set of character shingles (``k``-character substrings) of its words,
+lowercased. Text identical up to whitespace is an exact duplicate;
+otherwise the shingles are hashed into a MinHash signature that is banded for LSH, and
+candidate pairs from shared buckets are confirmed by the exact Jaccard
+similarity of their shingle sets, so the sketch only decides which pairs
+get compared.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .optimizer import _section, _split_examples
+from .parts import Part
+from .tokens import TokenCounter, token_counter
+
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_SHINGLE = 5
+DEFAULT_NUM_PERM = 64
+# near-duplicate matching needs some text to go on; shorter units only match exactly
+DEFAULT_MIN_WORDS = 8
+
+_WORD = re.compile(r"\w+")
+# "### Example 3" numbering says nothing about an example's content
+_EXAMPLE_HEADING = re.compile(r"\A\s*#{3,6}\s[^\n]*\n?")
+_MASK64 = (1 << 64) - 1
+
+
+def shingles(text: str, k: int = DEFAULT_SHINGLE) -> frozenset[str]:
+    """``k``-character shingles of ``text`` (already normalized)."""
+    if len(text) <= k:
+        return frozenset((text,)) if text else frozenset()
+    return frozenset(text[i:i + k] for i in range(len(text) - k + 1))
+
+
+def minhash(items: Iterable[str], num_perm: int = DEFAULT_NUM_PERM) -> Tuple[int, ...]:
+    """One-permutation MinHash: each shingle's 64-bit hash lands in one of
+    ``num_perm`` bins and keeps the bin minimum; empty bins borrow from the next
+    filled bin (rotation densification). One hash per shingle instead of ``num_perm``."""
+    empty = _MASK64 + 1
+    bins = [empty] * num_perm
+    for item in items:
+        h = int.from_bytes(hashlib.blake2b(item.encode("utf-8"), digest_size=8).digest(), "little")
+        b, v = h % num_perm, h // num_perm
+        if v < bins[b]:
+            bins[b] = v
+    if all(v == empty for v in bins):
+        return tuple(bins)
+    # borrowed values are offset per step so they never equal a bin's own value
+    offset = _MASK64 // num_perm + 1
+    sig = []
+    for b in range(num_perm):
+        step = 0
+        while bins[(b + step) % num_perm] == empty:
+            step += 1
+        sig.append(bins[(b + step) % num_perm] + step * offset)
+    return tuple(sig)
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """``(bands, rows)`` with ``bands * rows == num_perm`` whose S-curve midpoint
+    ``(1/bands) ** (1/rows)`` sits closest below ``threshold`` (recall over precision;
+    candidates are verified anyway)."""
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1.0 / bands) ** (1.0 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+def jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _Unit:
+    __slots__ = ("prompt", "part", "example", "name", "start_line", "text", "norm", "digest", "words", "k", "_shingles", "tokens")
+
+    def __init__(self, prompt: int, part: int, example: Optional[int], p: Part, text: str, tokens: int, k: int) -> None:
+        self.prompt = prompt
+        self.part = part
+        self.example = example
+        self.name = p.get("name", "other")
+        self.start_line = p.get("start_line")
+        self.text = text
+        if example is not None:
+            text = _EXAMPLE_HEADING.sub("", text, count=1)
+        # exact copies may differ only in whitespace; the word-only form is for shingling,
+        # where "< 100" and "> 100" would otherwise count as the same text
+        self.digest = hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+        words = _WORD.findall(text.lower())
+        self.norm = " ".join(words)
+        self.words = len(words)
+        self.k = k
+        self._shingles: Optional[frozenset[str]] = None
+        self.tokens = tokens
+
+    @property
+    def shingles(self) -> frozenset[str]:
+        # only units that reach the LSH stage pay for shingling
+        if self._shingles is None:
+            self._shingles = shingles(self.norm, self.k)
+        return self._shingles
+
+    def sort_key(self) -> Tuple[int, int, int, int]:
+        line = self.start_line if self.start_line is not None else 10**9
+        return (self.prompt, line, self.part, -1 if self.example is None else self.example)
+
+
+class DedupSettings:
+    """``optimize.dedup``: ``enabled``, ``threshold`` (Jaccard), ``shingle``
+    (characters per shingle), ``num_perm``, ``min_words`` and ``examples`` (also
+    compare individual few-shot examples)."""
+
+    __slots__ = ("enabled", "threshold", "shingle", "num_perm", "min_words", "examples")
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        threshold: float = DEFAULT_THRESHOLD,
+        shingle: int = DEFAULT_SHINGLE,
+        num_perm: int = DEFAULT_NUM_PERM,
+        min_words: int = DEFAULT_MIN_WORDS,
+        examples: bool = True,
+    ) -> None:
+        if not 0.0 < float(threshold) <= 1.0:
+            raise ValueError("optimize.dedup.threshold must be in (0, 1]")
+        self.enabled = bool(enabled)
+        self.threshold = float(threshold)
+        self.shingle = max(1, int(shingle))
+        self.num_perm = max(1, int(num_perm))
+        self.min_words = int(min_words)
+        self.examples = bool(examples)
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Dict[str, Any]] = None, **overrides: Any) -> "DedupSettings":
+        dcfg = dict(((cfg or {}).get("optimize") or {}).get("dedup") or {})
+        dcfg.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**{k: dcfg[k] for k in cls.__slots__ if k in dcfg})
+
+
+def _cluster(units: List[_Unit], st: DedupSettings) -> List[List[Tuple[_Unit, float]]]:
+    """Groups of duplicate units, each led by its earliest unit, with every
+    member's similarity to that leader (1.0 for exact copies)."""
+    parent = list(range(len(units)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int) -> None:
+        a, b = find(i), find(j)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    by_digest: Dict[str, int] = {}
+    for i, u in enumerate(units):
+        first = by_digest.setdefault(u.digest, i)
+        if first != i:
+            union(first, i)
+
+    if st.threshold < 1.0:
+        bands, rows = lsh_bands(st.num_perm, st.threshold)
+        buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        for i in sorted(set(by_digest.values())):
+            u = units[i]
+            if u.words < st.min_words:
+                continue
+            sig = minhash(u.shingles, st.num_perm)
+            for b in range(bands):
+                buckets[(b, sig[b * rows:(b + 1) * rows])].append(i)
+        checked = set()
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    pair = (members[x], members[y])
+                    if pair in checked or find(pair[0]) == find(pair[1]):
+                        continue
+                    checked.add(pair)
+                    if jaccard(units[pair[0]].shingles, units[pair[1]].shingles) >= st.threshold:
+                        union(*pair)
+
+    groups: Dict[int, List[_Unit]] = defaultdict(list)
+    for i, u in enumerate(units):
+        groups[find(i)].append(u)
+    clusters = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=_Unit.sort_key)
+        lead = members[0]
+        sims = {lead.digest: 1.0}
+        for u in members:
+            if u.digest not in sims:
+                sims[u.digest] = jaccard(lead.shingles, u.shingles)
+        clusters.append([(u, sims[u.digest]) for u in members])
+    return clusters
+
+
+def _cluster_dict(cluster: List[Tuple[_Unit, float]], labels: Optional[Sequence[str]]) -> Dict[str, Any]:
+    members = []
+    for u, sim in cluster:
+        row: Dict[str, Any] = {"name": u.name, "start_line": u.start_line, "tokens": u.tokens, "similarity": round(sim, 3)}
+        if labels is not None:
+            row["file"] = labels[u.prompt]
+        if u.example is not None:
+            row["example"] = u.example
+        members.append(row)
+    return {
+        "kind": "exact" if len({u.digest for u, _ in cluster}) == 1 else "near",
+        "level": "part" if cluster[0][0].example is None else "example",
+        "similarity": round(min(sim for _, sim in cluster), 3),
+        "tokens_saved": sum(u.tokens for u, _ in cluster[1:]),
+        "preview": " ".join(cluster[0][0].text.split())[:80],
+        "members": members,
+    }
+
+
+def find_duplicates(
+    prompts: Sequence[Sequence[Part]],
+    cfg: Optional[Dict[str, Any]] = None,
+    *,
+    labels: Optional[Sequence[str]] = None,
+    counter: Optional[TokenCounter] = None,
+    **settings: Any,
+) -> Dict[str, Any]:
+    """Duplicate clusters within and across ``prompts``.
+
+    Parts are compared first; then, if ``examples`` is on, the examples of
+    every ``few_shot`` part that is not itself a duplicate. The earliest
+    member of each cluster (prompt, then source line) is the one to keep;
+    ``tokens_saved`` counts the rest. ``labels`` names the prompts in the report.
+    """
+    return _find(prompts, DedupSettings.from_config(cfg, **settings), labels, counter or token_counter(cfg))[0]
+
+
+def _worded(units: Iterable[_Unit]) -> List[_Unit]:
+    # rules like "---" or "| | |" carry no words to compare and are never duplicates
+    return [u for u in units if u.norm]
+
+
+def _find(
+    prompts: Sequence[Sequence[Part]],
+    st: DedupSettings,
+    labels: Optional[Sequence[str]],
+    counter: TokenCounter,
+) -> Tuple[Dict[str, Any], List[List[Tuple[_Unit, float]]]]:
+    units = _worded(
+        _Unit(pi, i, None, p, p.get("content", ""), counter.count(_section(p)), st.shingle)
+        for pi, parts in enumerate(prompts) for i, p in enumerate(parts)
+        if p.get("content", "").strip()
+    )
+    clusters = _cluster(units, st)
+    later = {(u.prompt, u.part) for c in clusters for u, _ in c[1:]}
+    if st.examples:
+        examples = []
+        for pi, parts in enumerate(prompts):
+            for i, p in enumerate(parts):
+                if p.get("name") != "few_shot" or (pi, i) in later:
+                    continue
+                split = _split_examples(p.get("content", ""))
+                if len(split) > 1:
+                    examples += _worded(_Unit(pi, i, e, p, text, counter.count(text), st.shingle) for e, text in enumerate(split) if text.strip())
+        clusters += _cluster(examples, st)
+    out = [_cluster_dict(c, labels) for c in clusters]
+    out.sort(key=lambda c: -c["tokens_saved"])
+    total = sum(u.tokens for u in units)
+    saved = sum(c["tokens_saved"] for c in out)
+    return {
+        "threshold": st.threshold,
+        "prompts": len(prompts),
+        "units": len(units),
+        "tokens": total,
+        "tokens_saved": saved,
+        "clusters": out,
+    }, clusters
+
+
+def collapse_duplicates(
+    parts: List[Part],
+    cfg: Optional[Dict[str, Any]] = None,
+    *,
+    counter: Optional[TokenCounter] = None,
+    report: Optional[Dict[str, Any]] = None,
+    **settings: Any,
+) -> List[Part]:
+    """``parts`` of one prompt without repeats: the earliest copy of each
+    duplicated part or few-shot example stays, later copies are removed.
+    ``report`` (if given) receives the clusters and what was removed."""
+    st = DedupSettings.from_config(cfg, **settings)
+    found, clusters = _find([parts], st, None, counter or token_counter(cfg))
+    drop_parts = set()
+    drop_examples: Dict[int, set] = defaultdict(set)
+    for cluster in clusters:
+        for u, _ in cluster[1:]:
+            if u.example is None:
+                drop_parts.add(u.part)
+            else:
+                drop_examples[u.part].add(u.example)
+    out: List[Part] = []
+    for i, p in enumerate(parts):
+        if i in drop_parts:
+            continue
+        if i in drop_examples:
+            kept = [ex for e, ex in enumerate(_split_examples(p.get("content", ""))) if e not in drop_examples[i]]
+            p = {**p, "content": "".join(kept)}  # type: ignore[misc]
+        out.append(p)
+    if report is not None:
+        report.update(found)
+        report["removed"] = {"parts": len(drop_parts), "examples": sum(len(e) for e in drop_examples.values())}
+    return out
@@ -1,21 +1,233 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import re
+from typing import Any, Dict, List, Optional
 
+from . import trace
 from .parts import DEFAULT_ORDER, Part
+from .prefix import DEFAULT_STABLE_THRESHOLD, expected_prefix_tokens, prefix_fingerprint, prefix_order
+from .tokens import TokenCounter, token_counter
 
+# never dropped or trimmed to meet the budget
+DEFAULT_KEEP = ("title", "task", "constraints", "output_format")
+# a trimmed part smaller than this carries little; drop it instead
+MIN_TRIMMED_TOKENS = 32
+# examples inside a few-shot part start at a sub-heading or an "Example"/"예시" label
+_EXAMPLE = re.compile(r"^(?:#{3,6}\s|(?:example|예시)\b)", re.IGNORECASE | re.MULTILINE)
 
-def optimize_parts(data: Dict[str, Any], cfg: Dict[str, Any]) -> List[Part]:
+
+def optimize_parts(
+    data: Dict[str, Any],
+    cfg: Dict[str, Any],
+    *,
+    budget: Optional[int] = None,
+    counter: Optional[TokenCounter] = None,
+    report: Optional[Dict[str, Any]] = None,
+    stability: Optional[Dict[str, Dict[str, Any]]] = None,
+    dedup: Optional[bool] = None,
+) -> List[Part]:
+    """Order parts by ``optimize.order`` and fit them to ``limits``.
+
+    ``budget`` overrides ``limits.max_context_tokens``. When ``report`` is
+    given it is filled with per-part token counts and trimming decisions.
+    With ``stability`` (see ``prefix.part_stability``) parts are ordered for
+    prefix-cache reuse instead, subject to ``optimize.prefix.constraints``,
+    and the report gains a ``prefix`` section. ``dedup`` (default
+    ``optimize.dedup.enabled``) first removes repeated parts and few-shot
+    examples, keeping the earliest copy; the report gains a ``dedup`` section.
+    """
     parts: List[Part] = data.get("parts", [])
-    order = cfg.get("optimize", {}).get("order", DEFAULT_ORDER)
+    opt = cfg.get("optimize") or {}
+    dedup_report: Optional[Dict[str, Any]] = None
+    if dedup is None:
+        dedup = bool((opt.get("dedup") or {}).get("enabled", False))
+    if dedup:
+        from .dedup import collapse_duplicates
+
+        counter = counter or token_counter(cfg)
+        dedup_report = {}
+        with trace.span("optimize.dedup") as sp:
+            parts = collapse_duplicates(parts, cfg, counter=counter, report=dedup_report)
+            sp.set(**dedup_report["removed"])
+    order = opt.get("order", DEFAULT_ORDER)
     priority = {name: i for i, name in enumerate(order)}
 
     def key(p: Part) -> tuple[int, int]:
         name = p.get("name", "other")
         return (priority.get(name, 999), p.get("start_line", 10**9))
 
-    parts_sorted = sorted(parts, key=key)
-    return parts_sorted
+    with trace.span("optimize.order", parts=len(parts), prefix=stability is not None):
+        if stability is not None:
+            parts_sorted = prefix_order(parts, stability, priority, (opt.get("prefix") or {}).get("constraints", ()))
+        else:
+            parts_sorted = sorted(parts, key=key)
+    limits = cfg.get("limits") or {}
+    if report is None and budget is None and not limits.get("max_context_tokens") and not limits.get("max_examples"):
+        return parts_sorted
+    counter = counter or token_counter(cfg)
+    with trace.span("optimize.fit") as sp:
+        fitted, rep = fit_budget(parts_sorted, cfg, budget=budget, counter=counter, priority=priority)
+        sp.set(tokens_before=rep["tokens_before"], tokens=rep["tokens"], tokenizer=rep["tokenizer"])
+    trace.count("optimize.tokens_in", rep["tokens_before"])
+    trace.count("optimize.tokens_out", rep["tokens"])
+    if report is not None:
+        report.update(rep)
+        if stability is not None:
+            report["prefix"] = prefix_report(fitted, sorted(fitted, key=key), stability, cfg, counter)
+        if dedup_report is not None:
+            report["dedup"] = dedup_report
+    return fitted
+
+
+def prefix_report(
+    parts: List[Part],
+    baseline: List[Part],
+    stability: Dict[str, Dict[str, Any]],
+    cfg: Dict[str, Any],
+    counter: TokenCounter,
+) -> Dict[str, Any]:
+    """Fingerprint and expected shared prefix of ``parts`` vs. the plain priority order."""
+    threshold = ((cfg.get("optimize") or {}).get("prefix") or {}).get("stable_threshold", DEFAULT_STABLE_THRESHOLD)
+    names = [p.get("name", "other") for p in parts]
+    sections = [_section(p) for p in parts]
+    fp = prefix_fingerprint(sections, [stability.get(n, {}).get("reuse", 0.0) >= threshold for n in names])
+    return {
+        **fp,
+        "prefix_tokens": counter.count("".join(sections[: fp["stable_sections"]])),
+        "expected_shared_tokens": round(expected_prefix_tokens(names, stability)),
+        "baseline_expected_shared_tokens": round(expected_prefix_tokens([p.get("name", "other") for p in baseline], stability)),
+        "parts": {
+            name: {**st, "class": "stable" if st["reuse"] >= threshold else "volatile"}
+            for name, st in stability.items()
+        },
+    }
+
+
+def fit_budget(
+    parts: List[Part],
+    cfg: Dict[str, Any],
+    *,
+    budget: Optional[int] = None,
+    counter: Optional[TokenCounter] = None,
+    priority: Optional[Dict[str, int]] = None,
+) -> tuple[List[Part], Dict[str, Any]]:
+    """Cap few-shot examples and trim ordered parts to a token budget.
+
+    Few-shot examples go first (beyond ``limits.max_examples``, then from the
+    last one back), then whole parts from the lowest priority up; a part that
+    only needs shortening loses trailing lines instead. Parts listed in
+    ``limits.keep`` are never touched, so the result may still be over budget
+    (``over_budget`` in the report).
+    """
+    limits = cfg.get("limits") or {}
+    if budget is None:
+        budget = limits.get("max_context_tokens")
+    max_examples = limits.get("max_examples")
+    keep = set(limits.get("keep", DEFAULT_KEEP))
+    counter = counter or token_counter(cfg)
+    priority = priority or {}
+
+    parts = [dict(p) for p in parts]  # type: ignore[misc]
+    rows = [{"name": p.get("name", "other"), "start_line": p.get("start_line"), "action": "kept"} for p in parts]
+
+    tokens = [counter.count(_section(p)) for p in parts]
+    for row, n in zip(rows, tokens):
+        row["tokens_before"] = n
+    tokens_before = sum(tokens)
+
+    # examples per few-shot part, in prompt order
+    trimmable = "few_shot" not in keep
+    examples: List[List[str]] = [_split_examples(p.get("content", "")) if p.get("name") == "few_shot" else [] for p in parts]
+    found = sum(len(ex) for ex in examples)
+    if max_examples is not None and trimmable:
+        room = max_examples
+        for i, ex in enumerate(examples):
+            if len(ex) > room:
+                examples[i] = ex[:room]
+                _set_examples(parts[i], rows[i], examples[i])
+                tokens[i] = counter.count(_section(parts[i])) if examples[i] else 0
+            room -= len(examples[i])
+    over = sum(tokens) - budget if budget is not None else 0
+
+    # 1. remaining few-shot examples, last first
+    for i in reversed(range(len(parts))):
+        while over > 0 and trimmable and examples[i]:
+            examples[i].pop()
+            _set_examples(parts[i], rows[i], examples[i])
+            n = counter.count(_section(parts[i])) if examples[i] else 0
+            over -= tokens[i] - n
+            tokens[i] = n
+
+    # 2. whole parts from the lowest priority up, later parts first among equals
+    candidates = sorted(
+        (i for i, p in enumerate(parts) if tokens[i] and p.get("name", "other") not in keep),
+        key=lambda i: (priority.get(parts[i].get("name", "other"), 999), i),
+        reverse=True,
+    )
+    for i in candidates:
+        if over <= 0:
+            break
+        target = tokens[i] - over
+        if target >= MIN_TRIMMED_TOKENS and _truncate(parts[i], target, counter):
+            rows[i]["action"] = "trimmed"
+            n = counter.count(_section(parts[i]))
+        else:
+            rows[i]["action"] = "dropped"
+            n = 0
+        over -= tokens[i] - n
+        tokens[i] = n
+
+    fitted = [p for p, n in zip(parts, tokens) if n]
+    for row, n in zip(rows, tokens):
+        row["tokens"] = n
+    report: Dict[str, Any] = {
+        "tokenizer": counter.name,
+        "budget": budget,
+        "tokens_before": tokens_before,
+        "tokens": sum(tokens),
+        "over_budget": over > 0,
+        "examples": {"found": found, "kept": sum(len(ex) for ex in examples)},
+        "parts": rows,
+    }
+    return fitted, report  # type: ignore[return-value]
+
+
+def _section(p: Part) -> str:
+    # what render_markdown emits for this part, so counts match the output
+    name = p.get("name", "other")
+    return f"## {DISPLAY_NAME.get(name, name.title())}\n\n{p.get('content', '').strip()}\n"
+
+
+def _split_examples(content: str) -> List[str]:
+    starts = [m.start() for m in _EXAMPLE.finditer(content)]
+    if not starts:
+        return [content] if content.strip() else []
+    if starts[0] > 0 and content[: starts[0]].strip():
+        # an intro before the first example stays attached to it
+        starts[0] = 0
+    bounds = starts + [len(content)]
+    return [content[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def _set_examples(p: Dict[str, Any], row: Dict[str, Any], examples: List[str]) -> None:
+    p["content"] = "".join(examples)
+    row["action"] = "trimmed" if examples else "dropped"
+
+
+def _truncate(p: Dict[str, Any], target: int, counter: TokenCounter) -> bool:
+    """Keep the longest run of leading lines that fits ``target`` tokens."""
+    lines = p.get("content", "").splitlines(keepends=True)
+    lo, hi = 0, len(lines) - 1  # dropping no line would not fit, or we would not be here
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if counter.count(_section({**p, "content": "".join(lines[:mid])})) <= target:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo == 0:
+        return False
+    p["content"] = "".join(lines[:lo])
+    return True
 
 
 DISPLAY_NAME = {
@@ -35,11 +247,12 @@ DISPLAY_NAME = {
 
 
 def render_markdown(parts: List[Part]) -> str:
-    sections = []
-    for p in parts:
-        name = p.get("name", "other")
-        title = DISPLAY_NAME.get(name, name.title())
-        body = p.get("content", "").strip()
-        sections.append(f"## {title}\n\n{body}\n")
-    return "\n".join(sections).strip() + "\n"
+    with trace.span("render.markdown", parts=len(parts)):
+        sections = []
+        for p in parts:
+            name = p.get("name", "other")
+            title = DISPLAY_NAME.get(name, name.title())
+            body = p.get("content", "").strip()
+            sections.append(f"## {title}\n\n{body}\n")
+        return "\n".join(sections).strip() + "\n"
 
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import mmap
+import os
+import re
+from array import array
+from collections.abc import Mapping
 from enum import Enum
-from typing import List, Optional, TypedDict
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, TypedDict, Union
 
 
 class PartName(str, Enum):
@@ -40,3 +46,123 @@ DEFAULT_ORDER: List[str] = [
     "retrieval",
 ]
 
+
+
+PART_KEYS = ("name", "content", "source", "start_line", "end_line")
+
+# every line break str.splitlines() honours, so line numbers agree with analyze_text;
+# the bytes form matches their UTF-8 encodings (continuation bytes never collide)
+_TEXT_BREAK = re.compile("\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+_BYTES_BREAK = re.compile(b"\r\n|[\n\r\x0b\x0c\x1c\x1d\x1e]|\xc2\x85|\xe2\x80[\xa8\xa9]")
+# breaks other than "\n"; literal searches for these are far cheaper than the
+# alternation above, which is only used when one of them actually occurs
+_TEXT_RARE = [re.compile(re.escape(c)) for c in "\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"]
+_BYTES_RARE = [re.compile(re.escape(c.encode("utf-8"))) for c in "\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"]
+_TEXT_NL = re.compile("\n")
+_BYTES_NL = re.compile(b"\n")
+
+
+class SourceBuffer:
+    """Prompt text shared by the parts cut from it, plus a line index.
+
+    ``data`` is a ``str`` or any bytes-like object holding UTF-8 (``bytes``,
+    ``memoryview``, ``mmap``). Lines are located by offset, so neither the
+    line list nor per-part copies of the text are ever built.
+    """
+
+    __slots__ = ("data", "starts", "ends")
+
+    def __init__(self, data: Union[str, bytes, memoryview, "mmap.mmap"]) -> None:
+        self.data = data
+        self.starts = array("q", [0])
+        self.ends = array("q")
+        text = isinstance(data, str)
+        if any(rare.search(data) for rare in (_TEXT_RARE if text else _BYTES_RARE)):
+            pattern = _TEXT_BREAK if text else _BYTES_BREAK
+        else:
+            pattern = _TEXT_NL if text else _BYTES_NL
+        for m in pattern.finditer(data):
+            self.ends.append(m.start())
+            self.starts.append(m.end())
+        self.ends.append(len(data))
+        if self.starts[-1] == len(data):
+            # like splitlines(): no empty line after a final break (or for empty input)
+            self.starts.pop()
+            self.ends.pop()
+
+    @classmethod
+    def open(cls, path: Path) -> "SourceBuffer":
+        """Memory-map ``path`` read-only; pages are loaded only as lines are read."""
+        with path.open("rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return cls(b"")
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _slice(self, start: int, end: int) -> str:
+        if isinstance(self.data, str):
+            return self.data[start:end]
+        try:
+            return bytes(self.data[start:end]).decode("utf-8")
+        except UnicodeDecodeError as e:
+            # positions are relative to the slice; name the offset in the whole buffer
+            raise UnicodeDecodeError(e.encoding, e.object, e.start, e.end, f"{e.reason} at byte {start + e.start}") from None
+
+    def lines(self) -> Iterator[str]:
+        for start, end in zip(self.starts, self.ends):
+            yield self._slice(start, end)
+
+    def text(self, start_line: int, end_line: int) -> str:
+        """``"\\n".join(lines[start_line:end_line]).strip()`` without splitting."""
+        if start_line >= end_line:
+            return ""
+        raw = self._slice(self.starts[start_line], self.ends[end_line - 1])
+        return _TEXT_BREAK.sub("\n", raw).strip()
+
+
+class PartRef(Mapping):
+    """A part as line offsets into a ``SourceBuffer``; content is cut on access.
+
+    Reads like the ``Part`` dict (``p["content"]``, ``p.get(...)``, ``dict(p)``)
+    so ``optimize_parts``, ``render_markdown`` and ``parts_to_mermaid`` take
+    either. Use ``to_dict()`` (or ``json.dumps(..., default=PartRef.to_dict)``)
+    to serialize.
+    """
+
+    __slots__ = ("buffer", "name", "source", "start_line", "end_line")
+
+    def __init__(self, buffer: SourceBuffer, name: str, source: str, start_line: int, end_line: int) -> None:
+        self.buffer = buffer
+        self.name = name
+        self.source = source
+        self.start_line = start_line
+        self.end_line = end_line
+
+    @property
+    def content(self) -> str:
+        return self.buffer.text(self.start_line, self.end_line)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in PART_KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(PART_KEYS)
+
+    def __len__(self) -> int:
+        return len(PART_KEYS)
+
+    def __repr__(self) -> str:
+        return f"PartRef({self.name!r}, {self.source!r}, lines {self.start_line}-{self.end_line})"
+
+    def to_dict(self) -> Part:
+        return {
+            "name": self.name,
+            "content": self.content,
+            "source": self.source,
+            "start_line": self.start_line,
+            "end_line": self.end_line,
+        }
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from .parts import Part
+from .tokens import TokenCounter, token_counter
+
+# parts at or above this reuse probability are reported as stable
+DEFAULT_STABLE_THRESHOLD = 0.9
+
+
+def part_stability(prompts: Iterable[Sequence[Part]], counter: Optional[TokenCounter] = None) -> Dict[str, Dict[str, Any]]:
+    """How often each part name carries the same content across prompts.
+
+    ``reuse`` is the probability that two prompts drawn from the corpus agree
+    on the part (same content, or both without it), i.e. the chance a cached
+    prefix stays valid past it. ``tokens`` is the mean size where present.
+    """
+    counter = counter or token_counter()
+    contents: Dict[str, Counter[str]] = defaultdict(Counter)
+    tokens: Dict[str, List[int]] = defaultdict(list)
+    n = 0
+    for parts in prompts:
+        n += 1
+        seen: Dict[str, List[str]] = defaultdict(list)
+        for p in parts:
+            seen[p.get("name", "other")].append(p.get("content", ""))
+        for name, texts in seen.items():
+            text = "\n".join(texts)
+            contents[name][hashlib.sha256(text.encode("utf-8")).hexdigest()] += 1
+            tokens[name].append(counter.count(text))
+    stats: Dict[str, Dict[str, Any]] = {}
+    for name, counts in contents.items():
+        absent = n - sum(counts.values())
+        reuse = (sum(c * c for c in counts.values()) + absent * absent) / (n * n)
+        stats[name] = {
+            "prompts": n - absent,
+            "distinct": len(counts),
+            "reuse": round(reuse, 4),
+            "tokens": round(sum(tokens[name]) / len(tokens[name])),
+        }
+    return stats
+
+
+def load_prompts(path: Path, cfg: Optional[Dict[str, Any]] = None) -> List[List[Part]]:
+    """Parts per prompt from an ``analyze-corpus`` JSONL or binary file, a
+    request history JSONL (``{"system": ...}`` records), or an ``analyze`` JSON."""
+    return [parts for _, parts in load_labeled_prompts(path, cfg)]
+
+
+def load_labeled_prompts(path: Path, cfg: Optional[Dict[str, Any]] = None) -> List[tuple[str, List[Part]]]:
+    """``load_prompts`` with each prompt's source file (or ``<path>:<line>``)."""
+    from .analyzer import analyze_text, compile_detectors
+    from .binparts import PartsFile, is_parts_bin
+
+    if is_parts_bin(path):
+        with PartsFile(path) as pf:
+            return [(result["system_file"], [p.to_dict() for p in result["parts"]]) for result in pf.results()]
+    text = path.read_text(encoding="utf-8")
+    try:
+        records = [(1, json.loads(text))]
+    except ValueError:
+        records = [(n, json.loads(line)) for n, line in enumerate(text.splitlines(), 1) if line.strip()]
+    detectors = compile_detectors(cfg)
+    prompts = []
+    for n, rec in records:
+        label = str(rec.get("system_file") or f"{path.name}:{n}")
+        if "parts" in rec:
+            prompts.append((label, rec["parts"]))
+        elif isinstance(rec.get("system"), str):
+            prompts.append((label, analyze_text(rec["system"], cfg or {}, detectors)))
+    return prompts
+
+
+def prefix_order(
+    parts: List[Part],
+    stability: Dict[str, Dict[str, Any]],
+    priority: Dict[str, int],
+    constraints: Sequence[Sequence[str]] = (),
+) -> List[Part]:
+    """Order parts to maximize the expected reusable prefix.
+
+    The expected prefix is sum(t_k * prod(p_j for j <= k)); an exchange
+    argument shows it is maximized by sorting on p*t/(1-p) descending, so
+    fully stable parts lead. ``constraints`` are ``[before, after]`` name
+    pairs that always hold; among parts free to go next the best key wins,
+    then ``optimize.order`` priority, then source line.
+    """
+    def key(i: int) -> tuple[float, int, int]:
+        p = parts[i]
+        name = p.get("name", "other")
+        st = stability.get(name, {})
+        reuse, tokens = st.get("reuse", 0.0), st.get("tokens", 1)
+        score = float("inf") if reuse >= 1.0 else reuse * tokens / (1.0 - reuse)
+        return (-score, priority.get(name, 999), p.get("start_line", 10**9))
+
+    by_name: Dict[str, List[int]] = defaultdict(list)
+    for i, p in enumerate(parts):
+        by_name[p.get("name", "other")].append(i)
+    after: Dict[int, List[int]] = defaultdict(list)
+    blockers = [0] * len(parts)
+    for before_name, after_name in constraints:
+        for a in by_name.get(before_name, ()):
+            for b in by_name.get(after_name, ()):
+                after[a].append(b)
+                blockers[b] += 1
+
+    ready = [(key(i), i) for i in range(len(parts)) if not blockers[i]]
+    heapq.heapify(ready)
+    ordered: List[Part] = []
+    while ready:
+        _, i = heapq.heappop(ready)
+        ordered.append(parts[i])
+        for j in after[i]:
+            blockers[j] -= 1
+            if not blockers[j]:
+                heapq.heappush(ready, (key(j), j))
+    if len(ordered) != len(parts):
+        raise ValueError("optimize.prefix.constraints form a cycle")
+    return ordered
+
+
+def expected_prefix_tokens(names: Sequence[str], stability: Dict[str, Dict[str, Any]]) -> float:
+    total, survive = 0.0, 1.0
+    for name in names:
+        st = stability.get(name, {})
+        survive *= st.get("reuse", 0.0)
+        total += survive * st.get("tokens", 0)
+    return total
+
+
+def prefix_fingerprint(sections: Sequence[str], stable: Sequence[bool]) -> Dict[str, Any]:
+    """Hash of the rendered stable prefix plus a cumulative hash per section.
+
+    Two prompts with the same ``fingerprint`` share the stable prefix; the
+    ``chain`` shows how far they agree beyond it.
+    """
+    h = hashlib.sha256()
+    chain: List[str] = []
+    prefix_sections = 0
+    for text, is_stable in zip(sections, stable):
+        h.update(text.encode("utf-8"))
+        chain.append(h.hexdigest()[:16])
+        if is_stable and prefix_sections == len(chain) - 1:
+            prefix_sections += 1
+    fingerprint = chain[prefix_sections - 1] if prefix_sections else hashlib.sha256(b"").hexdigest()[:16]
+    return {"fingerprint": fingerprint, "stable_sections": prefix_sections, "chain": chain}
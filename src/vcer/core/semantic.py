@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+from .analyzer import (
+    CLASSIFICATION_SCHEMA,
+    DEFAULT_DETECTORS,
+    GEMINI_MODEL,
+    PROMPT_TEMPLATE,
+    Detectors,
+    analyze_with_gemini,
+)
+from .cache import ResultCache, cache_key, content_hash
+from .tokens import approx_tokens as estimate_tokens
+
+
+MISC_CATEGORY = "기타 (Miscellaneous)"
+DEFAULT_CHUNK_TOKENS = 2000
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 2
+
+# generic Markdown headings also count as boundaries, payloads rarely follow our detectors
+_HEADING = re.compile(r"^#{1,6}\s")
+_CUT_MODULUS = 4
+_PARAGRAPH = re.compile(r".*?(?:\n[ \t]*\n|\Z)", re.DOTALL)
+
+Classifier = Callable[[str], List[Dict[str, Any]]]
+# (chunk index, chunk count, items) as each chunk finishes, in completion order
+ChunkCallback = Callable[[int, int, List[Dict[str, Any]]], None]
+
+# bumps whenever the schema or prompt wording changes, invalidating cached labels
+SCHEMA_VERSION = content_hash(CLASSIFICATION_SCHEMA + PROMPT_TEMPLATE)[:12]
+DEFAULT_MEMORY_ENTRIES = 1024
+
+
+def split_payload(
+    payload: str,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    detectors: Optional[Detectors] = None,
+) -> List[str]:
+    """Split a payload into chunks of at most ``max_tokens`` along structure.
+
+    Segments start at detector headers, tag openings and Markdown headings,
+    and are packed greedily in order. A segment that alone exceeds the budget
+    is split on blank lines, then on lines.
+    """
+    det = detectors or DEFAULT_DETECTORS
+    segments: List[str] = []
+    current: List[str] = []
+    for line in payload.splitlines(keepends=True):
+        if current and (_HEADING.match(line) or det.match_header(line.rstrip("\r\n")) or det.tag_open.search(line)):
+            segments.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        segments.append("".join(current))
+
+    chunks: List[str] = []
+    buf: List[str] = []
+    used = 0
+    for seg in segments:
+        for piece in _fit(seg, max_tokens):
+            n = estimate_tokens(piece)
+            if buf and used + n > max_tokens:
+                chunks.append("".join(buf))
+                buf, used = [], 0
+            buf.append(piece)
+            used += n
+            # content-defined cut points: chunk boundaries depend on nearby text
+            # only, so an edit re-chunks (and re-classifies) just its surroundings
+            if used * 2 >= max_tokens and zlib.crc32(piece.encode("utf-8")) % _CUT_MODULUS == 0:
+                chunks.append("".join(buf))
+                buf, used = [], 0
+    if buf:
+        chunks.append("".join(buf))
+    return [c for c in chunks if c.strip()]
+
+
+def _fit(segment: str, max_tokens: int) -> List[str]:
+    if estimate_tokens(segment) <= max_tokens:
+        return [segment]
+    for pieces in (_PARAGRAPH.findall(segment), segment.splitlines(keepends=True)):
+        pieces = [p for p in pieces if p]
+        if len(pieces) > 1:
+            return [p for piece in pieces for p in _fit(piece, max_tokens)]
+    # a single line over budget: cut proportionally to its token density
+    width = max(1, len(segment) * max_tokens // estimate_tokens(segment))
+    return [segment[i:i + width] for i in range(0, len(segment), width)]
+
+
+class AnalysisCancelled(Exception):
+    """Raised by ``classify_chunks`` once its ``cancel`` event is set."""
+
+
+def classify_chunks(
+    chunks: List[str],
+    classify: Classifier,
+    workers: int = DEFAULT_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+    *,
+    on_chunk: Optional[ChunkCallback] = None,
+    cancel: Optional[threading.Event] = None,
+    executor: Optional[Executor] = None,
+    cache: Optional["ClassificationCache"] = None,
+    model: str = GEMINI_MODEL,
+) -> List[Dict[str, Any]]:
+    """Classify chunks concurrently and merge the results in chunk order.
+
+    A failing chunk is retried on its own with backoff; if it still fails, its
+    text is kept under ``MISC_CATEGORY`` with an ``error`` key so the rest of
+    the payload is not lost. With ``cache``, each chunk is looked up once for
+    ``model`` before any attempt, and successful results are stored.
+
+    ``on_chunk`` sees each chunk's items as soon as they arrive. Setting
+    ``cancel`` stops chunks that have not started (requests already sent
+    run to completion, their results dropped) and raises
+    ``AnalysisCancelled``. With a shared ``executor`` its size bounds the
+    concurrency instead of ``workers``.
+    """
+
+    def run(chunk: str) -> List[Dict[str, Any]]:
+        if cache is not None:
+            items = cache.get(chunk, model)
+            if items is not None:
+                return items
+        for attempt in range(retries + 1):
+            if cancel is not None and cancel.is_set():
+                raise AnalysisCancelled()
+            try:
+                items = classify(chunk)
+                if not isinstance(items, list):
+                    raise ValueError("classifier did not return a JSON array")
+                if cache is not None:
+                    cache.put(chunk, model, items)
+                return items
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if attempt < retries:
+                    delay = 0.5 * 2 ** attempt
+                    if cancel is None:
+                        time.sleep(delay)
+                    elif cancel.wait(delay):
+                        raise AnalysisCancelled()
+        return [{"category": MISC_CATEGORY, "content": chunk, "error": error}]
+
+    if not chunks:
+        return []
+    pool = executor or ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks))))
+    futures: Dict[Future, int] = {}
+    try:
+        futures = {pool.submit(run, chunk): i for i, chunk in enumerate(chunks)}
+        results: List[List[Dict[str, Any]]] = [[] for _ in chunks]
+        for fut in as_completed(futures):
+            i = futures[fut]
+            results[i] = fut.result()
+            if on_chunk is not None:
+                on_chunk(i, len(chunks), results[i])
+    except BaseException:
+        for fut in futures:
+            fut.cancel()
+        raise
+    finally:
+        if executor is None:
+            pool.shutdown(wait=True)
+    if cancel is not None and cancel.is_set():
+        raise AnalysisCancelled()
+    return [item for items in results for item in items]
+
+
+class ClassificationCache:
+    """Per-chunk classification results: in-memory LRU in front of ``ResultCache``.
+
+    Keys combine the chunk hash, the model name and ``SCHEMA_VERSION``. Only
+    successful classifications are stored.
+    """
+
+    def __init__(self, disk: Optional[ResultCache] = None, max_entries: int = DEFAULT_MEMORY_ENTRIES) -> None:
+        self.disk = disk
+        self.max_entries = max_entries
+        self._mem: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(chunk: str, model: str) -> str:
+        return cache_key("classify", chunk, {"model": model, "schema": SCHEMA_VERSION})
+
+    def get(self, chunk: str, model: str) -> Optional[List[Dict[str, Any]]]:
+        key = self.key(chunk, model)
+        with self._lock:
+            items = self._mem.get(key)
+            if items is not None:
+                self._mem.move_to_end(key)
+                self.memory_hits += 1
+                return items
+            raw = self.disk.get(key) if self.disk is not None else None
+            if raw is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            items = json.loads(raw)
+            self._remember(key, items)
+            return items
+
+    def put(self, chunk: str, model: str, items: List[Dict[str, Any]]) -> None:
+        key = self.key(chunk, model)
+        with self._lock:
+            self._remember(key, items)
+            if self.disk is not None:
+                self.disk.put(key, json.dumps(items, ensure_ascii=False))
+
+    def _remember(self, key: str, items: List[Dict[str, Any]]) -> None:
+        self._mem[key] = items
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "memory_entries": len(self._mem),
+        }
+
+
+def analyze_payload_semantically(
+    payload: str,
+    classify: Optional[Classifier] = None,
+    *,
+    max_chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    workers: int = DEFAULT_WORKERS,
+    retries: int = DEFAULT_RETRIES,
+    detectors: Optional[Detectors] = None,
+    cache: Optional[ClassificationCache] = None,
+    model: str = GEMINI_MODEL,
+    on_chunk: Optional[ChunkCallback] = None,
+    cancel: Optional[threading.Event] = None,
+    executor: Optional[Executor] = None,
+) -> List[Dict[str, Any]]:
+    """Chunked map-reduce classification into ``[{category, content}]``.
+
+    ``classify`` defaults to Gemini; pass e.g. a partial of
+    ``analyze_with_custom_llm`` for an OpenAI-compatible endpoint, with
+    ``model`` naming it for the cache. With ``cache`` only chunks not seen
+    before for that model reach the classifier. ``on_chunk``, ``cancel``
+    and ``executor`` are passed to ``classify_chunks``.
+    """
+    chunks = split_payload(payload, max_chunk_tokens, detectors)
+    return classify_chunks(
+        chunks, classify or analyze_with_gemini, workers=workers, retries=retries,
+        on_chunk=on_chunk, cancel=cancel, executor=executor, cache=cache, model=model,
+    )
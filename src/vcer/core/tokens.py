@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+Tokenizer = Callable[[str], int]
+
+APPROX_TOKENIZER = "approx"
+DEFAULT_COUNT_ENTRIES = 4096
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate without a vocabulary.
+
+    ASCII runs average ~4 characters per token with BPE tokenizers, while
+    Hangul/CJK characters are closer to one token each. Both counts come from
+    C-level ``len``/``encode`` calls, so this stays linear and loop-free.
+    """
+    n = len(text)
+    if not n:
+        return 0
+    # every non-ASCII code point adds 1-3 UTF-8 bytes; most prompt text beyond
+    # ASCII is Hangul/CJK (3 bytes), so count two extra bytes per character
+    non_ascii = min(n, (len(text.encode("utf-8", "surrogatepass")) - n + 1) // 2)
+    return (n - non_ascii + 3) // 4 + non_ascii
+
+
+def _tiktoken(encoding: str) -> Tokenizer:
+    import tiktoken
+
+    try:
+        enc = tiktoken.get_encoding(encoding)
+    except ValueError:
+        enc = tiktoken.encoding_for_model(encoding)
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
+
+def _huggingface(name: str) -> Tokenizer:
+    from transformers import AutoTokenizer
+
+    tok = AutoTokenizer.from_pretrained(name)
+    return lambda text: len(tok.encode(text, add_special_tokens=False))
+
+
+_LOADERS: Dict[str, Callable[[str], Tokenizer]] = {"tiktoken": _tiktoken, "hf": _huggingface}
+
+
+def load_tokenizer(spec: Optional[str]) -> tuple[str, Tokenizer]:
+    """Resolve ``limits.tokenizer`` to ``(name, count_fn)``.
+
+    ``approx`` (default), ``tiktoken:<encoding-or-model>`` or ``hf:<model>``.
+    Missing optional packages fall back to ``approx`` with a warning, so
+    budgets still apply without tiktoken/transformers installed.
+    """
+    if not spec or spec == APPROX_TOKENIZER:
+        return APPROX_TOKENIZER, approx_tokens
+    kind, _, arg = spec.partition(":")
+    loader = _LOADERS.get(kind)
+    if loader is None or not arg:
+        raise ValueError(f"Unknown tokenizer '{spec}' (expected approx, tiktoken:<encoding> or hf:<model>)")
+    try:
+        return spec, loader(arg)
+    except ImportError as e:
+        print(f"warning: tokenizer '{spec}' unavailable ({e}); using the approximation", file=sys.stderr)
+        return APPROX_TOKENIZER, approx_tokens
+
+
+class TokenCounter:
+    """Memoized token counts keyed by content digest.
+
+    Real tokenizers cost far more than hashing, and the same parts are counted
+    again on every trim step and every optimize call in a long-running process.
+    """
+
+    def __init__(self, tokenizer: Optional[Tokenizer] = None, name: str = APPROX_TOKENIZER, max_entries: int = DEFAULT_COUNT_ENTRIES) -> None:
+        self.tokenizer = tokenizer or approx_tokens
+        self.name = name
+        self.max_entries = max_entries
+        self._counts: OrderedDict[bytes, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is approx_tokens:
+            return approx_tokens(text)
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            n = self._counts.get(key)
+            if n is not None:
+                self._counts.move_to_end(key)
+                return n
+        n = self.tokenizer(text)
+        with self._lock:
+            self._counts[key] = n
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return n
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        return [self.count(t) for t in texts]
+
+
+_COUNTERS: Dict[str, TokenCounter] = {}
+
+
+def token_counter(cfg: Optional[Dict[str, Any]] = None) -> TokenCounter:
+    """Shared counter for the tokenizer named in ``limits.tokenizer``."""
+    spec = ((cfg or {}).get("limits") or {}).get("tokenizer") or APPROX_TOKENIZER
+    counter = _COUNTERS.get(spec)
+    if counter is None:
+        name, fn = load_tokenizer(spec)
+        counter = _COUNTERS[spec] = TokenCounter(fn, name)
+    return counter
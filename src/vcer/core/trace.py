@@ -0,0 +1,262 @@
+"""Spans and counters for the analyze → optimize → render → route pipeline.
+
+Instrumented code calls ``span(name)`` and ``count(name, n)``; both are
+no-ops unless a ``Tracer`` is active in the current context (``vcer
+--profile``/``--timings``, or the service, which feeds ``Metrics`` for
+``GET /metrics``). Context variables carry the tracer into asyncio tasks.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Prometheus histogram buckets for stage durations, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar("vcer_tracer", default=None)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, **args: Any) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.add_span(self.name, self.start, time.perf_counter() - self.start, self.args)
+
+    def set(self, **args: Any) -> None:
+        """Attach arguments known only once the work is done (sizes, counts)."""
+        self.args.update(args)
+
+
+class Metrics:
+    """Process-wide aggregates in Prometheus text format: a duration
+    histogram per stage and a total per counter."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stages: Dict[str, List[float]] = {}  # bucket counts + [sum, count]
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            row = self.stages.get(stage)
+            if row is None:
+                row = self.stages[stage] = [0.0] * (len(BUCKETS) + 2)
+            for i, le in enumerate(BUCKETS):
+                if seconds <= le:
+                    row[i] += 1
+            row[-2] += seconds
+            row[-1] += 1
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def render(self) -> str:
+        out = [
+            "# HELP vcer_stage_seconds Time spent per pipeline stage.",
+            "# TYPE vcer_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, row in sorted(self.stages.items()):
+                label = f'stage="{_label(stage)}"'
+                for le, n in zip(BUCKETS, row):
+                    out.append(f'vcer_stage_seconds_bucket{{{label},le="{le}"}} {n:g}')
+                out.append(f'vcer_stage_seconds_bucket{{{label},le="+Inf"}} {row[-1]:g}')
+                out.append(f"vcer_stage_seconds_sum{{{label}}} {row[-2]:.6f}")
+                out.append(f"vcer_stage_seconds_count{{{label}}} {row[-1]:g}")
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = "vcer_" + name.replace(".", "_").replace("-", "_") + "_total"
+                if metric not in seen:
+                    seen.add(metric)
+                    out.append(f"# TYPE {metric} counter")
+                rendered = ",".join(f'{k}="{_label(v)}"' for k, v in labels)
+                out.append(f"{metric}{{{rendered}}} {value:g}" if rendered else f"{metric} {value:g}")
+        return "\n".join(out) + "\n"
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Tracer:
+    """Collects spans and counters for one run.
+
+    ``keep_events=False`` (the service) keeps only the aggregates and
+    forwards everything to ``metrics``, so memory stays flat however long
+    it runs.
+    """
+
+    def __init__(self, keep_events: bool = True, metrics: Optional[Metrics] = None) -> None:
+        self.keep_events = keep_events
+        self.metrics = metrics
+        self.origin = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+        self.stages: Dict[str, List[float]] = {}  # name -> [count, total, max]
+        self._tids: Dict[int, int] = {}
+
+    def span(self, name: str, **args: Any) -> Span:
+        return Span(self, name, args)
+
+    def add_span(self, name: str, start: float, duration: float, args: Optional[Dict[str, Any]] = None) -> None:
+        """Record a span from ``time.perf_counter`` timestamps taken elsewhere."""
+        row = self.stages.get(name)
+        if row is None:
+            row = self.stages[name] = [0, 0.0, 0.0]
+        row[0] += 1
+        row[1] += duration
+        row[2] = max(row[2], duration)
+        if self.metrics is not None:
+            self.metrics.observe(name, duration)
+        if self.keep_events:
+            event = {
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": 1,
+                "tid": self._tid(),
+            }
+            if args:
+                event["args"] = args
+            self.events.append(event)
+
+    def count(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+        if self.metrics is not None:
+            self.metrics.inc(name, value)
+
+    def _tid(self) -> int:
+        # one track per asyncio task, so concurrent requests do not interleave
+        key = threading.get_ident()
+        if "asyncio" in sys.modules:
+            import asyncio
+
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                task = None
+            if task is not None:
+                key = id(task)
+        tid = self._tids.get(key)
+        if tid is None:
+            tid = self._tids[key] = len(self._tids) + 1
+        return tid
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Trace-event JSON for chrome://tracing and Perfetto."""
+        end = round((time.perf_counter() - self.origin) * 1e6, 1)
+        counters = [
+            {"name": name, "ph": "C", "ts": end, "pid": 1, "args": {"value": value}}
+            for name, value in sorted(self.counters.items())
+        ]
+        return {"traceEvents": self.events + counters, "displayTimeUnit": "ms", "otherData": {"counters": self.counters}}
+
+    def write_chrome_trace(self, path: Path) -> None:
+        path.write_text(json.dumps(self.chrome_trace()), encoding="utf-8")
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-stage count, total, mean and max in ms, in order of first use."""
+        return [
+            {
+                "stage": name,
+                "count": int(n),
+                "total_ms": round(total * 1000, 3),
+                "mean_ms": round(total / n * 1000, 3),
+                "max_ms": round(peak * 1000, 3),
+            }
+            for name, (n, total, peak) in self.stages.items()
+        ]
+
+
+def current() -> Optional[Tracer]:
+    return _current.get()
+
+
+def activate(tracer: Optional[Tracer]) -> contextvars.Token:
+    return _current.set(tracer)
+
+
+def deactivate(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def span(name: str, **args: Any) -> Any:
+    """``with span("optimize.fit"):`` times the block when tracing is on."""
+    tracer = _current.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return Span(tracer, name, args)
+
+
+def count(name: str, value: float = 1) -> None:
+    tracer = _current.get()
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+class HTTPPhases:
+    """httpx ``trace`` extension callback that turns httpcore events into
+    ``http.connect`` (TCP + TLS, new connections only) and ``http.ttfb``
+    (request sent → response headers) spans."""
+
+    __slots__ = ("tracer", "args", "_started")
+
+    def __init__(self, tracer: Tracer, **args: Any) -> None:
+        self.tracer = tracer
+        self.args = args
+        self._started: Dict[str, float] = {}
+
+    async def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        step, _, phase = event.rpartition(".")
+        step = step.split(".", 1)[-1]  # drop the connection/http11/http2 prefix
+        if phase == "started":
+            if step in ("connect_tcp", "start_tls", "send_request_headers"):
+                self._started.setdefault(step, now)
+            return
+        if phase != "complete":
+            return
+        if step in ("connect_tcp", "start_tls"):
+            start = self._started.pop(step, now)
+            self.tracer.add_span("http.connect", start, now - start, {**self.args, "step": step})
+        elif step == "receive_response_headers":
+            start = self._started.pop("send_request_headers", now)
+            self.tracer.add_span("http.ttfb", start, now - start, dict(self.args))
@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+
+from ..adapters.client import AUTO_BACKEND, AsyncRouter
+from ..adapters.responses import ResponseCache
+from ..adapters.router import check_messages
+from ..adapters.streaming import StreamStats
+from ..config.compiled import SnapshotHolder
+from ..core import trace
+from ..core.analyzer import analyze_text
+from ..core.cache import ResultCache, cache_key, open_cache
+from ..core.optimizer import optimize_parts, render_markdown
+from .httpd import HTTPError, Request, Response, StreamResponse, json_response, serve
+
+
+class ServiceState:
+    """Everything a cold CLI process would rebuild per call, built once.
+
+    Edits to ``.vcer.yml`` are picked up in place by ``refresh()``; the
+    result cache is opened once and keeps its location for the process.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.config = SnapshotHolder(root)
+        snap = self.config.snapshot
+        self.cfg = snap.to_dict()
+        self.detectors = snap.detectors
+        self.cache: Optional[ResultCache] = None
+        if (self.cfg.get("cache") or {}).get("enabled", True) is not False:
+            self.cache = open_cache(self.cfg, root)
+        self.responses = ResponseCache.from_config(self.cfg, disk=self.cache)
+        self.router = self._new_router()
+        self.metrics = trace.Metrics()
+        self._retired: list[asyncio.Task[None]] = []
+
+    def refresh(self) -> None:
+        old = self.config.snapshot
+        snap = self.config.current()
+        if snap is old:
+            return
+        self.cfg = snap.to_dict()
+        self.detectors = snap.detectors
+        if snap.data.get("backends") != old.data.get("backends") or snap.data.get("router") != old.data.get("router"):
+            retired, self.router = self.router, self._new_router()
+            self._retired.append(asyncio.ensure_future(_close_later(retired)))
+
+    def _new_router(self) -> AsyncRouter:
+        router = AsyncRouter(self.cfg, responses=self.responses)
+        try:
+            # probe now so /backends reports real health before the first routed request
+            router.start_health_checks()
+        except ValueError:
+            pass  # no pool configured; routing to a named backend still works
+        return router
+
+    def cached(self, key: str) -> Optional[str]:
+        return self.cache.get(key) if self.cache is not None else None
+
+    def store(self, key: str, value: str) -> None:
+        if self.cache is not None:
+            self.cache.put(key, value)
+
+    async def aclose(self) -> None:
+        for task in self._retired:
+            task.cancel()
+        await self.router.aclose()
+        if self.cache is not None:
+            self.cache.close()
+
+
+async def _close_later(router: AsyncRouter, grace: float = 120.0) -> None:
+    # requests that picked the old router keep using its clients until they finish
+    try:
+        await asyncio.sleep(grace)
+    finally:
+        await router.aclose()
+
+
+Endpoint = Callable[[Request], Awaitable[Union[Response, StreamResponse]]]
+
+
+class VcerService:
+    """HTTP endpoints: ``/analyze``, ``/optimize``, ``/route`` (+ ``/health``, ``/backends``, ``/metrics``)."""
+
+    def __init__(self, state: ServiceState) -> None:
+        self.state = state
+        self.routes: Dict[tuple[str, str], Endpoint] = {
+            ("GET", "/health"): self.health,
+            ("GET", "/backends"): self.backends,
+            ("GET", "/cache/responses"): self.responses,
+            ("GET", "/metrics"): self.metrics,
+            ("POST", "/analyze"): self.analyze,
+            ("POST", "/optimize"): self.optimize,
+            ("POST", "/route"): self.route,
+        }
+
+    async def __call__(self, req: Request) -> Union[Response, StreamResponse]:
+        self.state.refresh()
+        endpoint = self.routes.get((req.method, req.path))
+        if endpoint is None:
+            if any(path == req.path for _, path in self.routes):
+                self.state.metrics.inc("server.requests", path=req.path, status="405")
+                raise HTTPError(405, f"Method {req.method} not allowed on {req.path}")
+            # unknown paths share one label so probes cannot grow the series count
+            self.state.metrics.inc("server.requests", path="other", status="404")
+            raise HTTPError(404, f"No endpoint {req.path}")
+        status = "500"
+        try:
+            with trace.span(f"server.{req.path.strip('/').replace('/', '.')}"):
+                resp = await endpoint(req)
+            status = str(resp.status)
+            return resp
+        except HTTPError as e:
+            status = str(e.status)
+            raise
+        finally:
+            self.state.metrics.inc("server.requests", path=req.path, status=status)
+
+    async def health(self, req: Request) -> Response:
+        return json_response({"status": "ok"})
+
+    async def backends(self, req: Request) -> Response:
+        return json_response(self.state.router.pool.snapshot())
+
+    async def responses(self, req: Request) -> Response:
+        return json_response(self.state.responses.stats())
+
+    async def metrics(self, req: Request) -> Response:
+        """Prometheus text format: ``vcer_stage_seconds`` per stage, plus counters."""
+        return Response(self.state.metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    async def analyze(self, req: Request) -> Response:
+        """``{"text": "..."}`` → ``{"parts": [...]}``."""
+        body = _object(req)
+        text = _field(body, "text", str)
+        st = self.state
+        key = cache_key("analyze", text, (st.cfg.get("analyze") or {}).get("detectors"))
+        parts_json = st.cached(key)
+        if parts_json is None:
+            # extraction is CPU-bound; keep the event loop free for other requests
+            parts = await asyncio.to_thread(analyze_text, text, st.cfg, st.detectors)
+            parts_json = json.dumps(parts, ensure_ascii=False)
+            st.store(key, parts_json)
+        return Response('{"parts": ' + parts_json + "}", content_type="application/json")
+
+    async def optimize(self, req: Request) -> Response:
+        """``{"parts": [...]}`` or ``{"text": "..."}`` (+ ``"budget"``, ``"stability"``, ``"dedup"``) → ``{"parts", "markdown", "tokens"}``.
+
+        ``tokens`` is the per-part report from the token budget pass; with
+        ``stability`` (per-part stats from ``prefix.part_stability``) parts are
+        ordered for prefix reuse and ``tokens.prefix`` holds the fingerprint.
+        ``dedup`` overrides ``optimize.dedup.enabled``; ``tokens.dedup`` lists
+        the duplicate clusters that were collapsed.
+        """
+        body = _object(req)
+        st = self.state
+        if "parts" in body:
+            data = {"parts": _field(body, "parts", list)}
+        else:
+            text = _field(body, "text", str)
+            data = {"parts": await asyncio.to_thread(analyze_text, text, st.cfg, st.detectors)}
+        budget = body.get("budget")
+        if budget is not None and not isinstance(budget, int):
+            raise HTTPError(400, "'budget' must be an int")
+        stability = body.get("stability")
+        if stability is not None and not isinstance(stability, dict):
+            raise HTTPError(400, "'stability' must be an object")
+        dedup = body.get("dedup")
+        if dedup is not None and not isinstance(dedup, bool):
+            raise HTTPError(400, "'dedup' must be a boolean")
+        report: Dict[str, Any] = {}
+        try:
+            # dedup and prefix ordering are CPU-bound like extraction; keep the loop free
+            opt = await asyncio.to_thread(
+                optimize_parts, data, st.cfg, budget=budget, report=report, stability=stability, dedup=dedup,
+            )
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from e
+        return json_response({"parts": opt, "markdown": render_markdown(opt), "tokens": report})
+
+    async def route(self, req: Request) -> Union[Response, StreamResponse]:
+        """``{"system", "user", "messages"?, "affinity"?, "backend"?, "max_tokens"?, "model"?, "stream"?, "cache"?}``.
+
+        ``messages`` is the conversation before ``user`` (``[{role, content}]``);
+        ``affinity`` overrides the key the ``prefix`` strategy routes on.
+        With ``stream: true`` the reply is NDJSON: ``{"delta": ...}`` lines as
+        tokens arrive, then ``{"done": true, "backend": ..., "attempts": ..., "stats": {...}}``.
+        ``backend: "auto"`` fails over as in the non-streamed case, as long as
+        no delta has been sent yet.
+        """
+        body = _object(req)
+        system = _field(body, "system", str)
+        user = _field(body, "user", str)
+        messages = body.get("messages")
+        if messages is not None:
+            try:
+                messages = check_messages(messages)
+            except ValueError as e:
+                raise HTTPError(400, str(e)) from e
+        affinity = body.get("affinity")
+        if affinity is not None and not isinstance(affinity, str):
+            raise HTTPError(400, "'affinity' must be a str")
+        backend = body.get("backend", AUTO_BACKEND)
+        max_tokens = body.get("max_tokens", 1024)
+        if not isinstance(max_tokens, int) or isinstance(max_tokens, bool) or max_tokens <= 0:
+            raise HTTPError(400, "'max_tokens' must be a positive int")
+        model = body.get("model")
+        cache = body.get("cache")
+        router = self.state.router
+        meta: Dict[str, Any] = {}
+        if body.get("stream"):
+            stats = StreamStats()
+            deltas = router.route_stream(
+                system, user, backend, max_tokens=max_tokens, model=model, messages=messages, affinity=affinity,
+                stats=stats, meta=meta,
+            )
+            return StreamResponse(_stream_lines(deltas, stats, meta))
+        try:
+            resp = await router.route(
+                system, user, backend, max_tokens=max_tokens, model=model, meta=meta, cache=cache,
+                messages=messages, affinity=affinity,
+            )
+        except Exception as e:
+            return json_response({"error": f"{type(e).__name__}: {e}", **meta}, 502)
+        return json_response({**meta, "response": resp})
+
+
+async def _stream_lines(deltas: AsyncIterator[str], stats: StreamStats, meta: Dict[str, Any]) -> AsyncIterator[bytes]:
+    try:
+        async for delta in deltas:
+            yield _ndjson({"delta": delta})
+    except Exception as e:
+        yield _ndjson({"error": f"{type(e).__name__}: {e}", **meta})
+        return
+    yield _ndjson({"done": True, **meta, "stats": stats.summary()})
+
+
+def _ndjson(obj: Dict[str, Any]) -> bytes:
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _object(req: Request) -> Dict[str, Any]:
+    body = req.json()
+    if not isinstance(body, dict):
+        raise HTTPError(400, "Request body must be a JSON object")
+    return body
+
+
+def _field(body: Dict[str, Any], name: str, typ: type) -> Any:
+    value = body.get(name)
+    if not isinstance(value, typ):
+        raise HTTPError(400, f"'{name}' must be a {typ.__name__}")
+    return value
+
+
+async def run_server(root: Path, host: str = "127.0.0.1", port: int = 3999, on_ready: Optional[Callable[[str], None]] = None) -> None:
+    state = ServiceState(root)
+    # aggregates only; connection tasks inherit the tracer from this context
+    trace.activate(trace.Tracer(keep_events=False, metrics=state.metrics))
+    server = await serve(VcerService(state), host, port)
+    if on_ready is not None:
+        on_ready(f"http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await state.aclose()
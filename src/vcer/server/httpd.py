@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+from urllib.parse import parse_qsl, urlsplit
+
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 256 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> None:
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        if not self.body:
+            return {}
+        try:
+            return json.loads(self.body)
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}") from e
+
+
+class Response:
+    __slots__ = ("status", "body", "content_type")
+
+    def __init__(self, body: Union[bytes, str], status: int = 200, content_type: str = "text/plain; charset=utf-8") -> None:
+        self.status = status
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.content_type = content_type
+
+
+class StreamResponse:
+    """Body produced incrementally; sent with chunked transfer encoding."""
+
+    __slots__ = ("status", "chunks", "content_type")
+
+    def __init__(self, chunks: AsyncIterator[bytes], status: int = 200, content_type: str = "application/x-ndjson") -> None:
+        self.status = status
+        self.chunks = chunks
+        self.content_type = content_type
+
+
+def json_response(data: Any, status: int = 200) -> Response:
+    return Response(json.dumps(data, ensure_ascii=False), status, "application/json")
+
+
+Handler = Callable[[Request], Awaitable[Union[Response, StreamResponse]]]
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None  # client closed the keep-alive connection
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if line:
+            k, _, v = line.partition(":")
+            headers[k.strip().lower()] = v.strip()
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+def _head(status: int, content_type: str, extra: str) -> bytes:
+    phrase = HTTPStatus(status).phrase if status in HTTPStatus._value2member_map_ else ""
+    return f"HTTP/1.1 {status} {phrase}\r\nContent-Type: {content_type}\r\n{extra}\r\n".encode("latin-1")
+
+
+async def _write(writer: asyncio.StreamWriter, resp: Union[Response, StreamResponse], keep_alive: bool) -> None:
+    conn = "keep-alive" if keep_alive else "close"
+    if isinstance(resp, StreamResponse):
+        writer.write(_head(resp.status, resp.content_type, f"Transfer-Encoding: chunked\r\nConnection: {conn}\r\n"))
+        async for chunk in resp.chunks:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+    else:
+        writer.write(_head(resp.status, resp.content_type, f"Content-Length: {len(resp.body)}\r\nConnection: {conn}\r\n"))
+        writer.write(resp.body)
+    await writer.drain()
+
+
+def _connection_handler(handler: Handler) -> Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]:
+    async def on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    req = await _read_request(reader)
+                    if req is None:
+                        break
+                    keep_alive = req.headers.get("connection", "").lower() != "close"
+                    try:
+                        resp = await handler(req)
+                    except HTTPError:
+                        raise
+                    except Exception as e:
+                        resp = json_response({"error": f"{type(e).__name__}: {e}"}, 500)
+                except HTTPError as e:
+                    await _write(writer, json_response({"error": e.message}, e.status), keep_alive=False)
+                    break
+                await _write(writer, resp, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # server shutdown; ending normally keeps asyncio from logging the
+            # cancelled connection task as an unhandled error (Python 3.11)
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    return on_connection
+
+
+async def serve(handler: Handler, host: str = "127.0.0.1", port: int = 3999) -> asyncio.AbstractServer:
+    """Start a minimal keep-alive HTTP/1.1 server around ``handler``."""
+    return await asyncio.start_server(_connection_handler(handler), host, port, limit=MAX_HEADER_BYTES)
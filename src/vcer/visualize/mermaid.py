@@ -1,51 +1,171 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import io
+import textwrap
+from typing import Any, Dict, Iterable, List, Mapping, Optional, TextIO
 
+from ..core import trace
 
-def parts_to_mermaid(data: dict) -> str:
-    parts = data.get("parts", [])
-    if not parts:
-        return "graph TD;\n    A(No parts found);"
+DEFAULT_DIRECTION = "TD"
+DIRECTIONS = ("TD", "TB", "BT", "LR", "RL")
+DEFAULT_WRAP = 60
+DEFAULT_PREVIEW = 120
+DEFAULT_MAX_NODES = 40
+DEFAULT_MAX_GROUPS = 40
 
-    mmd = "graph TD;\n"
-    for i, part in enumerate(parts):
-        name = part.get("name", f"Part {i+1}")
-        content_preview = part.get("content", "").strip()[:50].replace("\"", "#quot;")
-        mmd += f'    {i}("**{name}**<br/>{content_preview}...");\n'
-    return mmd
+# top-level nodes of the semantic diagram, chosen by the category's schema number
+SEMANTIC_ROOTS = (("1.", "B", "Static Context"), ("2.", "C", "Dynamic Context"), ("3.", "D", "Output Control"))
 
 
-def semantic_parts_to_mermaid(classified_data: list[dict]) -> str:
-    """Generates a Mermaid diagram from semantically classified data."""
-    if not classified_data:
-        return "graph TD;\n    A(No classified data found);"
-
-    mermaid_string = "graph TD;\n"
-    mermaid_string += "    A(LLM Payload) --> B{Static Context};\n"
-    mermaid_string += "    A --> C{Dynamic Context};\n"
-    mermaid_string += "    A --> D{Output Control};\n\n"
-
-    node_counter = 0
-    for item in classified_data:
-        category = item.get("category", "기타").replace('"', "'")
-        content = item.get("content", " ").strip().replace('"', "'")
-        
-        # Create node name
-        node_id = f"N{node_counter}"
-        node_counter += 1
-        
-        # Escape node text
-        node_text = f'"{node_id}[\\"{category}\\"\\<br/>---\\<br/>{content[:80]}..."'
-        
-        if category.startswith("1."):
-            mermaid_string += f"    B --> {node_text};\n"
-        elif category.startswith("2."):
-            mermaid_string += f"    C --> {node_text};\n"
-        elif category.startswith("3."):
-            mermaid_string += f"    D --> {node_text};\n"
+class MermaidStyle:
+    """``visualize.mermaid`` settings.
+
+    ``direction`` and ``wrap`` (label width) as before, plus ``preview``
+    (content characters per node), ``max_nodes`` (nodes per subgraph before
+    the rest fold into a summary node), ``max_groups`` (subgraphs before
+    further groups fold into one summary subgraph) and ``group_by`` (part
+    key that selects the subgraph: ``name``, ``source``, or ``file`` for
+    corpora).
+    """
+
+    __slots__ = ("direction", "wrap", "preview", "max_nodes", "max_groups", "group_by")
+
+    def __init__(
+        self,
+        direction: str = DEFAULT_DIRECTION,
+        wrap: int = DEFAULT_WRAP,
+        preview: int = DEFAULT_PREVIEW,
+        max_nodes: int = DEFAULT_MAX_NODES,
+        max_groups: int = DEFAULT_MAX_GROUPS,
+        group_by: str = "name",
+    ) -> None:
+        direction = direction.upper()
+        if direction not in DIRECTIONS:
+            raise ValueError(f"visualize.mermaid.direction must be one of {', '.join(DIRECTIONS)}")
+        self.direction = direction
+        self.wrap = max(1, int(wrap))
+        self.preview = int(preview)
+        self.max_nodes = max(0, int(max_nodes))
+        self.max_groups = max(0, int(max_groups))
+        self.group_by = group_by
+
+    @classmethod
+    def from_config(cls, cfg: Optional[Dict[str, Any]] = None, **overrides: Any) -> "MermaidStyle":
+        mcfg = dict(((cfg or {}).get("visualize") or {}).get("mermaid") or {})
+        mcfg.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(**{k: mcfg[k] for k in cls.__slots__ if k in mcfg})
+
+
+class _Group:
+    __slots__ = ("nodes", "hidden")
+
+    def __init__(self) -> None:
+        self.nodes: List[str] = []
+        self.hidden = 0
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "#amp;").replace('"', "#quot;").replace("<", "#lt;").replace(">", "#gt;")
+
+
+def _preview(content: str, style: MermaidStyle) -> str:
+    # only the head is ever shown, so huge contents cost no more than short ones
+    text = " ".join(content[: style.preview * 4].split())
+    if len(text) > style.preview:
+        text = text[: style.preview].rstrip() + "…"
+    return "<br/>".join(_escape(line) for line in textwrap.wrap(text, style.wrap, break_long_words=True))
+
+
+def _collect(items: Iterable[Mapping[str, Any]], key: str, label: Any, style: MermaidStyle) -> tuple[Dict[str, _Group], int]:
+    groups: Dict[str, _Group] = {}
+    # groups past max_groups only add to one summary subgraph
+    folded: set = set()
+    rest = _Group()
+    n = 0
+    for n, item in enumerate(items, 1):
+        name = str(item.get(key) or "other")
+        group = groups.get(name)
+        if group is None:
+            if len(groups) >= style.max_groups:
+                folded.add(name)
+                rest.hidden += 1
+                continue
+            group = groups[name] = _Group()
+        if len(group.nodes) < style.max_nodes:
+            group.nodes.append(f'n{n}["{label(item)}"]')
         else:
-             mermaid_string += f"    A --> {node_text};\n"
-    
-    return mermaid_string
+            group.hidden += 1
+    if folded:
+        groups[f"… {len(folded)} more groups"] = rest
+    return groups, n
 
+
+def _write_groups(fh: TextIO, groups: Dict[str, _Group]) -> List[str]:
+    ids = []
+    for k, (name, group) in enumerate(groups.items()):
+        gid = f"g{k}"
+        ids.append(gid)
+        fh.write(f'    subgraph {gid}["{_escape(name)} ({len(group.nodes) + group.hidden})"]\n')
+        for node in group.nodes:
+            fh.write(f"        {node};\n")
+        if group.hidden:
+            fh.write(f'        {gid}_more(["… {group.hidden} more"]);\n')
+        fh.write("    end\n")
+    return ids
+
+
+def write_parts_mermaid(parts: Iterable[Mapping[str, Any]], fh: TextIO, cfg: Optional[Dict[str, Any]] = None, **style: Any) -> int:
+    """Write a flowchart of ``parts`` to ``fh``; returns the number of parts.
+
+    One pass over ``parts``: at most ``max_groups`` subgraphs of at most
+    ``max_nodes`` node lines each, with the rest only counted, so time is
+    linear and output stays bounded for corpora of any size. ``style``
+    overrides ``visualize.mermaid``.
+    """
+    st = MermaidStyle.from_config(cfg, **style)
+
+    def label(p: Mapping[str, Any]) -> str:
+        return f"**{_escape(str(p.get('name', 'other')))}**<br/>{_preview(p.get('content', ''), st)}"
+
+    with trace.span("render.mermaid") as sp:
+        groups, n = _collect(parts, st.group_by, label, st)
+        sp.set(parts=n, groups=len(groups))
+        fh.write(f"graph {st.direction};\n")
+        if not n:
+            fh.write("    A(No parts found);\n")
+            return 0
+        _write_groups(fh, groups)
+    return n
+
+
+def write_semantic_mermaid(classified_data: Iterable[Mapping[str, Any]], fh: TextIO, cfg: Optional[Dict[str, Any]] = None, **style: Any) -> int:
+    """Semantic classification diagram: one subgraph per category under its schema root."""
+    st = MermaidStyle.from_config(cfg, **style)
+    with trace.span("render.mermaid_semantic") as sp:
+        groups, n = _collect(classified_data, "category", lambda item: _preview(item.get("content", ""), st), st)
+        sp.set(items=n, groups=len(groups))
+        fh.write(f"graph {st.direction};\n")
+        if not n:
+            fh.write("    A(No classified data found);\n")
+            return 0
+        fh.write("    A(LLM Payload);\n")
+        for _, node, title in SEMANTIC_ROOTS:
+            fh.write(f"    A --> {node}{{{title}}};\n")
+        ids = _write_groups(fh, groups)
+        for gid, category in zip(ids, groups):
+            parent = next((node for prefix, node, _ in SEMANTIC_ROOTS if category.startswith(prefix)), "A")
+            fh.write(f"    {parent} --> {gid};\n")
+    return n
+
+
+def parts_to_mermaid(data: dict, cfg: Optional[Dict[str, Any]] = None, **style: Any) -> str:
+    buf = io.StringIO()
+    write_parts_mermaid(data.get("parts", []), buf, cfg, **style)
+    return buf.getvalue()
+
+
+def semantic_parts_to_mermaid(classified_data: list[dict], cfg: Optional[Dict[str, Any]] = None) -> str:
+    """Generates a Mermaid diagram from semantically classified data."""
+    buf = io.StringIO()
+    write_semantic_mermaid(classified_data, buf, cfg)
+    return buf.getvalue()
@@ -1,11 +1,13 @@
 
 from __future__ import annotations
 
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 
 from rich.console import Console
+from rich.markup import escape
 from rich.panel import Panel
 from rich.syntax import Syntax
+from rich.table import Table
 
 
 def visualize_semantic_parts_in_terminal(classified_data: List[Dict[str, Any]], console: Console):
@@ -25,3 +27,150 @@ def visualize_semantic_parts_in_terminal(classified_data: List[Dict[str, Any]],
         )
         console.print(panel)
 
+
+
+def print_token_report(report: Dict[str, Any], console: Console) -> None:
+    """Per-part token table for the report filled by ``optimize_parts``."""
+    table = Table(title=f"Tokens ({report.get('tokenizer', 'approx')})")
+    table.add_column("Part")
+    table.add_column("Line", justify="right")
+    table.add_column("Before", justify="right")
+    table.add_column("After", justify="right")
+    table.add_column("Action")
+    style = {"kept": "", "trimmed": "yellow", "dropped": "red"}
+    for row in report.get("parts", []):
+        action = row["action"]
+        table.add_row(
+            row["name"], str(row.get("start_line") or ""), str(row["tokens_before"]), str(row["tokens"]),
+            f"[{style[action]}]{action}[/{style[action]}]" if style[action] else action,
+        )
+    budget = report.get("budget")
+    table.caption = f"{report['tokens_before']} → {report['tokens']} tokens" + (f" (budget {budget})" if budget else "")
+    examples = report.get("examples", {})
+    if examples.get("found"):
+        table.caption += f", {examples['kept']}/{examples['found']} examples kept"
+    console.print(table)
+    if report.get("over_budget"):
+        console.print("[red]Still over budget: parts in limits.keep were left intact[/red]")
+
+
+def print_prefix_report(prefix: Dict[str, Any], console: Console) -> None:
+    """Stable/volatile classes and the expected shared prefix from ``prefix_report``."""
+    table = Table(title="Prefix reuse")
+    table.add_column("Part")
+    table.add_column("Reuse", justify="right")
+    table.add_column("Distinct", justify="right")
+    table.add_column("Tokens", justify="right")
+    table.add_column("Class")
+    for name, st in sorted(prefix["parts"].items(), key=lambda kv: -kv[1]["reuse"]):
+        cls = st["class"]
+        table.add_row(name, f"{st['reuse']:.2f}", str(st["distinct"]), str(st["tokens"]), f"[green]{cls}[/green]" if cls == "stable" else cls)
+    console.print(table)
+    console.print(
+        f"Prefix fingerprint {prefix['fingerprint']} ({prefix['stable_sections']} stable sections, {prefix['prefix_tokens']} tokens); "
+        f"expected shared prefix {prefix['expected_shared_tokens']} tokens vs {prefix['baseline_expected_shared_tokens']} in optimize.order"
+    )
+
+
+def print_dedup_report(report: Dict[str, Any], console: Console, limit: int = 20) -> None:
+    """Duplicate clusters from ``dedup.find_duplicates``, largest savings first."""
+    clusters = report.get("clusters", [])
+    table = Table(title=f"Duplicates (Jaccard ≥ {report['threshold']})")
+    table.add_column("Kind")
+    table.add_column("Part")
+    table.add_column("Copies", justify="right")
+    table.add_column("Similarity", justify="right")
+    table.add_column("Saved", justify="right")
+    table.add_column("Kept")
+    table.add_column("Preview", no_wrap=True, overflow="ellipsis", max_width=32)
+    for c in clusters[:limit]:
+        first = c["members"][0]
+        kept = f"{first['file']}:{first['start_line']}" if "file" in first else f"line {first['start_line']}"
+        if c["level"] == "example":
+            kept += f" ex{first['example'] + 1}"
+        table.add_row(
+            c["kind"], first["name"], str(len(c["members"])), f"{c['similarity']:.2f}",
+            str(c["tokens_saved"]), kept, c["preview"],
+        )
+    total = report.get("tokens") or 0
+    share = f" ({report['tokens_saved'] / total:.0%})" if total else ""
+    table.caption = f"{len(clusters)} clusters; {report['tokens_saved']} of {total} tokens redundant{share}"
+    if len(clusters) > limit:
+        table.caption += f"; {len(clusters) - limit} smaller clusters not shown"
+    console.print(table)
+    removed = report.get("removed")
+    if removed and (removed["parts"] or removed["examples"]):
+        console.print(f"Removed {removed['parts']} duplicate part(s) and {removed['examples']} duplicate example(s)")
+
+
+def print_bench_report(report: Dict[str, Any], console: Console, comparison: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Results from ``bench.suite.run_suite``, with the baseline change when compared."""
+    rows = {r["id"]: r for r in comparison or []}
+    table = Table(title=f"vcer bench (Python {report['python']})")
+    table.add_column("Case")
+    table.add_column("Time / rate", justify="right")
+    table.add_column("Throughput", justify="right")
+    if comparison is not None:
+        table.add_column("Baseline", justify="right")
+        table.add_column("Change", justify="right")
+    style = {"regressed": "red", "improved": "green"}
+    for r in report["results"]:
+        if r["metric"] == "rps":
+            value = f"{r['rps']} req/s"
+            extra = f"p50/p95 {r['p50_ms']}/{r['p95_ms']} ms" + (f", {r['errors']} errors" if r["errors"] else "")
+        else:
+            value = f"{r['min_ms']} ms"
+            extra = f"{r['mb_per_s']} MB/s" if r.get("mb_per_s") is not None else ""
+        cells = [escape(r["id"]), value, extra]
+        if comparison is not None:
+            row = rows.get(r["id"], {})
+            change = row.get("change")
+            text = "" if change is None else f"{change:+.1%}"
+            color = style.get(row.get("status", ""))
+            cells += [str(row.get("baseline") or "new"), f"[{color}]{text}[/{color}]" if color and text else text]
+        table.add_row(*cells)
+    if comparison is not None:
+        regressed = sum(1 for row in comparison if row["status"] == "regressed")
+        table.caption = f"change is signed so that + is slower; {regressed} regression(s)"
+    console.print(table)
+
+
+def print_loadtest_report(report: Dict[str, Any], console: Console) -> None:
+    """Per-backend results from ``bench.loadtest.run_loadtest``."""
+    st = report["settings"]
+    load = f"{st['rate']} req/s open loop" if st["mode"] == "open" else f"{st['concurrency']} in flight"
+    table = Table(title=f"vcer loadtest ({load}{', mock' if report.get('mock') else ''})")
+    table.add_column("Backend")
+    table.add_column("Requests", justify="right")
+    table.add_column("Req/s", justify="right")
+    table.add_column("Latency ms\np50/p95/p99", justify="right")
+    table.add_column("TTFT ms\np50/p95/p99", justify="right")
+    table.add_column("Tokens/s", justify="right")
+    table.add_column("Errors", justify="right")
+    fmt = lambda d: "/".join("-" if d[q] is None else f"{d[q]:.0f}" for q in ("p50", "p95", "p99"))
+    causes = []
+    for r in report["results"]:
+        errors = f"[red]{r['error_rate']:.1%}[/red]" if r["errors"] else "0"
+        table.add_row(
+            escape(r["backend"]), str(r["requests"]), str(r["rps"]), fmt(r["latency_ms"]), fmt(r["ttft_ms"]),
+            str(r["tokens_per_s"]), errors,
+        )
+        causes += [f"{r['backend']}: {k} ×{v}" for k, v in sorted(r["errors_by_type"].items())]
+    if causes:
+        table.caption = escape("; ".join(causes))
+    console.print(table)
+
+
+def print_trace_summary(tracer: Any, console: Console) -> None:
+    """Per-stage timings and counters of a ``trace.Tracer``."""
+    table = Table(title="Stages")
+    table.add_column("Stage")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total ms", justify="right")
+    table.add_column("Mean ms", justify="right")
+    table.add_column("Max ms", justify="right")
+    for row in tracer.summary():
+        table.add_row(row["stage"], str(row["count"]), f"{row['total_ms']:.2f}", f"{row['mean_ms']:.2f}", f"{row['max_ms']:.2f}")
+    if tracer.counters:
+        table.caption = ", ".join(f"{name} {value:g}" for name, value in sorted(tracer.counters.items()))
+    console.print(table)
@@ -0,0 +1,154 @@
+"""The single-pass scanner and ``PartRef`` offsets against the original extractor.
+
+``_legacy_extract_parts`` is the line-list implementation the scanner
+replaced, kept verbatim (bar the pattern argument) as the reference.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+from typing import Dict, List, Pattern
+
+import pytest
+
+from vcer.core.analyzer import (
+    HEADER_PATTERNS,
+    TAG_CLOSE,
+    TAG_OPEN,
+    Detectors,
+    _extract_parts,
+    extract_part_refs,
+    iter_file_parts,
+)
+from vcer.core.parts import SourceBuffer
+
+
+def _legacy_extract_parts(text: str, header_patterns: Dict[str, Pattern[str]] = HEADER_PATTERNS) -> List[dict]:
+    tagged = _legacy_tag_blocks(text)
+    consumed = [(p["start_line"], p["end_line"]) for p in tagged]
+    return tagged + _legacy_heading_sections(text, consumed, header_patterns)
+
+
+def _legacy_tag_blocks(text: str) -> List[dict]:
+    lines = text.splitlines()
+    parts = []
+    i = 0
+    while i < len(lines):
+        m = TAG_OPEN.search(lines[i])
+        if not m:
+            i += 1
+            continue
+        name = m.group("name").lower()
+        start = i + 1
+        j = start
+        while j < len(lines) and not TAG_CLOSE.search(lines[j]):
+            j += 1
+        content = "\n".join(lines[start:j]).strip()
+        parts.append({"name": name, "content": content, "source": "tag", "start_line": start, "end_line": j})
+        i = j + 1
+    return parts
+
+
+def _legacy_heading_sections(text: str, consumed: List[tuple[int, int]], header_patterns: Dict[str, Pattern[str]]) -> List[dict]:
+    lines = text.splitlines()
+    parts = []
+    headers: List[tuple[int, str]] = []
+    for idx, line in enumerate(lines):
+        for name, pat in header_patterns.items():
+            if pat.match(line):
+                headers.append((idx, name))
+                break
+    headers.append((len(lines), "__eof__"))
+    for k in range(len(headers) - 1):
+        start_idx, name = headers[k]
+        end_idx, _ = headers[k + 1]
+        body_start = start_idx + 1
+        body = "\n".join(lines[body_start:end_idx]).strip()
+        if not body:
+            continue
+        if any(not (end_idx <= b[0] or body_start >= b[1]) for b in consumed):
+            continue
+        parts.append({"name": name, "content": body, "source": "header", "start_line": body_start, "end_line": end_idx})
+    return parts
+
+
+LINES = [
+    "## Task", "### constraints", "## Output Format", "##Few-Shot", "### Examples", "# Task", "## Task ",
+    "[part:role]", "intro [PART:Output_Format] trailing", "[/part]", "done [/PART]", "[part:a][/part]",
+    "", "   ", "\t", "plain text", "- a rule", "  indented body", "émoji ✓ 한국어",
+]
+BREAKS = ["\n", "\n", "\n", "\r\n", "\r", "\x0c", "\x1e", "\x85", " "]
+
+
+def _random_text(rng: random.Random) -> str:
+    n = rng.randint(0, 24)
+    text = "".join(rng.choice(LINES) + rng.choice(BREAKS) for _ in range(n))
+    return text if rng.random() < 0.5 else text.rstrip("\n")
+
+
+CASES = [
+    "",
+    "\n",
+    "## Task\n",
+    "## Task\n\n   \n## Constraints\nbe brief",
+    "[part:role]\nYou are helpful.\n[/part]\n## Task\nSummarize.",
+    "## Task\nbefore\n[part:x]\ninside\n[/part]\nafter",
+    "## Task\n[part:x]\nruns to EOF",
+    "[part:a] [/part]\n[/part]\n## Examples\nQ: 1\r\nA: 2\r\n",
+    "## Task\r\nline one line two\x85line three\r",
+]
+
+
+def _assert_same(text: str) -> None:
+    expected = _legacy_extract_parts(text)
+    assert _extract_parts(text) == expected
+    assert [r.to_dict() for r in extract_part_refs(SourceBuffer(text))] == expected
+    assert [r.to_dict() for r in extract_part_refs(SourceBuffer(text.encode("utf-8")))] == expected
+
+
+@pytest.mark.parametrize("text", CASES)
+def test_matches_legacy_extractor(text: str) -> None:
+    _assert_same(text)
+
+
+def test_matches_legacy_extractor_on_random_prompts() -> None:
+    rng = random.Random(0)
+    for _ in range(3000):
+        _assert_same(_random_text(rng))
+
+
+def test_streamed_file_parts_match(tmp_path) -> None:
+    rng = random.Random(1)
+    path = tmp_path / "system.md"
+    for _ in range(200):
+        text = _random_text(rng)
+        path.write_text(text, encoding="utf-8", newline="")
+        expected = _legacy_extract_parts(text)
+        streamed = sorted(iter_file_parts(path), key=lambda p: (p["source"] != "tag", p["start_line"]))
+        assert streamed == expected
+
+
+def test_per_pattern_fallback_matches_legacy() -> None:
+    # the same group name in every pattern cannot be folded into one alternation
+    patterns = {
+        "task": r"^##\s*(?P<title>Task)\s*$",
+        "rules": r"^##\s*(?P<title>Rules|Constraints)\s*$",
+    }
+    det = Detectors(list(patterns.items()), TAG_OPEN, TAG_CLOSE)
+    assert det.header is None
+    compiled = {name: re.compile(pat, re.IGNORECASE) for name, pat in patterns.items()}
+    rng = random.Random(2)
+    for _ in range(500):
+        text = _random_text(rng).replace("### constraints", "## Rules")
+        assert _extract_parts(text, det) == _legacy_extract_parts(text, compiled)
+
+
+def test_part_ref_reads_like_a_part() -> None:
+    text = "intro\n## Task\n  Summarize.  \n\n## Constraints\nbe brief\n"
+    refs = extract_part_refs(SourceBuffer(text))
+    assert [dict(r) for r in refs] == _legacy_extract_parts(text)
+    assert refs[0]["content"] == "Summarize."
+    assert refs[1].get("name") == "constraints"
+    with pytest.raises(KeyError):
+        refs[0]["missing"]
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from vcer.adapters.batching import BatchSettings, MicroBatcher, split_batch_response
+from vcer.adapters.router import load_backend
+
+
+def test_split_sglang_keeps_list_order() -> None:
+    data = [{"text": "a"}, {"text": "b"}]
+    assert split_batch_response("sglang", data, 2) == data
+
+
+@pytest.mark.parametrize("data", [[{"text": "a"}], {"text": "a"}])
+def test_split_sglang_rejects_wrong_shape(data: Any) -> None:
+    with pytest.raises(ValueError):
+        split_batch_response("sglang", data, 2)
+
+
+def test_split_completions_remaps_indices() -> None:
+    usage = {"prompt_tokens": 10, "completion_tokens": 6}
+    data = {
+        "id": "cmpl-1",
+        "model": "m",
+        "choices": [{"index": 1, "text": "b"}, {"index": 0, "text": "a"}],
+        "usage": usage,
+    }
+    first, second = split_batch_response("vllm", data, 2)
+    assert first["choices"] == [{"index": 0, "text": "a"}]
+    assert second["choices"] == [{"index": 0, "text": "b"}]
+    for resp in (first, second):
+        assert resp["id"] == "cmpl-1" and resp["model"] == "m"
+        assert "usage" not in resp
+        assert resp["batch"] == {"size": 2, "usage": usage}
+
+
+def test_split_completions_without_index_uses_position() -> None:
+    data = {"choices": [{"text": "a"}, {"text": "b"}]}
+    assert [r["choices"][0]["text"] for r in split_batch_response("openai", data, 2)] == ["a", "b"]
+
+
+@pytest.mark.parametrize(
+    "choices",
+    [
+        [{"index": 0}],  # too few
+        [{"index": 0}, {"index": 1}, {"index": 2}],  # too many
+        [{"index": 0}, {"index": 0}],  # duplicate index
+        [{"index": 0}, {"index": 5}],  # index out of range
+    ],
+)
+def test_split_completions_rejects_mismatched_choices(choices: List[Dict[str, Any]]) -> None:
+    with pytest.raises(ValueError):
+        split_batch_response("vllm", {"choices": choices}, 2)
+
+
+def test_split_completions_rejects_non_object() -> None:
+    with pytest.raises(ValueError):
+        split_batch_response("vllm", [{"text": "a"}], 1)
+
+
+def _backend() -> Dict[str, Any]:
+    cfg = {"backends": [{"id": "v", "kind": "vllm", "base_url": "http://v", "batch": True}]}
+    return load_backend(cfg, "v")
+
+
+def test_batcher_coalesces_and_fans_out() -> None:
+    calls: List[Dict[str, Any]] = []
+
+    async def send(be: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        calls.append(payload)
+        choices = [{"index": i, "text": p.upper()} for i, p in enumerate(payload["prompt"])]
+        return {"choices": choices, "usage": {"completion_tokens": 3}}
+
+    async def run() -> List[Any]:
+        batcher = MicroBatcher(send, BatchSettings(max_batch=3, max_wait_ms=50))
+        metas = [{} for _ in range(4)]
+        results = await asyncio.gather(*(batcher.submit(_backend(), p, 8, m) for p, m in zip("abcd", metas)))
+        return [results, metas, batcher.stats()]
+
+    results, metas, stats = asyncio.run(run())
+    # three fill a batch at once; the fourth waits out max_wait_ms alone
+    assert [len(c["prompt"]) for c in calls] == [3, 1]
+    assert [r["choices"][0]["text"] for r in results] == ["A", "B", "C", "D"]
+    assert [m["batch"] for m in metas] == [3, 3, 3, 1]
+    assert stats == {"batches": 2, "requests": 4, "mean_batch": 2.0}
+
+
+def test_batcher_fails_every_member() -> None:
+    async def send(be: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        raise ConnectionError("down")
+
+    async def run() -> List[Any]:
+        batcher = MicroBatcher(send, BatchSettings(max_batch=2, max_wait_ms=50))
+        return await asyncio.gather(*(batcher.submit(_backend(), p, 8) for p in "ab"), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(run())] == [ConnectionError, ConnectionError]
+
+
+def test_batcher_fails_members_on_a_bad_split() -> None:
+    async def send(be: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"choices": [{"index": 0, "text": "only one"}]}
+
+    async def run() -> List[Any]:
+        batcher = MicroBatcher(send, BatchSettings(max_batch=2, max_wait_ms=50))
+        return await asyncio.gather(*(batcher.submit(_backend(), p, 8) for p in "ab"), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(run())] == [ValueError, ValueError]
+
+
+def test_batcher_keeps_sampling_apart() -> None:
+    calls: List[Dict[str, Any]] = []
+
+    async def send(be: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        calls.append(payload)
+        return {"choices": [{"index": i, "text": p} for i, p in enumerate(payload["prompt"])]}
+
+    async def run() -> None:
+        batcher = MicroBatcher(send, BatchSettings(max_batch=8, max_wait_ms=10))
+        await asyncio.gather(
+            batcher.submit(_backend(), "a", 8, sampling={"temperature": 0.0}),
+            batcher.submit(_backend(), "b", 8, sampling={"temperature": 0.7}),
+            batcher.submit(_backend(), "c", 8, sampling={"temperature": 0.0}),
+        )
+
+    asyncio.run(run())
+    assert sorted((c["temperature"], c["prompt"]) for c in calls) == [(0.0, ["a", "c"]), (0.7, ["b"])]
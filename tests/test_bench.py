@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from vcer.adapters.client import AsyncRouter
+from vcer.bench.suite import BACKEND_KINDS, bench_route, run_suite
+
+
+@pytest.mark.parametrize("kind", BACKEND_KINDS)
+def test_bench_route_against_the_mock(kind: str) -> None:
+    result = asyncio.run(bench_route(kind, requests=20, concurrency=4))
+    assert (result["id"], result["errors"]) == (f"route[{kind}]", 0)
+    assert result["rps"] > 0 and result["p50_ms"] <= result["p95_ms"]
+
+
+def test_bench_route_does_not_count_warm_up_errors(monkeypatch: pytest.MonkeyPatch) -> None:
+    route = AsyncRouter.route
+    calls = 0
+
+    async def flaky(self: AsyncRouter, *args: Any, **kwargs: Any) -> Any:
+        nonlocal calls
+        calls += 1
+        if calls == 1:  # the first warm-up request
+            raise ConnectionError("cold")
+        return await route(self, *args, **kwargs)
+
+    monkeypatch.setattr(AsyncRouter, "route", flaky)
+    assert asyncio.run(bench_route("vllm", requests=10, concurrency=2))["errors"] == 0
+
+
+def test_suite_benches_every_backend_kind() -> None:
+    results = run_suite(only=["route"], requests=4, concurrency=2)["results"]
+    assert [r["param"] for r in results] == list(BACKEND_KINDS)
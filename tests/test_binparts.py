@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+from vcer.core.binparts import PartsFile, is_parts_bin, write_parts_bin
+
+
+def _result(path: str, names: List[str], user: Any = None) -> Dict[str, Any]:
+    parts = [
+        {"name": name, "content": f"body of {name} ✓", "source": "header", "start_line": 2 * i + 1, "end_line": 2 * i + 2}
+        for i, name in enumerate(names)
+    ]
+    return {"system_file": path, "user_file": user, "parts": parts}
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    results = [
+        _result("a.md", ["task", "constraints"], user="u.md"),
+        {**_result("b.md", ["task"]), "error": "partial"},
+        _result("c.md", []),
+    ]
+    path = tmp_path / "parts.bin"
+    write_parts_bin(path, results)
+    assert is_parts_bin(path)
+    with PartsFile(path) as pf:
+        assert pf.n_files == 3
+        assert pf.files() == ["a.md", "b.md", "c.md"]
+        got = [{**r, "parts": [p.to_dict() for p in r["parts"]]} for r in pf.results()]
+        assert got == results
+        assert [p["content"] for p in pf.parts_named("task")] == ["body of task ✓", "body of task ✓"]
+        assert pf.file("b.md")["error"] == "partial"
+
+
+def _digest(tmp_path: Path, name: str, result: Dict[str, Any]) -> str:
+    path = tmp_path / name
+    write_parts_bin(path, [result])
+    with PartsFile(path) as pf:
+        return pf.digest()
+
+
+def test_digest_depends_on_part_names(tmp_path: Path) -> None:
+    # same contents, lines and string-table layout; only the name differs
+    one = _result("a.md", ["instructions"])
+    two = _result("a.md", ["examples"])
+    two["parts"][0]["content"] = one["parts"][0]["content"]
+    assert _digest(tmp_path, "one.bin", one) != _digest(tmp_path, "two.bin", two)
+
+
+def test_digest_depends_on_file_path(tmp_path: Path) -> None:
+    assert _digest(tmp_path, "one.bin", _result("a.md", ["task"])) != _digest(tmp_path, "two.bin", _result("b.md", ["task"]))
+
+
+def test_digest_is_stable_across_writes(tmp_path: Path) -> None:
+    result = _result("a.md", ["task", "constraints"])
+    assert _digest(tmp_path, "one.bin", result) == _digest(tmp_path, "two.bin", result)
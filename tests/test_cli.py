@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from typer.testing import CliRunner
+
+from vcer.adapters.client import AsyncRouter
+from vcer.adapters.pool import BackendPool
+from vcer.cli import app
+
+
+@pytest.fixture
+def project(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "prompt.md").write_text("## Task\nSummarize.\n\n## Constraints\nBe brief.\n", encoding="utf-8")
+    return tmp_path
+
+
+def test_analyze_accepts_empty_config_sections(project: Path) -> None:
+    # "analyze:" and "cache:" with nothing under them load as None
+    (project / ".vcer.yml").write_text("analyze:\ncache:\n", encoding="utf-8")
+    result = CliRunner().invoke(app, ["analyze", "--in", "prompt.md"])
+    assert result.exit_code == 0, result.output
+    parts = json.loads((project / "parts.json").read_text(encoding="utf-8"))["parts"]
+    assert [p["name"] for p in parts] == ["task", "constraints"]
+
+
+def test_analyze_stream_rejects_user_file(project: Path) -> None:
+    (project / "user.md").write_text("Hi.\n", encoding="utf-8")
+    result = CliRunner().invoke(app, ["analyze", "--in", "prompt.md", "--user", "user.md", "--stream", "--out", "-"])
+    assert result.exit_code == 2
+    assert "--user" in result.output and not (project / "parts.json").exists()
+
+
+def test_optimize_accepts_empty_config_sections(project: Path) -> None:
+    (project / ".vcer.yml").write_text("optimize:\nlimits:\n", encoding="utf-8")
+    runner = CliRunner()
+    assert runner.invoke(app, ["analyze", "--in", "prompt.md", "--no-cache"]).exit_code == 0
+    result = runner.invoke(app, ["optimize", "--parts", "parts.json", "--no-cache"])
+    assert result.exit_code == 0, result.output
+    assert "Summarize." in (project / "system.opt.md").read_text(encoding="utf-8")
+
+
+ROUTE_CONFIG = """\
+cache:
+  enabled: false
+backends:
+  - {id: a, kind: vllm, base_url: "http://a"}
+  - {id: b, kind: vllm, base_url: "http://b"}
+router:
+  strategy: round_robin
+"""
+
+
+@pytest.fixture
+def backends(project: Path, monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Backend ``a`` answers 503, ``b`` answers (streamed or not); returns the hosts hit."""
+    (project / ".vcer.yml").write_text(ROUTE_CONFIG, encoding="utf-8")
+    (project / "user.md").write_text("Hi.\n", encoding="utf-8")
+    seen: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.host)
+        if request.url.host == "a":
+            return httpx.Response(503)
+        if json.loads(request.content).get("stream"):
+            chunk = {"choices": [{"index": 0, "delta": {"content": "streamed"}}]}
+            return httpx.Response(200, content=f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode())
+        return httpx.Response(200, json={"choices": [{"index": 0, "message": {"role": "assistant", "content": "sent"}}]})
+
+    def client(self: AsyncRouter, be: Dict[str, Any]) -> httpx.AsyncClient:
+        if be["id"] not in self._clients:
+            self._clients[be["id"]] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return self._clients[be["id"]]
+
+    def no_probes(self: BackendPool, client: Any) -> None:
+        raise AssertionError("a one-shot route started health checks")
+
+    monkeypatch.setattr(AsyncRouter, "client", client)
+    monkeypatch.setattr(BackendPool, "start_health_checks", no_probes)
+    return seen
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_route_auto_fails_over_through_the_router_pool(backends: List[str], stream: bool) -> None:
+    args = ["route", "--backend", "auto", "--system", "prompt.md", "--user", "user.md", "--send"]
+    result = CliRunner().invoke(app, args + (["--stream"] if stream else []))
+    assert result.exit_code == 0, result.output
+    assert backends == ["a", "b"]
+    assert ("streamed" if stream else "sent") in result.output
+    assert "b (2 attempt(s))" in result.output
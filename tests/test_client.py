@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, Iterator, List
+
+import httpx
+import pytest
+
+from vcer.adapters.client import AsyncRouter, route_batch
+from vcer.adapters.pool import NoHealthyBackend
+
+
+class _EchoRouter:
+    """Stands in for ``AsyncRouter``: records calls and requests in flight."""
+
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.peak = 0
+        self.calls: List[Dict[str, Any]] = []
+
+    async def route(self, system: str, user: str, backend: str, **params: Any) -> Dict[str, Any]:
+        self.calls.append({"user": user, "backend": backend, "cache": params.get("cache")})
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            # later records finish first, so results come back out of order
+            await asyncio.sleep(0.002 * (int(user) % 3))
+            if int(user) % 7 == 6:
+                raise RuntimeError("boom")
+            return {"echo": user}
+        finally:
+            self.in_flight -= 1
+
+
+def _collect(router: Any, records: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+    async def run() -> List[Dict[str, Any]]:
+        return [out async for out in route_batch(router, records, **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_route_batch_reads_ahead_at_most_two_windows() -> None:
+    router = _EchoRouter(concurrency=2)
+    window = 2 * router.concurrency
+    read = 0
+    results: List[Dict[str, Any]] = []
+
+    def records() -> Iterator[Dict[str, Any]]:
+        nonlocal read
+        for i in range(40):
+            # every record read must fit in the window beside those still pending
+            assert read - len(results) <= window
+            read += 1
+            yield {"id": f"r{i}", "user": str(i)}
+
+    async def run() -> None:
+        async for out in route_batch(router, records()):
+            results.append(out)
+
+    asyncio.run(run())
+    assert router.peak <= window
+    assert sorted(out["index"] for out in results) == list(range(40))
+    assert [out["index"] for out in results] != list(range(40))
+    for out in results:
+        assert out["id"] == f"r{out['index']}"
+        if out["index"] % 7 == 6:
+            assert out["error"] == "RuntimeError: boom" and "response" not in out
+        else:
+            assert out["response"] == {"echo": str(out["index"])}
+
+
+def test_route_batch_params_override_defaults() -> None:
+    router = _EchoRouter(concurrency=4)
+    records = [{"user": "0"}, {"user": "1", "params": {"backend": "other", "cache": False}}]
+    results = sorted(_collect(router, records, default_backend="main", cache=True), key=lambda out: out["index"])
+    assert [out["backend"] for out in results] == ["main", "other"]
+    assert sorted((c["backend"], c["cache"]) for c in router.calls) == [("main", True), ("other", False)]
+
+
+def _cfg(*ids: str) -> Dict[str, Any]:
+    return {
+        "backends": [{"id": i, "kind": "vllm", "base_url": f"http://{i}"} for i in ids],
+        "router": {"strategy": "round_robin", "health_check_interval_ms": 0},
+    }
+
+
+def _reply(text: str) -> Dict[str, Any]:
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]}
+
+
+class _MockRouter(AsyncRouter):
+    """``AsyncRouter`` whose backends are answered by ``handler`` in process."""
+
+    def __init__(self, cfg: Dict[str, Any], handler: Callable[[httpx.Request], httpx.Response], **kwargs: Any) -> None:
+        super().__init__(cfg, **kwargs)
+        self._transport = httpx.MockTransport(handler)
+
+    def client(self, be: Dict[str, Any]) -> Any:
+        if be["id"] not in self._clients:
+            self._clients[be["id"]] = httpx.AsyncClient(transport=self._transport)
+        return self._clients[be["id"]]
+
+
+def _route(router: AsyncRouter, **kwargs: Any) -> Dict[str, Any]:
+    async def run() -> Dict[str, Any]:
+        async with router:
+            meta: Dict[str, Any] = {}
+            resp = await router.route("sys", "hi", "auto", meta=meta, **kwargs)
+            return {"meta": meta, "resp": resp, "healthy": dict(router.pool.healthy)}
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("status", [502, 503, 504])
+def test_route_fails_over_on_gateway_errors(status: int) -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "a":
+            return httpx.Response(status)
+        return httpx.Response(200, json=_reply("from b"))
+
+    out = _route(_MockRouter(_cfg("a", "b"), handler))
+    assert out["meta"] == {"backend": "b", "attempts": 2}
+    assert out["resp"] == _reply("from b")
+    assert out["healthy"] == {"a": False, "b": True}
+
+
+def test_route_fails_over_on_connection_errors() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "a":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, json=_reply("from b"))
+
+    out = _route(_MockRouter(_cfg("a", "b"), handler))
+    assert out["meta"] == {"backend": "b", "attempts": 2}
+
+
+def test_route_does_not_fail_over_on_client_errors() -> None:
+    seen: List[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.host)
+        return httpx.Response(400)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _route(_MockRouter(_cfg("a", "b"), handler))
+    assert seen == ["a"]
+
+
+def test_route_raises_when_every_backend_fails() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503)
+
+    with pytest.raises(NoHealthyBackend, match="a, b"):
+        _route(_MockRouter(_cfg("a", "b"), handler))
+
+
+def test_route_batch_sends_sampling_params() -> None:
+    payloads: List[Dict[str, Any]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payloads.append(json.loads(request.content))
+        return httpx.Response(200, json=_reply("ok"))
+
+    records = [{"user": "hi", "params": {"backend": "a", "temperature": 0.2, "seed": 3, "max_tokens": 16}}]
+    (out,) = _collect(_MockRouter(_cfg("a"), handler), records)
+    assert "error" not in out and out["response"] == _reply("ok")
+    assert (payloads[0]["temperature"], payloads[0]["seed"], payloads[0]["max_tokens"]) == (0.2, 3, 16)
+
+
+def test_route_batch_rejects_unknown_params_per_record() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=_reply("ok"))
+
+    records = [
+        {"user": "0", "params": {"backend": "a", "messages": []}},
+        {"user": "1", "params": {"backend": "a", "temprature": 0.2}},
+        {"user": "2", "params": {"backend": "a", "temperature": "hot"}},
+        {"user": "3", "params": {"backend": "a"}},
+    ]
+    results = sorted(_collect(_MockRouter(_cfg("a"), handler), records), key=lambda out: out["index"])
+    assert results[0]["error"].startswith("ValueError: Unknown params: messages")
+    assert results[1]["error"].startswith("ValueError: Unknown params: temprature")
+    assert results[2]["error"] == "ValueError: temperature must be int or float"
+    assert results[3]["response"] == _reply("ok")
+
+
+def test_route_batch_fails_over_per_record() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "a":
+            return httpx.Response(503)
+        return httpx.Response(200, json=_reply("ok"))
+
+    async def run() -> List[Dict[str, Any]]:
+        async with _MockRouter(_cfg("a", "b"), handler) as router:
+            records = ({"user": str(i)} for i in range(10))
+            return [out async for out in route_batch(router, records, default_backend="auto")]
+
+    results = asyncio.run(run())
+    assert len(results) == 10
+    assert all(out["backend"] == "b" and out["response"] == _reply("ok") for out in results)
+
+
+def test_route_accepts_an_empty_router_section() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=_reply("ok"))
+
+    cfg = {**_cfg("a"), "router": None}
+    (out,) = _collect(_MockRouter(cfg, handler), [{"user": "hi", "params": {"backend": "a"}}])
+    assert out["response"] == _reply("ok")
+
+
+def _sse(*texts: str) -> bytes:
+    chunks = [{"choices": [{"index": 0, "delta": {"content": t}}]} for t in texts]
+    return "".join(f"data: {json.dumps(c)}\n\n" for c in chunks).encode() + b"data: [DONE]\n\n"
+
+
+def _stream(router: AsyncRouter) -> Dict[str, Any]:
+    async def run() -> Dict[str, Any]:
+        async with router:
+            meta: Dict[str, Any] = {}
+            out: Dict[str, Any] = {"meta": meta, "deltas": []}
+            try:
+                async for delta in router.route_stream("sys", "hi", "auto", meta=meta):
+                    out["deltas"].append(delta)
+            except Exception as e:
+                out["error"] = e
+            out.update(healthy=dict(router.pool.healthy), in_flight=dict(router.pool.in_flight))
+            return out
+
+    return asyncio.run(run())
+
+
+def test_route_stream_fails_over_before_the_first_delta() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "a":
+            return httpx.Response(503)
+        return httpx.Response(200, content=_sse("Hel", "lo"))
+
+    out = _stream(_MockRouter(_cfg("a", "b"), handler))
+    assert out["deltas"] == ["Hel", "lo"] and "error" not in out
+    assert out["meta"] == {"backend": "b", "attempts": 2}
+    assert out["healthy"] == {"a": False, "b": True}
+    assert out["in_flight"] == {"a": 0, "b": 0}
+
+
+def test_route_stream_does_not_fail_over_after_a_delta() -> None:
+    seen: List[str] = []
+
+    async def broken() -> Any:
+        yield _sse("Hel")[: -len(b"data: [DONE]\n\n")]
+        raise httpx.RemoteProtocolError("peer closed connection")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request.url.host)
+        return httpx.Response(200, content=broken())
+
+    out = _stream(_MockRouter(_cfg("a", "b"), handler))
+    assert out["deltas"] == ["Hel"]
+    assert isinstance(out["error"], httpx.RemoteProtocolError)
+    assert seen == ["a"]
+    assert out["healthy"]["a"] is False and out["in_flight"]["a"] == 0
+
+
+def test_route_without_health_checks_starts_no_probes() -> None:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=_reply("ok"))
+
+    async def run() -> Any:
+        cfg = {**_cfg("a"), "router": {"health_check_interval_ms": 1000}}
+        async with _MockRouter(cfg, handler, health_checks=False) as router:
+            await router.route("sys", "hi", "auto")
+            return router._probe_client
+
+    assert asyncio.run(run()) is None
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from vcer.core.dedup import collapse_duplicates, find_duplicates
+
+LONG = "Always answer in English and cite the source document for every factual claim you make in the reply."
+
+
+def _part(name: str, content: str, line: int) -> Dict[str, Any]:
+    return {"name": name, "content": content, "source": "header", "start_line": line, "end_line": line + 1}
+
+
+def test_exact_copies_collapse_to_the_first() -> None:
+    parts = [_part("constraints", LONG, 1), _part("task", "Summarize.", 3), _part("constraints", "  " + LONG.replace(" ", "\n", 2), 5)]
+    report: Dict[str, Any] = {}
+    out = collapse_duplicates(parts, report=report)
+    assert out == parts[:2]
+    assert report["removed"] == {"parts": 1, "examples": 0}
+    assert report["clusters"][0]["kind"] == "exact"
+
+
+def test_symbols_are_not_dropped_as_exact_duplicates() -> None:
+    parts = [_part("constraints", "Output must be < 100 words.", 1), _part("constraints", "Output must be > 100 words.", 3)]
+    assert collapse_duplicates(parts) == parts
+    assert find_duplicates([parts])["clusters"] == []
+
+
+def test_symbol_only_parts_are_kept() -> None:
+    parts = [_part("other", text, i) for i, text in enumerate(["---", "***", "| | |", "---"])]
+    assert collapse_duplicates(parts) == parts
+
+
+def test_near_duplicates_cluster_above_threshold() -> None:
+    near = LONG.replace("every factual claim", "each factual claim")
+    found = find_duplicates([[_part("constraints", LONG, 1)], [_part("constraints", near, 1)]], labels=["a.md", "b.md"])
+    (cluster,) = found["clusters"]
+    assert cluster["kind"] == "near"
+    assert 0.85 <= cluster["similarity"] < 1.0
+    assert [m["file"] for m in cluster["members"]] == ["a.md", "b.md"]
+    assert found["tokens_saved"] == cluster["tokens_saved"] > 0
+
+
+def test_short_parts_only_match_exactly() -> None:
+    parts = [_part("task", "Be brief and clear.", 1), _part("task", "Be brief and clean.", 3)]
+    assert find_duplicates([parts])["clusters"] == []
+
+
+def test_repeated_examples_collapse_inside_few_shot() -> None:
+    ex: List[str] = [
+        "### Example 1\nQ: What is the capital of France and why is it important historically?\nA: Paris.\n",
+        "### Example 2\nQ: What is the capital of Japan and why is it important historically?\nA: Tokyo.\n",
+        "### Example 3\nQ: What is the capital of France and why is it important historically?\nA: Paris.\n",
+    ]
+    report: Dict[str, Any] = {}
+    (out,) = collapse_duplicates([_part("few_shot", "".join(ex), 1)], report=report)
+    assert out["content"] == ex[0] + ex[1]
+    assert report["removed"] == {"parts": 0, "examples": 1}
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+from vcer.core.optimizer import fit_budget
+from vcer.core.tokens import TokenCounter
+
+# one token per word; "## Title" headings count too
+WORDS = TokenCounter(lambda text: len(text.split()), "words")
+PRIORITY = {"task": 0, "constraints": 1, "few_shot": 2, "description": 3, "metadata": 4}
+
+
+def _part(name: str, content: str, line: int = 1) -> Dict[str, Any]:
+    return {"name": name, "content": content, "start_line": line}
+
+
+def _lines(word: str, n: int, width: int = 10) -> str:
+    return "".join(" ".join([word] * width) + "\n" for _ in range(n))
+
+
+def _examples(*answers: str) -> str:
+    return "".join(f"### Example {i}\nQ: question {i}\nA: {a}\n" for i, a in enumerate(answers, 1))
+
+
+def _fit(parts: List[Dict[str, Any]], budget: Any = None, **limits: Any) -> Any:
+    return fit_budget(parts, {"limits": limits}, budget=budget, counter=WORDS, priority=PRIORITY)
+
+
+def test_under_budget_keeps_everything() -> None:
+    parts = [_part("task", "Summarize the text."), _part("metadata", "v1")]
+    fitted, report = _fit(parts, budget=100)
+    assert fitted == parts
+    assert [r["action"] for r in report["parts"]] == ["kept", "kept"]
+    assert report["tokens"] == report["tokens_before"] == 8 and not report["over_budget"]
+
+
+def test_max_examples_caps_examples_in_prompt_order() -> None:
+    parts = [_part("few_shot", _examples("a", "b")), _part("few_shot", _examples("c", "d"), 10)]
+    fitted, report = _fit(parts, max_examples=3)
+    assert fitted[0] == parts[0]
+    assert fitted[1]["content"] == _examples("c")
+    assert report["examples"] == {"found": 4, "kept": 3}
+    assert [r["action"] for r in report["parts"]] == ["kept", "trimmed"]
+
+
+def test_examples_go_before_whole_parts() -> None:
+    parts = [_part("task", "Answer."), _part("few_shot", _examples("a", "b", "c")), _part("metadata", "v1 build 7")]
+    fitted, report = _fit(parts, budget=20)
+    # the last examples go until the budget fits; lower-priority metadata survives
+    assert [p["name"] for p in fitted] == ["task", "few_shot", "metadata"]
+    assert fitted[1]["content"] == _examples("a")
+    assert report["tokens"] <= 20 and report["examples"] == {"found": 3, "kept": 1}
+
+
+def test_lowest_priority_part_goes_first() -> None:
+    parts = [_part("task", "Answer."), _part("description", _lines("d", 3)), _part("metadata", _lines("m", 3))]
+    fitted, report = _fit(parts, budget=40)
+    assert [p["name"] for p in fitted] == ["task", "description"]
+    assert [r["action"] for r in report["parts"]] == ["kept", "kept", "dropped"]
+
+
+def test_part_that_only_needs_shortening_loses_trailing_lines() -> None:
+    parts = [_part("task", "Answer."), _part("description", _lines("d", 8))]
+    fitted, report = _fit(parts, budget=60)
+    assert fitted[1]["content"] == _lines("d", 5)
+    assert report["parts"][1]["action"] == "trimmed" and report["tokens"] <= 60
+
+
+def test_keep_parts_are_never_touched() -> None:
+    parts = [_part("task", _lines("t", 5)), _part("metadata", "v1")]
+    fitted, report = _fit(parts, budget=10)
+    assert fitted == parts[:1]
+    assert report["over_budget"] and report["parts"][0]["action"] == "kept"
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from itertools import permutations
+from typing import Any, Dict, List
+
+import pytest
+
+from vcer.core.prefix import expected_prefix_tokens, part_stability, prefix_order
+from vcer.core.tokens import TokenCounter
+
+PRIORITY = {"title": 0, "task": 1, "constraints": 2, "tools": 3, "few_shot": 4, "retrieval": 5}
+STABILITY: Dict[str, Dict[str, Any]] = {
+    "title": {"reuse": 1.0, "tokens": 5},
+    "tools": {"reuse": 1.0, "tokens": 400},
+    "constraints": {"reuse": 0.95, "tokens": 200},
+    "few_shot": {"reuse": 0.8, "tokens": 900},
+    "task": {"reuse": 0.5, "tokens": 60},
+    "retrieval": {"reuse": 0.05, "tokens": 1500},
+}
+
+
+def _parts(*names: str) -> List[Dict[str, Any]]:
+    return [{"name": name, "content": name, "start_line": i} for i, name in enumerate(names)]
+
+
+def _names(parts: List[Dict[str, Any]]) -> List[str]:
+    return [p["name"] for p in parts]
+
+
+def test_stable_parts_lead_and_ties_follow_priority() -> None:
+    ordered = prefix_order(_parts("task", "retrieval", "few_shot", "tools", "constraints", "title"), STABILITY, PRIORITY)
+    # title and tools tie at full reuse; a large volatile part still beats a small one
+    assert _names(ordered) == ["title", "tools", "constraints", "few_shot", "retrieval", "task"]
+
+
+def test_order_maximizes_the_expected_prefix() -> None:
+    parts = _parts("task", "retrieval", "few_shot", "constraints")
+    best = max(expected_prefix_tokens(list(names), STABILITY) for names in permutations(_names(parts)))
+    assert expected_prefix_tokens(_names(prefix_order(parts, STABILITY, PRIORITY)), STABILITY) == pytest.approx(best)
+
+
+def test_constraints_always_hold() -> None:
+    parts = _parts("retrieval", "task", "tools", "title")
+    ordered = _names(prefix_order(parts, STABILITY, PRIORITY, [["retrieval", "task"], ["task", "tools"]]))
+    assert ordered == ["title", "retrieval", "task", "tools"]
+
+
+def test_constraint_cycle_is_rejected() -> None:
+    with pytest.raises(ValueError, match="cycle"):
+        prefix_order(_parts("task", "tools"), STABILITY, PRIORITY, [["task", "tools"], ["tools", "task"]])
+
+
+def test_part_stability_measures_agreement_between_prompts() -> None:
+    prompts = [
+        [{"name": "tools", "content": "search"}, {"name": "task", "content": "a b"}],
+        [{"name": "tools", "content": "search"}, {"name": "task", "content": "c d e f"}],
+        [{"name": "tools", "content": "search"}],
+    ]
+    stats = part_stability(prompts, TokenCounter(lambda text: len(text.split()), "words"))
+    assert stats["tools"] == {"prompts": 3, "distinct": 1, "reuse": 1.0, "tokens": 1}
+    # two distinct contents and one prompt without the part: (1 + 1 + 1) / 9
+    assert stats["task"] == {"prompts": 2, "distinct": 2, "reuse": 0.3333, "tokens": 3}
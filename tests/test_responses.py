@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from vcer.adapters import responses
+from vcer.adapters.responses import ResponseCache, is_repeatable, request_key
+from vcer.adapters.router import build_request, load_backend
+from vcer.core.cache import ResultCache
+
+
+def _backend(kind: str) -> Dict[str, Any]:
+    return load_backend({"backends": [{"id": kind, "kind": kind, "model": "m"}]}, kind)
+
+
+@pytest.mark.parametrize("kind", ["vllm", "ollama"])
+def test_sampling_without_seed_is_not_repeatable(kind: str) -> None:
+    def built(**sampling: Any) -> Dict[str, Any]:
+        return build_request(system="s", user="u", backend=_backend(kind), sampling=sampling)
+
+    assert is_repeatable(built())
+    assert is_repeatable(built(temperature=0))
+    assert not is_repeatable(built(temperature=0.7))
+    assert is_repeatable(built(temperature=0.7, seed=1))
+
+
+def test_request_key_depends_on_sampling() -> None:
+    be = _backend("vllm")
+    keys = {
+        request_key(be, build_request(system="s", user="u", backend=be, sampling=sampling))
+        for sampling in ({}, {"temperature": 0.0}, {"temperature": 0.0, "seed": 1}, {"top_p": 0.5})
+    }
+    assert len(keys) == 4
+
+
+def test_entries_expire_after_ttl(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(responses.time, "time", lambda: now[0])
+    cache = ResponseCache(ResultCache(tmp_path / "cache.sqlite"), ttl=10)
+    cache.put("k", {"text": "a"})
+    now[0] += 5
+    assert cache.get("k") == {"text": "a"}
+    # a fresh memory tier still finds the unexpired disk entry
+    cache._mem.clear()
+    cache._bytes = 0
+    assert cache.get("k") == {"text": "a"}
+    now[0] += 6
+    assert cache.get("k") is None
+    assert (cache.memory_hits, cache.disk_hits) == (1, 1)
+
+
+def test_memory_tier_counts_utf8_bytes() -> None:
+    value = {"text": "ü" * 10}
+    size = len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    cache = ResponseCache(max_bytes=size)
+    cache.put("a", value)
+    assert cache.stats()["memory_bytes"] == size > len(json.dumps(value, ensure_ascii=False))
+    cache.put("b", value)  # evicts "a"
+    assert cache.get("a") is None and cache.get("b") == value
+    assert cache.stats()["memory_bytes"] == size
+
+
+def test_concurrent_fetches_coalesce() -> None:
+    calls: List[int] = []
+
+    async def call() -> Dict[str, Any]:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"text": "a"}
+
+    async def run() -> List[Any]:
+        cache = ResponseCache()
+        metas: List[Dict[str, Any]] = [{} for _ in range(3)]
+        results = await asyncio.gather(*(cache.fetch("k", call, m) for m in metas))
+        again: Dict[str, Any] = {}
+        await cache.fetch("k", call, again)
+        return [results, [m["cache"] for m in metas + [again]]]
+
+    results, kinds = asyncio.run(run())
+    assert calls == [1]
+    assert results == [{"text": "a"}] * 3
+    assert kinds == ["miss", "coalesced", "coalesced", "hit"]
+
+
+def test_failures_are_shared_but_not_cached() -> None:
+    calls: List[int] = []
+
+    async def fail() -> Dict[str, Any]:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("down")
+
+    async def run() -> List[Any]:
+        cache = ResponseCache()
+        first = await asyncio.gather(cache.fetch("k", fail), cache.fetch("k", fail), return_exceptions=True)
+        second = await asyncio.gather(cache.fetch("k", fail), return_exceptions=True)
+        return first + second
+
+    assert [type(r) for r in asyncio.run(run())] == [ConnectionError] * 3
+    assert len(calls) == 2
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import pytest
+
+from vcer.adapters.router import build_batch_request, build_request, check_sampling, load_backend
+
+SAMPLING = {"temperature": 0.2, "top_p": 0.9, "seed": 7, "stop": ["\n\n"]}
+
+
+def _backend(kind: str) -> dict:
+    return load_backend({"backends": [{"id": kind, "kind": kind, "model": "m"}]}, kind)
+
+
+@pytest.mark.parametrize("kind", ["vllm", "openai", "sglang"])
+def test_sampling_goes_to_the_top_level(kind: str) -> None:
+    payload = build_request(system="s", user="u", backend=_backend(kind), max_tokens=32, sampling=SAMPLING)
+    assert {k: payload[k] for k in SAMPLING} == SAMPLING
+    assert payload.get("max_tokens", payload.get("max_new_tokens")) == 32
+
+
+def test_ollama_sampling_goes_under_options() -> None:
+    payload = build_request(system="s", user="u", backend=_backend("ollama"), max_tokens=32, sampling=SAMPLING)
+    assert payload["options"] == {"num_predict": 32, **SAMPLING}
+    assert "temperature" not in payload
+
+
+def test_no_sampling_leaves_payload_unchanged() -> None:
+    be = _backend("vllm")
+    assert build_request(system="s", user="u", backend=be) == build_request(system="s", user="u", backend=be, sampling={})
+    assert "temperature" not in build_request(system="s", user="u", backend=be)
+
+
+def test_batch_request_carries_sampling() -> None:
+    payload = build_batch_request(prompts=["a", "b"], backend=_backend("vllm"), sampling={"temperature": 0.0})
+    assert payload["prompt"] == ["a", "b"] and payload["temperature"] == 0.0
+
+
+@pytest.mark.parametrize(
+    "sampling",
+    [{"temprature": 0.2}, {"temperature": "hot"}, {"seed": 1.5}, {"top_k": True}, {"stop": [1]}, ["temperature"]],
+)
+def test_check_sampling_rejects_bad_params(sampling: object) -> None:
+    with pytest.raises(ValueError):
+        check_sampling(sampling)
+
+
+def test_check_sampling_accepts_known_params() -> None:
+    assert check_sampling({"temperature": 1, "top_k": 40, "stop": "###"}) == {"temperature": 1, "top_k": 40, "stop": "###"}
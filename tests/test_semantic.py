@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import random
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from vcer.core import semantic
+from vcer.core.cache import ResultCache
+from vcer.core.semantic import ClassificationCache, classify_chunks, split_payload
+from vcer.core.tokens import approx_tokens
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(semantic.time, "sleep", lambda s: None)
+
+
+def _flaky(failures: int) -> Any:
+    """Classifier failing ``failures`` times per chunk before it answers."""
+    calls: Dict[str, int] = {}
+
+    def classify(chunk: str) -> List[Dict[str, Any]]:
+        calls[chunk] = calls.get(chunk, 0) + 1
+        if calls[chunk] <= failures:
+            raise ConnectionError("try again")
+        return [{"category": "task", "content": chunk}]
+
+    classify.calls = calls  # type: ignore[attr-defined]
+    return classify
+
+
+def test_retries_count_one_miss_per_chunk(tmp_path: Path) -> None:
+    cache = ClassificationCache(ResultCache(tmp_path / "cache.sqlite"))
+    classify = _flaky(failures=2)
+    items = classify_chunks(["a", "b"], classify, retries=2, cache=cache, model="m")
+    assert [i["content"] for i in items] == ["a", "b"]
+    assert classify.calls == {"a": 3, "b": 3}
+    assert cache.stats()["misses"] == 2
+
+    again = classify_chunks(["a", "b"], classify, cache=cache, model="m")
+    assert again == items and classify.calls == {"a": 3, "b": 3}
+    assert (cache.memory_hits, cache.misses) == (2, 2)
+
+
+def test_failed_chunks_are_not_cached() -> None:
+    cache = ClassificationCache()
+    items = classify_chunks(["a"], _flaky(failures=5), retries=1, cache=cache, model="m")
+    assert items[0]["category"] == semantic.MISC_CATEGORY and "error" in items[0]
+    assert cache.stats()["memory_entries"] == 0
+
+
+def _sections(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon"]
+    return [
+        f"## Section {i}\n"
+        + "\n".join(" ".join(rng.choice(words) for _ in range(rng.randint(5, 30))) for _ in range(rng.randint(1, 8)))
+        + "\n\n"
+        for i in range(n)
+    ]
+
+
+def test_split_payload_keeps_text_and_budget() -> None:
+    payload = "".join(_sections(40))
+    chunks = split_payload(payload, 200)
+    assert len(chunks) > 1
+    assert "".join(chunks) == payload
+    assert max(approx_tokens(c) for c in chunks) <= 200
+
+
+def test_split_payload_cuts_an_overlong_line() -> None:
+    payload = "word " * 2000
+    chunks = split_payload(payload, 100)
+    assert "".join(chunks) == payload
+    assert max(approx_tokens(c) for c in chunks) <= 100
+
+
+def test_split_payload_rechunks_only_around_an_edit() -> None:
+    sections = _sections(40)
+    before = split_payload("".join(sections), 200)
+    sections[20] = sections[20].replace("alpha", "omega", 1)
+    after = split_payload("".join(sections), 200)
+    assert len(set(before) - set(after)) <= 2
+
+
+def test_classification_cache_memory_lru_and_disk(tmp_path: Path) -> None:
+    disk = ResultCache(tmp_path / "cache.sqlite")
+    cache = ClassificationCache(disk, max_entries=2)
+    for chunk in "abc":
+        cache.put(chunk, "m", [{"category": "task", "content": chunk}])
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("c", "m") == [{"category": "task", "content": "c"}]
+    # "a" was evicted from memory but is still on disk
+    assert cache.get("a", "m") == [{"category": "task", "content": "a"}]
+    assert cache.get("a", "other-model") is None
+    assert (cache.memory_hits, cache.disk_hits, cache.misses) == (1, 1, 1)
+    assert cache.stats()["hit_rate"] == round(2 / 3, 3)
+    # a fresh cache over the same file starts warm
+    assert ClassificationCache(disk).get("b", "m") == [{"category": "task", "content": "b"}]
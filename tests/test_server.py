@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from vcer.adapters.client import AsyncRouter
+from vcer.server.app import ServiceState, VcerService
+from vcer.server.httpd import Request
+
+CONFIG = """\
+cache:
+  enabled: false
+backends:
+  - {id: a, kind: vllm, base_url: "http://a"}
+  - {id: b, kind: vllm, base_url: "http://b"}
+router:
+  strategy: round_robin
+  health_check_interval_ms: 0
+"""
+
+
+class _MockRouter(AsyncRouter):
+    def client(self, be: Dict[str, Any]) -> Any:
+        if be["id"] not in self._clients:
+            self._clients[be["id"]] = httpx.AsyncClient(transport=httpx.MockTransport(_handler))
+        return self._clients[be["id"]]
+
+
+def _handler(request: httpx.Request) -> httpx.Response:
+    if request.url.host == "a":
+        return httpx.Response(503)
+    chunk = {"choices": [{"index": 0, "delta": {"content": "ok"}}]}
+    return httpx.Response(200, content=f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode())
+
+
+def test_route_stream_fails_over(tmp_path: Path) -> None:
+    (tmp_path / ".vcer.yml").write_text(CONFIG, encoding="utf-8")
+    body = json.dumps({"system": "s", "user": "u", "stream": True}).encode()
+
+    async def run() -> List[Dict[str, Any]]:
+        state = ServiceState(tmp_path)
+        state.router = _MockRouter(state.cfg)
+        async with state.router:
+            resp = await VcerService(state)(Request("POST", "/route", {}, body))
+            return [json.loads(line) async for line in resp.chunks]
+
+    delta, done = asyncio.run(run())
+    assert delta == {"delta": "ok"}
+    assert done["done"] is True and (done["backend"], done["attempts"]) == ("b", 2)
+    assert done["stats"]["chunks"] == 1
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+from typing import Any, List
+
+import pytest
+
+from vcer.adapters.streaming import StreamError, StreamStats, make_decoder, percentile, to_ms
+
+
+def _feed(kind: str, lines: List[str]) -> Any:
+    decoder = make_decoder(kind)
+    deltas = []
+    for line in lines:
+        delta = decoder.feed(line)
+        if delta:
+            deltas.append(delta)
+        if decoder.done:
+            break
+    return deltas, decoder.done
+
+
+def _data(obj: Any) -> str:
+    return "data: " + json.dumps(obj)
+
+
+def test_openai_decoder_reads_chat_and_completion_chunks() -> None:
+    lines = [
+        ": keep-alive",
+        _data({"choices": [{"delta": {"role": "assistant"}}]}),
+        _data({"choices": [{"delta": {"content": "Hel"}}]}),
+        "",
+        _data({"choices": [{"text": "lo"}]}),
+        "data: [DONE]",
+        _data({"choices": [{"delta": {"content": "after done"}}]}),
+    ]
+    assert _feed("vllm", lines) == (["Hel", "lo"], True)
+
+
+def test_ollama_decoder_stops_at_done() -> None:
+    lines = [
+        json.dumps({"message": {"content": "Hel"}, "done": False}),
+        "",
+        json.dumps({"response": "lo", "done": False}),
+        json.dumps({"message": {"content": ""}, "done": True}),
+    ]
+    assert _feed("ollama", lines) == (["Hel", "lo"], True)
+
+
+def test_sglang_decoder_turns_cumulative_text_into_deltas() -> None:
+    lines = [_data({"text": "Hel"}), _data({"text": "Hello"}), _data({"text": "Hello"}), _data([{"text": "Hello!"}]), "data: [DONE]"]
+    assert _feed("sglang", lines) == (["Hel", "lo", "!"], True)
+
+
+def test_sglang_decoder_restarts_when_text_is_not_a_continuation() -> None:
+    assert _feed("sglang", [_data({"text": "abc"}), _data({"text": "xyz"})]) == (["abc", "xyz"], False)
+
+
+@pytest.mark.parametrize("kind", ["vllm", "sglang"])
+def test_decoders_raise_on_errors_and_malformed_chunks(kind: str) -> None:
+    with pytest.raises(StreamError, match="overloaded"):
+        make_decoder(kind).feed(_data({"error": "overloaded"}))
+    with pytest.raises(StreamError, match="Malformed"):
+        make_decoder(kind).feed("data: {not json")
+
+
+def test_stream_stats_summary(monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = iter([10.0, 10.1, 10.15, 10.25, 10.3])
+    monkeypatch.setattr("vcer.adapters.streaming.time.perf_counter", lambda: next(clock))
+    stats = StreamStats()
+    for _ in range(3):
+        stats.on_chunk()
+    stats.finish()
+    s = stats.summary()
+    assert (s["ttft_ms"], s["total_ms"], s["chunks"]) == (100.0, 300.0, 3)
+    assert s["itl_mean_ms"] == 75.0 and s["itl_p50_ms"] == 75.0
+    assert s["chunks_per_s"] == 13.33
+
+
+def test_stream_stats_without_chunks() -> None:
+    stats = StreamStats()
+    stats.finish()
+    s = stats.summary()
+    assert s["chunks"] == 0 and s["ttft_ms"] is None and s["itl_mean_ms"] is None and s["chunks_per_s"] is None
+
+
+def test_percentile_and_to_ms() -> None:
+    assert percentile([], 0.5) is None
+    assert percentile([3.0, 1.0, 2.0], 0.5) == 2.0
+    assert percentile([0.0, 1.0], 0.95) == pytest.approx(0.95)
+    assert to_ms(None) is None and to_ms(0.0123456, 3) == 12.346